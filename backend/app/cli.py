@@ -0,0 +1,94 @@
+# app/cli.py
+"""
+Comenzi de administrare care rulează în afara API-ului.
+
+    python -m app.cli simulate-tariff --rates propus.json [--baseline-version 3] [--from 2025-01-01] [--to 2025-10-01]
+    python -m app.cli rebuild-aggregates
+    python -m app.cli purge-idempotency
+
+`propus.json` are forma corpului POST /tariffs/simulate:
+{"portable_rates": {"portable_0_50": "0.05"}, "kg_rates": {"auto_3a": "0.40"}}
+"""
+import argparse
+import json
+import sys
+from datetime import datetime
+
+from sqlalchemy import text
+
+from app.db import SessionLocal
+from app.schemas.tariffs import TariffRates
+from app.services import aggregates, idempotency
+from app.services.repricing import simulate
+from app.services.tariffs import compile_tariff, parse_rates, tariff_book
+
+def _simulate_tariff(args: argparse.Namespace) -> int:
+    with open(args.rates, encoding="utf-8") as f:
+        proposed = TariffRates(**json.load(f))
+
+    with SessionLocal() as db:
+        if args.baseline_version is not None:
+            version = args.baseline_version
+        else:
+            version = tariff_book.for_date(db).version
+        row = db.execute(text("SELECT rates FROM tariffs WHERE version = :v"), {"v": version}).first()
+        if args.baseline_version is not None and not row:
+            print(f"Versiunea de tarif {version} nu există", file=sys.stderr)
+            return 1
+        base_rates = parse_rates(row[0]) if row else {}
+
+    proposed_rates = {
+        name: {**(base_rates.get(name) or {}), **{k: str(v) for k, v in getattr(proposed, name).items()}}
+        for name in ("portable_rates", "portable_weights_kg", "kg_rates")
+    }
+    res = simulate(
+        compile_tariff(version, base_rates),
+        compile_tariff(-1, proposed_rates),
+        args.date_from,
+        args.date_to,
+    )
+
+    print(f"{'lună':8} {'bază':36} {'colectări':>10} {'curent':>14} {'propus':>14} {'diferență':>14}")
+    for r in res["rows"]:
+        print(f"{r['month']:8} {r['base_company_id'] or '-':36} {r['collections']:>10} "
+              f"{r['current_total']:>14} {r['proposed_total']:>14} {r['delta']:>14}")
+    print(f"{'TOTAL':8} {'':36} {res['collections']:>10} "
+          f"{res['current_total']:>14} {res['proposed_total']:>14} {res['delta']:>14}")
+    return 0
+
+def _rebuild_aggregates(args: argparse.Namespace) -> int:
+    with SessionLocal() as db:
+        n_col, n_inv = aggregates.rebuild(db)
+        db.commit()
+    print(f"agg_collections_monthly: {n_col} rânduri, agg_invoices_monthly: {n_inv} rânduri")
+    return 0
+
+def _purge_idempotency(args: argparse.Namespace) -> int:
+    with SessionLocal() as db:
+        n = idempotency.purge_expired(db)
+        db.commit()
+    print(f"idempotency_keys: {n} chei expirate șterse")
+    return 0
+
+def main(argv: list[str] | None = None) -> int:
+    ap = argparse.ArgumentParser(prog="python -m app.cli")
+    sub = ap.add_subparsers(dest="command", required=True)
+
+    sim = sub.add_parser("simulate-tariff", help="impactul unui tarif propus asupra colectărilor istorice")
+    sim.add_argument("--rates", required=True, help="fișier JSON cu tarifele propuse")
+    sim.add_argument("--baseline-version", type=int, default=None)
+    sim.add_argument("--from", dest="date_from", type=datetime.fromisoformat, default=None)
+    sim.add_argument("--to", dest="date_to", type=datetime.fromisoformat, default=None)
+    sim.set_defaults(func=_simulate_tariff)
+
+    reb = sub.add_parser("rebuild-aggregates", help="recalculează rollup-urile lunare pentru rapoarte")
+    reb.set_defaults(func=_rebuild_aggregates)
+
+    pur = sub.add_parser("purge-idempotency", help="șterge cheile Idempotency-Key expirate")
+    pur.set_defaults(func=_purge_idempotency)
+
+    args = ap.parse_args(argv)
+    return args.func(args)
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -15,6 +15,57 @@ class Settings(BaseSettings):
     frontend_base_url: str = "http://localhost:5173"
     rate_limit_window_seconds: int = 60
     rate_limit_max_hits: int = 10
+    # limitator GCRA (app/utils/ratelimit.py): "memory" (per proces) sau "db" (partajat)
+    rate_limit_backend: str = "memory"
+    rate_limit_max_keys: int = 100_000
+    # proxy-uri (IP sau CIDR) ale căror X-Forwarded-For e crezut, ex. ["10.0.0.0/8"];
+    # gol = rate limiting-ul folosește IP-ul conexiunii (app/utils/ratelimit.py)
+    trusted_proxies: list[str] = Field(default_factory=list)
+    login_rate_limit_max_hits: int = 10
+    invite_rate_limit_max_hits: int = 30
+
+    # fire pentru lucrul sincron cu DB din endpoint-urile async (app/utils/concurrency.py);
+    # păstrați-l <= pool_size + max_overflow ale engine-ului (implicit 5 + 10)
+    db_thread_pool_size: int = 10
+
+    # coada de randare PDF (vezi app/services/render_queue.py)
+    pdf_render_workers: int = 2
+    pdf_render_poll_seconds: float = 2.0
+    pdf_render_max_attempts: int = 3
+    # procese pentru randare (app/services/pdf_pool.py), per worker uvicorn: cu N workeri
+    # rulează N × pdf_pool_processes procese, deci păstrați produsul <= nuclee; 0 = în proces
+    pdf_pool_processes: int = 2
+    pdf_pool_max_pending: int = 64
+    pdf_render_timeout_seconds: float = 60.0
+    # stocarea PDF (app/services/storage.py); gol = <backend>/files/pdf-store
+    pdf_storage_dir: str = ""
+    # plafon pentru directorul de PDF-uri (0 = nelimitat); cele evacuate se regenerează la cerere
+    pdf_cache_max_bytes: int = 2 * 1024**3
+    pdf_lock_timeout_seconds: int = 30
+
+    # cache sesiuni (app/utils/security.py); o revocare e vizibilă în toți workerii
+    # după cel mult session_revocation_poll_seconds
+    session_cache_size: int = 10000
+    session_cache_ttl_seconds: float = 60.0
+    session_revocation_poll_seconds: float = 5.0
+
+    # client ANAF (app/services/anaf.py); URL-ul poate indica un stub local
+    anaf_url: str = "https://webservicesp.anaf.ro/api/PlatitorTvaRest/v9/tva"
+    anaf_cache_ttl_seconds: float = 6 * 3600
+    anaf_cache_size: int = 5000
+
+    # versiunile de tarif (app/services/tariffs.py); o versiune nouă e vizibilă în toți
+    # workerii după cel mult tariff_poll_seconds
+    tariff_poll_seconds: float = 30.0
+
+    # profilele de facturare (app/services/billing_context.py); 0 = fără cache între cereri
+    billing_profile_cache_ttl_seconds: float = 0.0
+
+    # Idempotency-Key (app/services/idempotency.py): cât se păstrează răspunsurile, după cât
+    # timp o cerere IN_PROGRESS e considerată abandonată și cât așteaptă un duplicat concurent
+    idempotency_ttl_hours: int = 24
+    idempotency_lock_seconds: int = 120
+    idempotency_wait_seconds: float = 30.0
 
     model_config = SettingsConfigDict(
         env_file=".env",
@@ -22,7 +73,7 @@ class Settings(BaseSettings):
     )
 
     # ✅ acceptă din .env fie JSON, fie listă separată prin virgulă
-    @field_validator("cors_origins", mode="before")
+    @field_validator("cors_origins", "trusted_proxies", mode="before")
     @classmethod
     def parse_cors(cls, v: Any):
         if isinstance(v, str):
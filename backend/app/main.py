@@ -14,6 +14,13 @@ from .routers import billing as billing_router
 from .routers import collections as collections_router
 from .routers import collections as collections_router
 from .routers import invoices as invoices_router
+from .routers import tariffs as tariffs_router
+from .routers import reports as reports_router
+from .services.render_queue import render_pool
+from .services.anaf import anaf_client
+from .services.pdf import get_renderer
+from .services.pdf_pool import pdf_pool
+from .utils.pagination import NEXT_CURSOR_HEADER
 logging.basicConfig(
     level=logging.INFO,
     format="%(asctime)s %(levelname)s %(name)s %(message)s",
@@ -25,7 +32,8 @@ app = FastAPI(title="App API", version="0.1.0")
 @app.exception_handler(HTTPException)
 async def http_exception_handler(request: Request, exc: HTTPException):
     # păstrează mesajul tău (raise HTTPException(..., detail="..."))
-    return JSONResponse(status_code=exc.status_code, content={"detail": exc.detail})
+    return JSONResponse(status_code=exc.status_code, content={"detail": exc.detail},
+                        headers=getattr(exc, "headers", None))
 
 @app.exception_handler(RequestValidationError)
 async def validation_exception_handler(request: Request, exc: RequestValidationError):
@@ -59,8 +67,22 @@ app.add_middleware(
     allow_credentials=True,    # set True only if you use cookies
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=[NEXT_CURSOR_HEADER],
 )
 
+@app.on_event("startup")
+async def start_background_workers():
+    get_renderer()  # fonturi + stiluri gata înainte de prima factură
+    pdf_pool.start()
+    render_pool.start()
+    await anaf_client.start()
+
+@app.on_event("shutdown")
+async def stop_background_workers():
+    render_pool.stop()
+    pdf_pool.stop()
+    await anaf_client.close()
+
 @app.get("/healthz")
 def healthz():
     return {"status": "ok"}
@@ -72,4 +94,6 @@ app.include_router(invites_router.router)
 app.include_router(billing_router.router)
 app.include_router(collections_router.router)
 app.include_router(collections_router.router)
-app.include_router(invoices_router.router)
\ No newline at end of file
+app.include_router(invoices_router.router)
+app.include_router(tariffs_router.router)
+app.include_router(reports_router.router)
\ No newline at end of file
@@ -1,34 +1,24 @@
 ﻿from fastapi import APIRouter, Depends, HTTPException, Request
-from sqlalchemy import text
+from sqlalchemy import text, bindparam
 from sqlalchemy.orm import Session
-from datetime import date
-import httpx, re, json
+import re
 
 from app.db import get_db
-from app.schemas.anaf import AnafLookupIn, AnafSummary
+from app.schemas.anaf import AnafLookupIn, AnafSummary, AnafBatchLookupIn, AnafBatchItem
+from app.services.anaf import anaf_client
 from app.utils.security import get_current_user_claims
+from app.utils.billing import upsert_billing_profile_from_anaf
+from app.utils.concurrency import run_db
 
-from collections import defaultdict, deque
-from time import time
+from app.utils.ratelimit import client_ip, rate_limit
 from app.config import settings
 
-_RATE_BUCKETS: dict[str, deque[float]] = defaultdict(deque)
-
-def rate_limit_dependency(request: Request):
-    ip = request.headers.get("x-forwarded-for", request.client.host)
-    now = time()
-    window = settings.rate_limit_window_seconds
-    limit = settings.rate_limit_max_hits
-
-    dq = _RATE_BUCKETS[ip]
-    while dq and dq[0] <= now - window:
-        dq.popleft()
-
-    if len(dq) >= limit:
-        raise HTTPException(status_code=429, detail="Prea multe cereri către ANAF. Încearcă mai târziu.")
-    dq.append(now)
-
-ANAF_URL = "https://webservicesp.anaf.ro/api/PlatitorTvaRest/v9/tva"
+rate_limit_dependency = rate_limit(
+    "anaf",
+    settings.rate_limit_max_hits,
+    settings.rate_limit_window_seconds,
+    detail="Prea multe cereri către ANAF. Încearcă mai târziu.",
+)
 
 router = APIRouter(prefix="/anaf", tags=["anaf"])
 
@@ -38,70 +28,7 @@ def _sanitize_cui(raw: str) -> str:
     s = re.sub(r"\D", "", s)
     return s
 
-@router.post("/lookup", response_model=AnafSummary)
-async def anaf_lookup(
-    payload: AnafLookupIn,
-    request: Request,
-    _: None = Depends(rate_limit_dependency),
-    claims = Depends(get_current_user_claims),
-    db: Session = Depends(get_db),
-):
-    cui = _sanitize_cui(payload.cui)
-    if not cui.isdigit() or not (2 <= len(cui) <= 10):
-        raise HTTPException(status_code=400, detail="CUI invalid")
-
-    today = date.today().isoformat()
-    body = [{"cui": int(cui), "data": today}]
-    headers = {"Content-Type": "application/json", "Accept": "application/json"}
-
-    raw = None
-    msg = None
-    code = None
-
-    try:
-        timeout = httpx.Timeout(6.0, connect=3.0)
-        async with httpx.AsyncClient(timeout=timeout) as client:
-            resp = await client.post(ANAF_URL, json=body, headers=headers)
-        code = resp.status_code
-        raw = resp.json()
-    except Exception as e:
-        msg = f"request_failed: {type(e).__name__}"
-
-    # MySQL: raw_response is JSON, client_ip is VARCHAR(45); no casts
-    db.execute(
-        text("""
-            INSERT INTO anaf_queries (cui, query_date, raw_response, result_code, message, client_ip)
-            VALUES (:cui, :qd, :raw, :code, :msg, :ip)
-        """),
-        {
-            "cui": cui,
-            "qd": today,
-            "raw": None if raw is None else json.dumps(raw),
-            "code": code,
-            "msg": msg,
-            "ip": request.headers.get("x-forwarded-for", request.client.host),
-        }
-    )
-    db.commit()
-
-    if raw is None:
-        cached = db.execute(
-            text("""SELECT raw_response FROM anaf_queries
-                      WHERE cui=:cui ORDER BY created_at DESC LIMIT 1"""),
-            {"cui": cui}
-        ).scalar()
-        if cached is not None:
-            if isinstance(cached, (dict, list)):
-                raw = cached
-            else:
-                try:
-                    raw = json.loads(cached)
-                except Exception:
-                    raw = None
-
-    if raw is None:
-        raise HTTPException(status_code=502, detail="ANAF indisponibil și fără cache")
-
+def _summarize(raw, cui: str) -> AnafSummary:
     summary = AnafSummary(raw=raw)
     try:
         found = (raw or {}).get("found") or []
@@ -134,3 +61,78 @@ async def anaf_lookup(
         pass
 
     return summary
+
+@router.post("/lookup", response_model=AnafSummary)
+async def anaf_lookup(
+    payload: AnafLookupIn,
+    request: Request,
+    _: None = Depends(rate_limit_dependency),
+    claims = Depends(get_current_user_claims),
+    db: Session = Depends(get_db),
+):
+    cui = _sanitize_cui(payload.cui)
+    if not cui.isdigit() or not (2 <= len(cui) <= 10):
+        raise HTTPException(status_code=400, detail="CUI invalid")
+
+    raw = await anaf_client.lookup(db, cui, client_ip(request))
+
+    if raw is None:
+        raise HTTPException(status_code=502, detail="ANAF indisponibil și fără cache")
+
+    return _summarize(raw, cui)
+
+def _refresh_billing_profiles(db: Session, raws: dict) -> None:
+    # `raws` e pe CUI sanitizat; în companies CUI-ul poate fi salvat și cu prefixul RO
+    companies = db.execute(
+        text("SELECT company_id, cui FROM companies WHERE cui IN :cuis")
+        .bindparams(bindparam("cuis", expanding=True)),
+        {"cuis": list(raws) + [f"RO{c}" for c in raws]},
+    ).all()
+    for company_id, cui in companies:
+        raw = raws.get(_sanitize_cui(cui or ""))
+        if raw is None:
+            continue
+        upsert_billing_profile_from_anaf(db, str(company_id), raw)
+    db.commit()
+
+@router.post("/lookup-batch", response_model=list[AnafBatchItem])
+async def anaf_lookup_batch(
+    payload: AnafBatchLookupIn,
+    request: Request,
+    _: None = Depends(rate_limit_dependency),
+    claims = Depends(get_current_user_claims),
+    db: Session = Depends(get_db),
+):
+    """
+    Interogare ANAF pentru mai multe CUI-uri (onboarding). Cererile către ANAF folosesc
+    corpul multi-CUI; profilurile de facturare ale firmelor deja existente sunt actualizate.
+    """
+    if claims.get("role") not in ("BASE", "ADMIN"):
+        raise HTTPException(status_code=403, detail="Doar BASE sau ADMIN pot interoga în lot")
+
+    results: list[dict] = []
+    valid: list[str] = []
+    for original in payload.cuis:
+        cui = _sanitize_cui(original)
+        if not cui.isdigit() or not (2 <= len(cui) <= 10):
+            results.append({"cui": original, "error": "CUI invalid"})
+        else:
+            valid.append(cui)
+            results.append({"cui": cui})
+
+    raws = await anaf_client.lookup_many(
+        db, valid, client_ip(request)
+    )
+
+    if raws:
+        await run_db(_refresh_billing_profiles, db, raws)
+
+    for item in results:
+        if "error" in item:
+            continue
+        raw = raws.get(item["cui"])
+        if raw is None:
+            item["error"] = "ANAF indisponibil și fără cache"
+        else:
+            item["summary"] = _summarize(raw, item["cui"])
+    return results
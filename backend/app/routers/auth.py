@@ -6,12 +6,22 @@ import bcrypt, json
 from app.db import get_db
 from app.config import settings
 from app.schemas.auth import LoginIn, LoginOut, UserOut
-from app.utils.security import create_access_token, get_current_user_claims
+from app.utils.security import create_access_token, get_current_user_claims, revoke_session
+from app.utils.ratelimit import rate_limit
 
 router = APIRouter(prefix="/auth", tags=["auth"])
 
+_login_rate_limit = rate_limit(
+    "login",
+    settings.login_rate_limit_max_hits,
+    settings.rate_limit_window_seconds,
+    detail="Prea multe încercări de autentificare. Încearcă mai târziu.",
+)
+
 @router.post("/login", response_model=LoginOut)
-def login(payload: LoginIn, request: Request, db: Session = Depends(get_db)):
+def login(payload: LoginIn, request: Request,
+          _: None = Depends(_login_rate_limit),
+          db: Session = Depends(get_db)):
     row = db.execute(
         text("""
             SELECT user_id, company_id, role, full_name, email, password_hash, is_active
@@ -109,14 +119,7 @@ def logout(request: Request, claims=Depends(get_current_user_claims), db: Sessio
     uid = claims.get("sub")
     jti = claims.get("jti")
 
-    res = db.execute(
-        text("""
-            UPDATE user_sessions
-            SET revoked_at = NOW()
-            WHERE user_id = :uid AND jti = :jti AND revoked_at IS NULL
-        """),
-        {"uid": uid, "jti": jti}
-    )
+    revoked = revoke_session(db, uid, jti)
 
     db.execute(
         text("""
@@ -125,7 +128,7 @@ def logout(request: Request, claims=Depends(get_current_user_claims), db: Sessio
         """),
         {
             "uid": uid,
-            "details": json.dumps({"revoked": bool(res.rowcount), "jti": jti}),
+            "details": json.dumps({"revoked": bool(revoked), "jti": jti}),
             "ip": request.headers.get("x-forwarded-for", request.client.host),
             "ua": request.headers.get("user-agent", ""),
         }
@@ -7,20 +7,16 @@ from app.schemas.billing import (
     BillingProfile, BillingProfileUpdate,
     InvoiceSettings, InvoiceSettingsUpdate
 )
+from app.services import numbering
+from app.services.billing_context import forget
+from datetime import date
 import json
 
 router = APIRouter(prefix="/billing", tags=["billing"])
 
 # ——— PROFIL FACTURARE ———
 
-@router.get("/profile", response_model=BillingProfile)
-def get_profile(claims = Depends(get_current_user_claims), db: Session = Depends(get_db)):
-    company_id = claims.get("company_id")
-    if not company_id:
-        raise HTTPException(403, "Utilizatorul nu este asociat unei companii")
-
-    row = db.execute(
-        text("""
+_PROFILE_SQL = """
         SELECT
           c.company_id,                                   -- stored as CHAR(36) in MySQL schema
           COALESCE(p.legal_name, c.name) AS legal_name,
@@ -30,13 +26,20 @@ def get_profile(claims = Depends(get_current_user_claims), db: Session = Depends
           p.bank_name, p.iban, p.email_billing, p.phone_billing,
           p.vat_payer, p.vat_cash, p.e_invoice,
           CAST(p.updated_from_anaf_at AS CHAR) AS updated_from_anaf_at,   -- <- make it a string for Pydantic
-          COALESCE(p.source,'ANAF') AS source
+          COALESCE(p.source,'ANAF') AS source,
+          c.name AS company_name, c.cui AS company_cui
         FROM companies c
         LEFT JOIN company_billing_profiles p ON p.company_id = c.company_id
         WHERE c.company_id = :cid
-        """),
-        {"cid": str(company_id)}
-    ).mappings().first()
+"""
+
+@router.get("/profile", response_model=BillingProfile)
+def get_profile(claims = Depends(get_current_user_claims), db: Session = Depends(get_db)):
+    company_id = claims.get("company_id")
+    if not company_id:
+        raise HTTPException(403, "Utilizatorul nu este asociat unei companii")
+
+    row = db.execute(text(_PROFILE_SQL), {"cid": str(company_id)}).mappings().first()
 
     if not row:
         raise HTTPException(404, "Compania nu există")
@@ -51,11 +54,9 @@ def update_profile(payload: BillingProfileUpdate,
     if not company_id:
         raise HTTPException(403, "Utilizatorul nu este asociat unei companii")
 
-    comp = db.execute(
-        text("SELECT name, cui FROM companies WHERE company_id=:cid"),
-        {"cid": str(company_id)}
-    ).mappings().first()
-    if not comp:
+    # profilul curent, blocat până la commit: răspunsul se construiește din el, fără recitire
+    cur = db.execute(text(_PROFILE_SQL + " FOR UPDATE"), {"cid": str(company_id)}).mappings().first()
+    if not cur:
         raise HTTPException(404, "Compania nu există")
 
     # MySQL upsert
@@ -85,8 +86,8 @@ def update_profile(payload: BillingProfileUpdate,
         """),
         {
             "cid": str(company_id),
-            "fallback_name": comp["name"],
-            "fallback_cui": comp["cui"],
+            "fallback_name": cur["company_name"],
+            "fallback_cui": cur["company_cui"],
             **payload.model_dump()
         }
     )
@@ -98,8 +99,19 @@ def update_profile(payload: BillingProfileUpdate,
          "d": json.dumps(payload.model_dump(exclude_none=True))}
     )
     db.commit()
-
-    return get_profile(claims, db)
+    # după commit, ca o citire concurentă să nu pună la loc profilul vechi
+    forget(db, str(company_id))
+
+    # același rezultat ca upsert-ul de mai sus: VALUES(legal_name) și VALUES(country)
+    # sunt deja completate (numele firmei, 'RO'), deci înlocuiesc valoarea existentă
+    changes = payload.model_dump(exclude_none=True)
+    return {
+        **cur,
+        **changes,
+        "legal_name": payload.legal_name or cur["company_name"],
+        "country": payload.country or "RO",
+        "source": "USER",
+    }
 
 # ——— SETĂRI FACTURI (doar BASE) ———
 
@@ -130,7 +142,14 @@ def get_settings(claims = Depends(get_current_user_claims), db: Session = Depend
             {"cid": base_company_id}
         ).mappings().first()
 
-    return row
+    return {**row, "next_number": _current_next(db, row)}
+
+def _current_next(db: Session, row) -> int:
+    # numerele vin din invoice_number_counters; next_number din setări e doar punctul
+    # de plecare pentru o serie nouă (app/services/numbering.py)
+    nxt = numbering.peek_next(db, str(row["base_company_id"]), row["series_code"] or "INV",
+                              bool(row["year_reset"]), date.today())
+    return nxt if nxt is not None else int(row["next_number"] or 1)
 
 @router.put("/settings", response_model=InvoiceSettings)
 def update_settings(payload: InvoiceSettingsUpdate,
@@ -150,11 +169,13 @@ def update_settings(payload: InvoiceSettingsUpdate,
     payload_dict = payload.model_dump()
 
     if payload.next_number is not None:
-        cur_next = db.execute(
-            text("SELECT next_number FROM company_invoice_settings WHERE base_company_id=:cid"),
+        cur = db.execute(
+            text("""SELECT base_company_id, series_code, next_number, year_reset
+                    FROM company_invoice_settings WHERE base_company_id=:cid"""),
             {"cid": cid}
-        ).scalar()
-        if cur_next is not None and payload.next_number < int(cur_next):
+        ).mappings().first()
+        cur_next = _current_next(db, cur)
+        if payload.next_number < cur_next:
             raise HTTPException(
                 status_code=422,
                 detail=f"next_number ({payload.next_number}) nu poate fi mai mic decât cel curent ({cur_next})"
@@ -173,11 +194,20 @@ def update_settings(payload: InvoiceSettingsUpdate,
         {"cid": cid, **payload_dict}
     )
 
+    if payload.next_number is not None:
+        sett = db.execute(
+            text("SELECT series_code, year_reset FROM company_invoice_settings WHERE base_company_id=:cid"),
+            {"cid": cid}
+        ).mappings().first()
+        numbering.set_floor(db, cid, sett["series_code"] or "INV", bool(sett["year_reset"]),
+                            date.today(), payload.next_number)
+
     db.execute(
         text("""INSERT INTO audit_logs(actor_user_id, actor_company_id, action, details)
                 VALUES (:uid, :cid, 'INVOICE_SETTINGS_UPDATED', :d)"""),
         {"uid": str(claims.get("sub")), "cid": cid, "d": json.dumps(payload.model_dump(exclude_none=True))}
     )
     db.commit()
+    forget(db)
 
     return get_settings(claims, db)
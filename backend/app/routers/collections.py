@@ -1,19 +1,25 @@
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, Header, HTTPException, Query, Response
 from sqlalchemy.orm import Session
-from sqlalchemy import text
+from sqlalchemy import text, bindparam
 from app.db import get_db
 from app.utils.security import get_current_user_claims
-from app.schemas.collections import CollectionCreate, CollectionOut
-from app.utils.billing import billing_ready
+from app.schemas.collections import (
+    CollectionCreate, CollectionOut, CollectionStatus,
+    CollectionValidateBatchIn, CollectionValidateResult, CollectionCategoryTotal,
+)
+from app.services.billing_context import load_billing_context
+from app.utils.pagination import NEXT_CURSOR_HEADER, encode_cursor, decode_cursor, keyset_clause
 from decimal import Decimal, ROUND_HALF_UP
-from datetime import date, timedelta
+from datetime import date, datetime, timedelta
+from typing import Optional
 import uuid, json
-from pathlib import Path
-from app.services.pdf import render_invoice_pdf
-from app.utils.rates import (
-    PORTABLE_KEYS, KG_KEYS, LABELS,
-    PORTABLE_RATES, PORTABLE_WEIGHTS_KG, KG_RATES,
-)
+from app.services.render_queue import enqueue_render, enqueue_renders, render_pool
+from app.services.exports import ExportFormat, export_response, stream_query
+from app.utils.rates import PORTABLE_KEYS, KG_KEYS, LABELS
+from app.utils.pricing import price, price_totals, totals_as_decimal
+from app.services.tariffs import tariff_book
+from app.services import aggregates, idempotency, numbering
+from app.services.invoice_writer import InvoiceWriter
 router = APIRouter(prefix="/collections", tags=["collections"])
 
 # ----- Helpers ---------------------------------------------------------------
@@ -35,88 +41,140 @@ def _parse_json(value):
             return {}
     return {}
 
-from decimal import Decimal
+def _battery_entries(bats: dict) -> list[tuple[str, int | float]]:
+    # categoriile cu cantitate nenulă, în ordinea trimisă de client
+    return [(k, v) for k, v in bats.items()
+            if isinstance(v, (int, float, Decimal)) and not isinstance(v, bool) and v]
 
 def _batteries_summary(bats: dict[str, int]) -> str:
-    items = []
-    for k, v in bats.items():
-        if isinstance(v, (int, float, Decimal)) and v:
-            items.append(f"{k}: {v}")
-    return ", ".join(items) if items else ""
-
-# Tarife „sursa de adevăr” pe server (exemplu; ajustează după cum e în business)
-PORTABLE_RATES = {
-    "portable_pastila":   Decimal("0.01"),
-    "portable_0_50":      Decimal("0.04"),
-    "portable_51_150":    Decimal("0.11"),
-    "portable_151_250":   Decimal("0.38"),
-    "portable_251_500":   Decimal("0.80"),
-    "portable_501_750":   Decimal("0.98"),
-    "portable_751_1000":  Decimal("1.20"),
-    "portable_1000_plus": Decimal("1.38"),
-}
-PORTABLE_WEIGHTS_KG = {
-    "portable_pastila":   Decimal("0.010"),
-    "portable_0_50":      Decimal("0.050"),
-    "portable_51_150":    Decimal("0.150"),
-    "portable_151_250":   Decimal("0.250"),
-    "portable_251_500":   Decimal("0.500"),
-    "portable_501_750":   Decimal("0.750"),
-    "portable_751_1000":  Decimal("1.000"),
-    "portable_1000_plus": Decimal("1.000"),
-}
-KG_RATES = {
-    "auto_3a":        Decimal("0.35"),
-    "auto_3b":        Decimal("1.38"),
-    "auto_3c":        Decimal("1.38"),
-    "industrial_4a":  Decimal("0.35"),
-    "industrial_4b":  Decimal("1.38"),
-    "industrial_4c":  Decimal("1.38"),
-}
-
-def _compute_server_totals(bats: dict[str, int]) -> tuple[Decimal, Decimal]:
-    # return (subtotal RON, total_weight kg); ambele rotunjite la 2 zecimale pt. stocare/afișare
-    subtotal = Decimal("0")
-    total_w = Decimal("0")
-
-    # portable = pe bucată
-    for key, rate in PORTABLE_RATES.items():
-        qty = Decimal(str(bats.get(key, 0) or 0))
-        if qty > 0:
-            subtotal += qty * rate
-            total_w += qty * PORTABLE_WEIGHTS_KG.get(key, Decimal("0"))
-
-    # auto/industrial = cantitatea introdusă este deja în kg
-    for key, rate in KG_RATES.items():
-        kg = Decimal(str(bats.get(key, 0) or 0))
-        if kg > 0:
-            subtotal += kg * rate
-            total_w += kg
-
-    q2 = lambda x: x.quantize(Decimal("0.01"), rounding=ROUND_HALF_UP)
-    return q2(subtotal), q2(total_w)
-
-def _fetch_collection(db: Session, cid: str) -> dict | None:
-    rec = db.execute(
-        text("""SELECT collection_id, client_company_id, status, batteries,
-                       total_weight, total_cost, created_at, validated_at
-                FROM collections
-               WHERE collection_id = :cid"""),
-        {"cid": cid},
-    ).mappings().first()
-    if not rec:
-        return None
-    bats = _parse_json(rec["batteries"])
-    out = dict(rec)
-    out["batteries"] = bats
-    out["batteries_summary"] = _batteries_summary(bats)
+    return ", ".join(f"{k}: {v}" for k, v in _battery_entries(bats))
+
+def _write_lines(db: Session, collection_id: str, bats: dict) -> None:
+    rows = [{"c": collection_id, "k": k, "q": str(v)} for k, v in _battery_entries(bats)]
+    if rows:
+        db.execute(
+            text("INSERT INTO collection_lines (collection_id, category, quantity) VALUES (:c, :k, :q)"),
+            rows,
+        )
+
+def _qty(q: Decimal) -> int | float:
+    return int(q) if q == q.to_integral_value() else float(q)
+
+def _all_categories(bats: dict) -> dict:
+    # CollectionOut.batteries: toate categoriile, cu 0 pentru cele lipsă
+    return {k: bats.get(k, 0) for k in PORTABLE_KEYS + KG_KEYS}
+
+def _lines_by_collection(db: Session, ids: list) -> dict:
+    """{collection_id: {categorie: cantitate}} pentru o pagină, dintr-o singură interogare."""
+    if not ids:
+        return {}
+    q = text("""
+        SELECT collection_id, category, quantity
+          FROM collection_lines
+         WHERE collection_id IN :ids
+    """).bindparams(bindparam("ids", expanding=True))
+    out: dict = {}
+    for r in db.execute(q, {"ids": ids}):
+        out.setdefault(str(r[0]), {})[r[1]] = _qty(r[2])
     return out
 
+def _q2(n: Decimal) -> Decimal:
+    return n.quantize(Decimal("0.01"), rounding=ROUND_HALF_UP)
+
+def _collection_out(row, **changes) -> dict:
+    """Răspunsul CollectionOut din rândul deja citit (FOR UPDATE), fără încă un SELECT."""
+    out = {
+        "collection_id": row["collection_id"],
+        "client_company_id": row["client_company_id"],
+        "status": row["status"],
+        "batteries": _all_categories(dict(_battery_entries(_parse_json(row["batteries"])))),
+        "total_weight": row["total_weight"],
+        "total_cost": row["total_cost"],
+        "batteries_summary": row["batteries_summary"],
+        "created_at": row["created_at"],
+        "validated_at": row["validated_at"],
+    }
+    out.update(changes)
+    return out
+
+_SCOPE_COLUMNS = """c.collection_id, c.client_company_id, c.status, c.batteries_summary,
+                        c.total_weight, c.total_cost, c.created_at, c.validated_at"""
+
+def _collections_from(
+    role: str | None,
+    company_id: str,
+    status: str | None,
+    client_company_id: str | None,
+    created_from: datetime | None,
+    created_to: datetime | None,
+) -> tuple[str, list[str], dict] | None:
+    """FROM-ul (`collections AS c` + join-urile rolului), condițiile și parametrii comuni."""
+    where: list[str] = []
+    params: dict = {}
+
+    if role == "CLIENT":
+        from_sql = "FROM collections AS c"
+        where.append("c.client_company_id = :cid")
+        params["cid"] = company_id
+
+    elif role == "BASE":
+        from_sql = """FROM collections AS c
+             INNER JOIN collaborations AS col
+                     ON col.client_company_id = c.client_company_id"""
+        where.append("col.base_company_id = :cid")
+        where.append("col.status = 'ACTIVE'")
+        params["cid"] = company_id
+
+    elif role == "ADMIN":
+        from_sql = "FROM collections AS c"
+    else:
+        return None
+
+    if client_company_id and role != "CLIENT":
+        where.append("c.client_company_id = :filter_client")
+        params["filter_client"] = client_company_id
+    if status:
+        where.append("c.status = :status")
+        params["status"] = status
+    if created_from:
+        where.append("c.created_at >= :created_from")
+        params["created_from"] = created_from
+    if created_to:
+        where.append("c.created_at < :created_to")
+        params["created_to"] = created_to
+    return from_sql, where, params
+
+def _collections_scope(
+    role: str | None,
+    company_id: str,
+    status: str | None,
+    client_company_id: str | None,
+    created_from: datetime | None,
+    created_to: datetime | None,
+    extra_columns: str = "",
+) -> tuple[str, list[str], dict] | None:
+    """SELECT-ul, condițiile și parametrii comuni listării și exportului, după rol."""
+    scope = _collections_from(role, company_id, status, client_company_id, created_from, created_to)
+    if scope is None:
+        return None
+    from_sql, where, params = scope
+    if role == "BASE":
+        sql = f"""SELECT {_SCOPE_COLUMNS}, comp.name AS client_name{extra_columns}
+                   {from_sql}
+              LEFT JOIN companies AS comp
+                     ON comp.company_id = c.client_company_id"""
+    else:
+        sql = f"""SELECT {_SCOPE_COLUMNS}{extra_columns}
+                   {from_sql}"""
+    return sql, where, params
+
 # ----- Endpoints -------------------------------------------------------------
 
 @router.post("", response_model=CollectionOut)
 def create_collection(
     payload: CollectionCreate,
+    response: Response,
+    idempotency_key: Optional[str] = Header(None, alias=idempotency.HEADER),
     claims = Depends(get_current_user_claims),
     db: Session = Depends(get_db),
 ):
@@ -124,96 +182,107 @@ def create_collection(
     if not client_company_id:
         raise HTTPException(status_code=422, detail="Fără firmă asociată")
 
-    # 1) Normalizează JSON-ul
-    bats = _parse_json(payload.batteries)
+    # o reîncercare cu același Idempotency-Key primește răspunsul primei cereri
+    with idempotency.guard(db, str(client_company_id), "collections.create", idempotency_key, payload) as idem:
+        if idem.replayed:
+            response.headers[idempotency.REPLAYED_HEADER] = "true"
+            return idem.response
 
-    # 2) Calculează server-side total_weight & total_cost
-    subtotal, total_w = _compute_server_totals(bats)
+        # 1) Normalizează JSON-ul
+        bats = _parse_json(payload.batteries)
 
-    # 3) Inserează
-    db.execute(
-        text("""INSERT INTO collections (client_company_id, status, batteries, total_weight, total_cost)
-                VALUES (:cid, 'PENDING', :bats, :w, :c)"""),
-        {
-            "cid": client_company_id,
-            "bats": json.dumps(bats),
-            "w": str(total_w),
-            "c": str(subtotal),
+        # 2) Calculează server-side total_weight & total_cost
+        created_at = datetime.now()
+        subtotal, total_w = totals_as_decimal(*price_totals(bats, tariff_book.for_date(db, created_at)))
+
+        # 3) Inserează colectarea, liniile pe categorii și rezumatul precalculat;
+        #    id-ul și created_at se generează aici, ca răspunsul să nu mai fie recitit din DB
+        collection_id = str(uuid.uuid4())
+        summary = _batteries_summary(bats)
+        db.execute(
+            text("""INSERT INTO collections (collection_id, client_company_id, status, batteries,
+                                             batteries_summary, total_weight, total_cost, created_at)
+                    VALUES (:id, :cid, 'PENDING', :bats, :summary, :w, :c, :at)"""),
+            {
+                "id": collection_id,
+                "cid": client_company_id,
+                "bats": json.dumps(bats),
+                "summary": summary,
+                "w": str(total_w),
+                "c": str(subtotal),
+                "at": created_at,
+            }
+        )
+        _write_lines(db, collection_id, bats)
+        aggregates.record_collection_created(db, client_company_id, created_at, total_w, subtotal)
+
+        # 4) Răspunsul din ce tocmai am scris, salvat pentru reîncercări odată cu colectarea
+        out = {
+            "collection_id": collection_id,
+            "client_company_id": client_company_id,
+            "status": "PENDING",
+            "batteries": _all_categories(dict(_battery_entries(bats))),
+            "total_weight": total_w,
+            "total_cost": subtotal,
+            "batteries_summary": summary,
+            "created_at": created_at,
+            "validated_at": None,
         }
-    )
-    db.commit()
-
-    # 4) Returnează ultimul rând al clientului (sau FETCH BY ID dacă preferi)
-    row = db.execute(
-        text("""SELECT collection_id, client_company_id, status, batteries,
-                       total_weight, total_cost, created_at, validated_at
-                FROM collections
-                WHERE client_company_id = :cid
-                ORDER BY created_at DESC
-                LIMIT 1"""),
-        {"cid": client_company_id}
-    ).mappings().first()
-
-    result = dict(row)
-    result["batteries"] = _parse_json(result["batteries"])
-    result["batteries_summary"] = _batteries_summary(result["batteries"])
-    return result
+        idem.store(out)
+        db.commit()
+        return out
 
 @router.get("", response_model=list[CollectionOut])
 def list_collections(
+    response: Response,
+    status: Optional[CollectionStatus] = None,
+    client_company_id: Optional[str] = None,
+    created_from: Optional[datetime] = None,
+    created_to: Optional[datetime] = None,
+    cursor: Optional[str] = None,
+    limit: int = Query(100, ge=1, le=500),
     claims = Depends(get_current_user_claims),
     db: Session = Depends(get_db),
 ):
+    """
+    Paginare keyset pe (created_at, collection_id), descrescător.
+    Cursorul paginii următoare vine în headerul X-Next-Cursor (lipsește la ultima pagină).
+    """
     role = claims.get("role")
     company_id = claims.get("company_id")
     if not company_id:
         return []
 
-    if role == "CLIENT":
-        rows = db.execute(
-            text("""SELECT collection_id, client_company_id, status, batteries,
-                           total_weight, total_cost, created_at, validated_at
-                    FROM collections
-                   WHERE client_company_id = :cid
-                   ORDER BY created_at DESC"""),
-            {"cid": company_id},
-        ).mappings().all()
+    scope = _collections_scope(role, company_id, status, client_company_id, created_from, created_to)
+    if scope is None:
+        return []
+    sql, where, params = scope
+    params["lim"] = limit + 1
 
-    elif role == "BASE":
-        rows = db.execute(
-            text("""SELECT c.collection_id, c.client_company_id, comp.name AS client_name, c.status, c.batteries,
-                           c.total_weight, c.total_cost, c.created_at, c.validated_at
-                      FROM collections AS c
-                INNER JOIN collaborations AS col
-                        ON col.client_company_id = c.client_company_id
-                      LEFT JOIN companies AS comp                         -- ← JOIN lipsă
-                ON comp.company_id = c.client_company_id
-                     WHERE col.base_company_id = :cid
-                       AND col.status = 'ACTIVE'
-                  ORDER BY c.created_at DESC"""),
-            {"cid": company_id},
-        ).mappings().all()
+    if cursor:
+        params["cur_ts"], params["cur_id"] = decode_cursor(cursor)
+        where.append(keyset_clause("c.created_at", "c.collection_id"))
 
-    elif role == "ADMIN":
-        rows = db.execute(
-            text("""SELECT collection_id, client_company_id, status, batteries,
-                           total_weight, total_cost, created_at, validated_at
-                      FROM collections
-                  ORDER BY created_at DESC""")
-        ).mappings().all()
-    else:
-        rows = []
+    if where:
+        sql += "\n WHERE " + "\n   AND ".join(where)
+    sql += "\n ORDER BY c.created_at DESC, c.collection_id DESC\n LIMIT :lim"
 
+    rows = db.execute(text(sql), params).mappings().all()
+    if len(rows) > limit:
+        rows = rows[:limit]
+        last = rows[-1]
+        response.headers[NEXT_CURSOR_HEADER] = encode_cursor(last["created_at"], str(last["collection_id"]))
+
+    lines = _lines_by_collection(db, [str(r["collection_id"]) for r in rows])
     result = []
     for r in rows:
-        bats = _parse_json(r["batteries"])
         result.append({
             "collection_id": str(r["collection_id"]),
             "client_company_id": str(r["client_company_id"]),
             "client_name": r.get("client_name"),
             "status": r["status"],
-            "batteries": bats,
-            "batteries_summary": _batteries_summary(bats),
+            "batteries": _all_categories(lines.get(str(r["collection_id"]), {})),
+            "batteries_summary": r["batteries_summary"],
             "total_weight": r["total_weight"],
             "total_cost": r["total_cost"],
             "created_at": r["created_at"],
@@ -221,6 +290,103 @@ def list_collections(
         })
     return result
 
+@router.get("/export")
+def export_collections(
+    format: ExportFormat = "csv",
+    status: Optional[CollectionStatus] = None,
+    client_company_id: Optional[str] = None,
+    created_from: Optional[datetime] = None,
+    created_to: Optional[datetime] = None,
+    claims = Depends(get_current_user_claims),
+):
+    """Export CSV/NDJSON în flux, câte o coloană per categorie de baterii (etichete din rates.py)."""
+    role = claims.get("role")
+    company_id = claims.get("company_id")
+    if not company_id:
+        raise HTTPException(403, "Utilizatorul nu este asociat unei companii")
+    # pivot din collection_lines: o subinterogare pe cheia primară per categorie
+    pivot = "".join(
+        f""",
+                        (SELECT l.quantity FROM collection_lines l
+                          WHERE l.collection_id = c.collection_id AND l.category = '{k}') AS {k}"""
+        for k in PORTABLE_KEYS + KG_KEYS
+    )
+    scope = _collections_scope(role, company_id, status, client_company_id, created_from, created_to,
+                               extra_columns=pivot)
+    if scope is None:
+        raise HTTPException(403, "Neautorizat")
+    sql, where, params = scope
+    if where:
+        sql += "\n WHERE " + "\n   AND ".join(where)
+    sql += "\n ORDER BY c.created_at, c.collection_id"
+
+    columns = [
+        ("collection_id", "ID colectare"),
+        ("client_company_id", "ID client"),
+        ("client_name", "Client"),
+        ("status", "Status"),
+        ("created_at", "Creată la"),
+        ("validated_at", "Validată la"),
+        ("total_weight", "Greutate totală (kg)"),
+        ("total_cost", "Cost total (RON)"),
+    ]
+    columns += [(k, f"{LABELS[k]} (buc)") for k in PORTABLE_KEYS]
+    columns += [(k, f"{LABELS[k]} (kg)") for k in KG_KEYS]
+
+    def rows():
+        for r in stream_query(sql, params):
+            out = dict(r)
+            for k in PORTABLE_KEYS + KG_KEYS:
+                out[k] = _qty(out[k]) if out[k] is not None else 0
+            yield out
+
+    return export_response(format, "colectari", columns, rows())
+
+@router.get("/by-category", response_model=list[CollectionCategoryTotal])
+def collections_by_category(
+    status: Optional[CollectionStatus] = None,
+    client_company_id: Optional[str] = None,
+    created_from: Optional[datetime] = None,
+    created_to: Optional[datetime] = None,
+    claims = Depends(get_current_user_claims),
+    db: Session = Depends(get_db),
+):
+    """Cantitatea totală per categorie de baterii (SUM pe collection_lines), în aceleași filtre ca listarea."""
+    role = claims.get("role")
+    company_id = claims.get("company_id")
+    if not company_id:
+        raise HTTPException(403, "Utilizatorul nu este asociat unei companii")
+    scope = _collections_from(role, company_id, status, client_company_id, created_from, created_to)
+    if scope is None:
+        raise HTTPException(403, "Neautorizat")
+    from_clause, where, params = scope
+
+    where_sql = ("\n WHERE " + "\n   AND ".join(where)) if where else ""
+    rows = db.execute(
+        text(f"""
+        SELECT l.category, SUM(l.quantity) AS quantity, COUNT(*) AS collections
+          {from_clause}
+          JOIN collection_lines l ON l.collection_id = c.collection_id
+        {where_sql}
+         GROUP BY l.category
+        """),
+        params,
+    ).mappings().all()
+
+    order = {k: i for i, k in enumerate(PORTABLE_KEYS + KG_KEYS)}
+    out = [
+        {
+            "category": r["category"],
+            "label": LABELS.get(r["category"]),
+            "unit": "kg" if r["category"] in KG_KEYS else "buc",
+            "quantity": float(r["quantity"]),
+            "collections": int(r["collections"]),
+        }
+        for r in rows
+    ]
+    out.sort(key=lambda x: (order.get(x["category"], len(order)), x["category"]))
+    return out
+
 @router.get("/{collection_id}", response_model=CollectionOut)
 def get_collection(
     collection_id: str,
@@ -232,7 +398,7 @@ def get_collection(
 
     if role == "CLIENT":
         row = db.execute(
-            text("""SELECT collection_id, client_company_id, status, batteries,
+            text("""SELECT collection_id, client_company_id, status, batteries_summary,
                            total_weight, total_cost, created_at, validated_at
                       FROM collections
                      WHERE collection_id = :cid
@@ -242,7 +408,7 @@ def get_collection(
 
     elif role == "BASE":
         row = db.execute(
-            text("""SELECT c.collection_id, c.client_company_id, c.status, c.batteries,
+            text("""SELECT c.collection_id, c.client_company_id, c.status, c.batteries_summary,
                            c.total_weight, c.total_cost, c.created_at, c.validated_at
                       FROM collections c
                       JOIN collaborations col
@@ -254,7 +420,7 @@ def get_collection(
 
     elif role == "ADMIN":
         row = db.execute(
-            text("""SELECT collection_id, client_company_id, status, batteries,
+            text("""SELECT collection_id, client_company_id, status, batteries_summary,
                            total_weight, total_cost, created_at, validated_at
                       FROM collections
                      WHERE collection_id = :cid"""),
@@ -266,13 +432,14 @@ def get_collection(
     if not row:
         raise HTTPException(404, "Colectarea nu există")
 
-    bats = _parse_json(row["batteries"])
     return {
         "collection_id": str(row["collection_id"]),
         "client_company_id": str(row["client_company_id"]),
         "status": row["status"],
-        "batteries": bats,
-        "batteries_summary": _batteries_summary(bats),
+        "batteries": _all_categories(
+            _lines_by_collection(db, [str(row["collection_id"])]).get(str(row["collection_id"]), {})
+        ),
+        "batteries_summary": row["batteries_summary"],
         "total_weight": row["total_weight"],
         "total_cost": row["total_cost"],
         "created_at": row["created_at"],
@@ -282,272 +449,329 @@ def get_collection(
 @router.post("/{collection_id}/validate", response_model=CollectionOut)
 def validate_collection(
     collection_id: str,
+    response: Response,
+    idempotency_key: Optional[str] = Header(None, alias=idempotency.HEADER),
     claims = Depends(get_current_user_claims),
     db: Session = Depends(get_db),
 ):
     if claims.get("role") != "BASE":
         raise HTTPException(403, "Doar utilizatorii BASE pot valida colectări")
 
-    row = db.execute(
-        text("""
-        SELECT  col.collection_id,
-                col.client_company_id,
-                col.status,
-                col.batteries,
-                col.total_weight,
-                col.total_cost,
-                co.base_company_id,
-                co.status AS collaboration_status
-          FROM collections col
-          JOIN collaborations co ON co.client_company_id = col.client_company_id
-         WHERE col.collection_id = :cid
-         FOR UPDATE
-        """),
-        {"cid": collection_id}
-    ).mappings().first()
-
-    if not row:
-        raise HTTPException(404, "Colectarea nu există")
-    if str(row["base_company_id"]) != str(claims.get("company_id")):
-        raise HTTPException(403, "Nu poți valida colectări care nu aparțin companiei tale")
-    if row["collaboration_status"] != "ACTIVE":
-        raise HTTPException(409, "Colaborarea nu este activă")
-
-    # dacă e deja validată, întoarce-o normalizată
-    if row["status"] == "VALIDATED":
-        col = _fetch_collection(db, row["collection_id"])
-        if not col:
-            raise HTTPException(404, "Colectarea nu există")
-        return col
-
-    base_company_id   = str(row["base_company_id"])
-    client_company_id = str(row["client_company_id"])
-
-    ok, why = billing_ready(db, base_company_id, client_company_id)
-    if not ok:
-        raise HTTPException(422, detail=why)
-
-    sett = db.execute(
-        text("""
-        SELECT base_company_id, series_code, next_number, year_reset, due_days, default_vat_rate
-          FROM company_invoice_settings
-         WHERE base_company_id = :cid
-         FOR UPDATE
-        """),
-        {"cid": base_company_id}
-    ).mappings().first()
-    if not sett:
-        raise HTTPException(422, detail="Lipsește configurarea de numerotare pentru BAZĂ")
-
-    series     = sett["series_code"] or "INV"
-    num        = int(sett["next_number"] or 1)
-    year_reset = bool(sett["year_reset"])
-    due_days   = int(sett["due_days"] or 15)
-    vat_rate   = Decimal(str(sett["default_vat_rate"] or 19))
-
-    today  = date.today()
-    inv_no = f"{series}-{today.year}-{num:06d}" if year_reset else f"{series}-{num:06d}"
-
-    # rezervăm numărul
-    db.execute(
-        text("UPDATE company_invoice_settings SET next_number = next_number + 1 WHERE base_company_id = :cid"),
-        {"cid": base_company_id}
-    )
-
-    # -------- construiți liniile din baterii --------
-    batteries = _parse_json(row["batteries"] or {})
-
-    def q2(n: Decimal) -> Decimal:
-        return n.quantize(Decimal("0.01"), rounding=ROUND_HALF_UP)
-
-    lines: list[dict] = []
-    subtotal = Decimal("0")
-    total_weight = Decimal("0")
-
-    # portabile (buc)
-    for key in PORTABLE_KEYS:
-        qty_raw = batteries.get(key) or 0
-        qty = Decimal(str(qty_raw))
-        if qty <= 0:
-            continue
-        unit_price = Decimal(str(PORTABLE_RATES[key]))
-        line_total = q2(qty * unit_price)
-        weight_kg  = q2(qty * Decimal(str(PORTABLE_WEIGHTS_KG[key])))
-
-        lines.append({
-            "description": f"{LABELS[key]} (portabil)",
-            "qty": qty,
-            "unit": "buc",
-            "unit_price": unit_price,
-            "line_total": line_total,
-            "weight_kg": weight_kg,
-        })
-        subtotal     += line_total
-        total_weight += weight_kg
-
-    # auto/industrial (kg)
-    for key in KG_KEYS:
-        w_raw = batteries.get(key) or 0
-        w = Decimal(str(w_raw))
-        if w <= 0:
-            continue
-        unit_price = Decimal(str(KG_RATES[key]))
-        line_total = q2(w * unit_price)
-
-        lines.append({
-            "description": LABELS[key],
-            "qty": w,
-            "unit": "kg",
-            "unit_price": unit_price,
-            "line_total": line_total,
-            "weight_kg": w,
-        })
-        subtotal     += line_total
-        total_weight += w
-
-    subtotal   = q2(subtotal)
-    vat_amount = q2(subtotal * vat_rate / Decimal("100"))
-    total      = q2(subtotal + vat_amount)
-
-    # sincronizează totalurile în colecție (opțional, dar util)
-    db.execute(
-        text("""UPDATE collections
-                   SET total_weight = :tw, total_cost = :tc
-                 WHERE collection_id = :cid"""),
-        {"tw": str(total_weight), "tc": str(subtotal), "cid": row["collection_id"]},
-    )
-
-    # -------- header factură --------
-    inv_id = str(uuid.uuid4())
-    db.execute(
-        text("""
-        INSERT INTO invoices(
-            invoice_id, base_company_id, client_company_id, collection_id,
-            invoice_number, issue_date, due_date, currency,
-            vat_rate, subtotal, vat_amount, total, status
-        )
-        VALUES(
-            :id, :b, :c, :col,
-            :no, :iss, :due, 'RON',
-            :vr, :sub, :vat, :tot, 'ISSUED'
-        )
-        """),
-        {
-            "id": inv_id,
-            "b": base_company_id,
-            "c": client_company_id,
-            "col": row["collection_id"],
-            "no": inv_no,
-            "iss": today,
-            "due": today + timedelta(days=due_days),
-            "vr": str(vat_rate),
-            "sub": str(subtotal),
-            "vat": str(vat_amount),
-            "tot": str(total),
-        }
-    )
+    # o reîncercare primește răspunsul salvat, fără să mai blocheze colectarea
+    with idempotency.guard(db, str(claims.get("company_id")), "collections.validate",
+                           idempotency_key, {"collection_id": collection_id}) as idem:
+        if idem.replayed:
+            response.headers[idempotency.REPLAYED_HEADER] = "true"
+            return idem.response
 
-    # -------- linii factură --------
-    line_no = 1
-    for ln in lines:
-        db.execute(
+        row = db.execute(
             text("""
-            INSERT INTO invoice_items (invoice_id, line_no, description, qty, unit, unit_price, line_total)
-            VALUES (:inv, :no, :desc, :qty, :unit, :price, :total)
+            SELECT  col.collection_id,
+                    col.client_company_id,
+                    col.status,
+                    col.batteries,
+                    col.total_weight,
+                    col.total_cost,
+                    col.created_at,
+                    col.batteries_summary,
+                    col.validated_at,
+                    co.base_company_id,
+                    co.status AS collaboration_status
+              FROM collections col
+              JOIN collaborations co ON co.client_company_id = col.client_company_id
+             WHERE col.collection_id = :cid
+             FOR UPDATE
             """),
-            {
-                "inv": inv_id,
-                "no": line_no,
-                "desc": ln["description"],
-                "qty": str(q2(Decimal(str(ln["qty"])))),
-                "unit": ln["unit"],
-                "price": str(q2(Decimal(str(ln["unit_price"])))),
-                "total": str(q2(Decimal(str(ln["line_total"])))),
-            }
-        )
-        line_no += 1
-
-    # profile pentru PDF
-    base_profile = db.execute(text("""
-      SELECT c.name AS company_name, c.cui, p.legal_name, p.address_line, p.city, p.county,
-             p.postal_code, COALESCE(p.country,'RO') AS country, p.bank_name, p.iban,
-             p.email_billing, p.phone_billing
-        FROM companies c
-        LEFT JOIN company_billing_profiles p ON p.company_id = c.company_id
-       WHERE c.company_id = :cid
-    """), {"cid": base_company_id}).mappings().first()
-
-    client_profile = db.execute(text("""
-      SELECT c.name AS company_name, c.cui, p.legal_name, p.address_line, p.city, p.county,
-             p.postal_code, COALESCE(p.country,'RO') AS country, p.bank_name, p.iban,
-             p.email_billing, p.phone_billing
-        FROM companies c
-        LEFT JOIN company_billing_profiles p ON p.company_id = c.company_id
-       WHERE c.company_id = :cid
-    """), {"cid": client_company_id}).mappings().first()
-
-    invoice_dict = {
-        "invoice_number": inv_no,
-        "issue_date": today.isoformat(),
-        "due_date": (today + timedelta(days=due_days)).isoformat(),
-        "currency": "RON",
-        "vat_rate": str(vat_rate),
-        "subtotal": str(subtotal),
-        "vat_amount": str(vat_amount),
-        "total": str(total),
-    }
-
-    # pregătește linii pentru PDF (include și greutatea, dacă vrei să o afișezi)
-    pdf_items = []
-    for i, ln in enumerate(lines, start=1):
-        pdf_items.append({
-            "line_no": i,
-            "description": ln["description"],
-            "qty": str(q2(Decimal(str(ln["qty"])))),
-            "unit": ln["unit"],
-            "unit_price": str(q2(Decimal(str(ln["unit_price"])))),
-            "line_total": str(q2(Decimal(str(ln["line_total"])))),
-            "weight_kg": str(q2(Decimal(str(ln["weight_kg"])))),
-        })
-
-    pdf_bytes = render_invoice_pdf(
-        invoice=invoice_dict,
-        items=pdf_items,
-        base_profile=dict(base_profile) if base_profile else {},
-        client_profile=dict(client_profile) if client_profile else {},
-    )
-
-    out_dir = Path("files/invoices")
-    out_dir.mkdir(parents=True, exist_ok=True)
-    pdf_path = out_dir / f"{inv_id}.pdf"
-    pdf_path.write_bytes(pdf_bytes)
+            {"cid": collection_id}
+        ).mappings().first()
 
-    db.execute(
-        text("UPDATE invoices SET pdf_path = :p WHERE invoice_id = :id"),
-        {"p": str(pdf_path), "id": inv_id}
-    )
+        if not row:
+            raise HTTPException(404, "Colectarea nu există")
+        if str(row["base_company_id"]) != str(claims.get("company_id")):
+            raise HTTPException(403, "Nu poți valida colectări care nu aparțin companiei tale")
+        if row["collaboration_status"] != "ACTIVE":
+            raise HTTPException(409, "Colaborarea nu este activă")
+
+        # dacă e deja validată, întoarce-o normalizată
+        if row["status"] == "VALIDATED":
+            return _collection_out(row)
+
+        base_company_id   = str(row["base_company_id"])
+        client_company_id = str(row["client_company_id"])
+
+        # profiluri + setări într-o singură interogare; fără FOR UPDATE pe setări,
+        # numărul vine din app/services/numbering.py
+        billing = load_billing_context(db, base_company_id, client_company_id)
+        ok, why = billing.ready()
+        if not ok:
+            raise HTTPException(422, detail=why)
+
+        sett = billing.settings
+        if not sett:
+            raise HTTPException(422, detail="Lipsește configurarea de numerotare pentru BAZĂ")
+
+        series     = sett["series_code"] or "INV"
+        year_reset = bool(sett["year_reset"])
+        due_days   = int(sett["due_days"] or 15)
+        vat_rate   = Decimal(str(sett["default_vat_rate"] or 19))
+
+        validated_at = datetime.now()
+        today = validated_at.date()
+
+        # -------- construiți liniile din baterii --------
+        # tariful în vigoare la crearea colectării, nu la validare
+        quote = price(_parse_json(row["batteries"] or {}), tariff_book.for_date(db, row["created_at"]))
+        subtotal, total_weight = quote.subtotal, quote.total_weight
+
+        vat_amount = _q2(subtotal * vat_rate / Decimal("100"))
+        total      = _q2(subtotal + vat_amount)
+
+        # numărul se alocă abia acum, într-o tranzacție scurtă și separată; până la commit
+        # rămâne rezervat, iar la eșec se eliberează pentru refolosire
+        actor = str(claims.get("sub"))
+        [(num, inv_no)] = numbering.allocate(base_company_id, series, year_reset, today, 1, actor)
+        try:
+            # sincronizează totalurile în colecție (opțional, dar util)
+            db.execute(
+                text("""UPDATE collections
+                           SET total_weight = :tw, total_cost = :tc
+                         WHERE collection_id = :cid"""),
+                {"tw": str(total_weight), "tc": str(subtotal), "cid": row["collection_id"]},
+            )
+            aggregates.record_collections_validated(db, [{
+                "c": client_company_id,
+                "m": aggregates.month_of(row["created_at"]),
+                "dw": str(total_weight - (row["total_weight"] or 0)),
+                "dc": str(subtotal - (row["total_cost"] or 0)),
+            }])
+
+            # -------- factura: header + toate liniile, câte un INSERT per tabel --------
+            writer = InvoiceWriter(db)
+            inv_id = writer.add(
+                base_company_id=base_company_id,
+                client_company_id=client_company_id,
+                collection_id=str(row["collection_id"]),
+                invoice_number=inv_no,
+                issue_date=today,
+                due_date=today + timedelta(days=due_days),
+                vat_rate=vat_rate,
+                quote=quote,
+                vat_amount=vat_amount,
+                total=total,
+                base_profile=billing.base.fields,
+                client_profile=billing.client.fields,
+            )
+            writer.flush()
+
+            aggregates.record_invoices(db, [{
+                "b": base_company_id, "c": client_company_id, "m": aggregates.month_of(today),
+                "sub": str(subtotal), "vat": str(vat_amount), "tot": str(total),
+            }])
+
+            # PDF-ul se randează după commit, în afara lock-urilor (app/services/render_queue.py)
+            enqueue_render(db, inv_id)
+
+            db.execute(
+                text("UPDATE collections SET status='VALIDATED', validated_at=:at WHERE collection_id=:cid"),
+                {"at": validated_at, "cid": row["collection_id"]}
+            )
+
+            db.execute(
+                text("""INSERT INTO audit_logs(actor_user_id, actor_company_id, action, details)
+                        VALUES (:uid, :cid, 'INVOICE_CREATED', :d)"""),
+                {
+                    "uid": str(claims.get("sub")),
+                    "cid": base_company_id,
+                    "d": json.dumps({
+                        "collection_id": str(collection_id),
+                        "invoice_id": inv_id,
+                        "invoice_number": inv_no
+                    }),
+                }
+            )
+            out = _collection_out(
+                row, status="VALIDATED", total_weight=total_weight, total_cost=subtotal, validated_at=validated_at,
+            )
+            idem.store(out)
+            numbering.confirm(db, base_company_id, series, year_reset, today, [num])
+            db.commit()
+        except BaseException:
+            db.rollback()
+            numbering.release(base_company_id, series, year_reset, today, [num], "validare eșuată", actor)
+            raise
+        render_pool.notify()
+        return out
+
+@router.post("/validate-batch", response_model=list[CollectionValidateResult])
+def validate_collections_batch(
+    payload: CollectionValidateBatchIn,
+    response: Response,
+    idempotency_key: Optional[str] = Header(None, alias=idempotency.HEADER),
+    claims = Depends(get_current_user_claims),
+    db: Session = Depends(get_db),
+):
+    """
+    Validează mai multe colectări într-o singură tranzacție: o singură alocare de
+    numere de factură (app/services/numbering.py) și inserări bulk pentru facturi și linii.
+    Colectările cu probleme sunt raportate individual, fără să blocheze restul lotului.
+    """
+    if claims.get("role") != "BASE":
+        raise HTTPException(403, "Doar utilizatorii BASE pot valida colectări")
+    base_company_id = str(claims.get("company_id"))
 
-    db.execute(
-        text("UPDATE collections SET status='VALIDATED', validated_at=NOW(6) WHERE collection_id=:cid"),
-        {"cid": row["collection_id"]}
-    )
+    with idempotency.guard(db, base_company_id, "collections.validate-batch", idempotency_key,
+                           {"collection_ids": payload.collection_ids}) as idem:
+        if idem.replayed:
+            response.headers[idempotency.REPLAYED_HEADER] = "true"
+            return idem.response
 
-    db.execute(
-        text("""INSERT INTO audit_logs(actor_user_id, actor_company_id, action, details)
-                VALUES (:uid, :cid, 'INVOICE_CREATED', :d)"""),
-        {
-            "uid": str(claims.get("sub")),
-            "cid": base_company_id,
-            "d": json.dumps({
-                "collection_id": str(collection_id),
-                "invoice_id": inv_id,
-                "invoice_number": inv_no
-            }),
-        }
-    )
-    db.commit()
+        ids = list(dict.fromkeys(str(i) for i in payload.collection_ids))
 
-    col = _fetch_collection(db, row["collection_id"])
-    if not col:
-        raise HTTPException(404, "Colectarea nu există (după validare)")
-    return col
+        rows = db.execute(
+            text("""
+            SELECT  col.collection_id,
+                    col.client_company_id,
+                    col.status,
+                    col.batteries,
+                    col.total_weight,
+                    col.total_cost,
+                    col.created_at,
+                    co.status AS collaboration_status
+              FROM collections col
+              JOIN collaborations co
+                ON co.client_company_id = col.client_company_id
+               AND co.base_company_id = :b
+             WHERE col.collection_id IN :ids
+             FOR UPDATE
+            """).bindparams(bindparam("ids", expanding=True)),
+            {"b": base_company_id, "ids": ids},
+        ).mappings().all()
+        by_id = {str(r["collection_id"]): r for r in rows}
+
+        results: dict[str, dict] = {}
+        todo: list = []
+        ready_by_client: dict[str, tuple[bool, str]] = {}
+        for cid in ids:
+            r = by_id.get(cid)
+            if not r:
+                results[cid] = {"collection_id": cid, "result": "ERROR", "detail": "Colectarea nu există"}
+                continue
+            if r["collaboration_status"] != "ACTIVE":
+                results[cid] = {"collection_id": cid, "result": "ERROR", "detail": "Colaborarea nu este activă"}
+                continue
+            if r["status"] == "VALIDATED":
+                results[cid] = {"collection_id": cid, "result": "ALREADY_VALIDATED"}
+                continue
+            client_company_id = str(r["client_company_id"])
+            if client_company_id not in ready_by_client:
+                ready_by_client[client_company_id] = load_billing_context(db, base_company_id, client_company_id).ready()
+            ok, why = ready_by_client[client_company_id]
+            if not ok:
+                results[cid] = {"collection_id": cid, "result": "ERROR", "detail": why}
+                continue
+            todo.append(r)
+
+        if todo:
+            # setările au venit deja cu verificarea primului client (memoizată în sesiune)
+            sett = load_billing_context(db, base_company_id, str(todo[0]["client_company_id"])).settings
+            if not sett:
+                raise HTTPException(422, detail="Lipsește configurarea de numerotare pentru BAZĂ")
+
+            series     = sett["series_code"] or "INV"
+            year_reset = bool(sett["year_reset"])
+            due_days   = int(sett["due_days"] or 15)
+            vat_rate   = Decimal(str(sett["default_vat_rate"] or 19))
+
+            today = date.today()
+            due   = today + timedelta(days=due_days)
+
+            # tot lotul dintr-o alocare; numerele refolosite pot face blocul necontiguu
+            actor = str(claims.get("sub"))
+            numbers = numbering.allocate(base_company_id, series, year_reset, today, len(todo), actor)
+
+            try:
+                writer = InvoiceWriter(db)
+                collection_rows: list[dict] = []
+                agg_collection_rows: list[dict] = []
+                audit_rows: list[dict] = []
+                for offset, r in enumerate(todo):
+                    cid = str(r["collection_id"])
+                    inv_no = numbers[offset][1]
+
+                    quote = price(_parse_json(r["batteries"] or {}), tariff_book.for_date(db, r["created_at"]))
+                    subtotal, total_weight = quote.subtotal, quote.total_weight
+                    vat_amount = _q2(subtotal * vat_rate / Decimal("100"))
+                    total      = _q2(subtotal + vat_amount)
+
+                    # memoizat în sesiune de verificarea ready() de mai sus
+                    billing = load_billing_context(db, base_company_id, str(r["client_company_id"]))
+                    inv_id = writer.add(
+                        base_company_id=base_company_id,
+                        client_company_id=str(r["client_company_id"]),
+                        collection_id=cid,
+                        invoice_number=inv_no,
+                        issue_date=today,
+                        due_date=due,
+                        vat_rate=vat_rate,
+                        quote=quote,
+                        vat_amount=vat_amount,
+                        total=total,
+                        base_profile=billing.base.fields,
+                        client_profile=billing.client.fields,
+                    )
+                    collection_rows.append({"tw": str(total_weight), "tc": str(subtotal), "cid": cid})
+                    agg_collection_rows.append({
+                        "c": str(r["client_company_id"]),
+                        "m": aggregates.month_of(r["created_at"]),
+                        "dw": str(total_weight - (r["total_weight"] or 0)),
+                        "dc": str(subtotal - (r["total_cost"] or 0)),
+                    })
+                    audit_rows.append({
+                        "uid": str(claims.get("sub")),
+                        "cid": base_company_id,
+                        "d": json.dumps({"collection_id": cid, "invoice_id": inv_id, "invoice_number": inv_no}),
+                    })
+                    results[cid] = {
+                        "collection_id": cid,
+                        "result": "VALIDATED",
+                        "invoice_id": inv_id,
+                        "invoice_number": inv_no,
+                    }
+
+                invoice_rows = writer.flush()
+                db.execute(
+                    text("""UPDATE collections
+                               SET total_weight = :tw, total_cost = :tc,
+                                   status = 'VALIDATED', validated_at = NOW(6)
+                             WHERE collection_id = :cid"""),
+                    collection_rows,
+                )
+                aggregates.record_collections_validated(db, agg_collection_rows)
+                aggregates.record_invoices(db, [
+                    {"b": i["b"], "c": i["c"], "m": aggregates.month_of(today),
+                     "sub": i["sub"], "vat": i["vat"], "tot": i["tot"]}
+                    for i in invoice_rows
+                ])
+                enqueue_renders(db, [i["id"] for i in invoice_rows])
+                db.execute(
+                    text("""INSERT INTO audit_logs(actor_user_id, actor_company_id, action, details)
+                            VALUES (:uid, :cid, 'INVOICE_CREATED', :d)"""),
+                    audit_rows,
+                )
+
+                out = [results[cid] for cid in ids]
+                idem.store(out)
+                numbering.confirm(db, base_company_id, series, year_reset, today, [n for n, _ in numbers])
+                db.commit()
+            except BaseException:
+                db.rollback()
+                numbering.release(base_company_id, series, year_reset, today, [n for n, _ in numbers],
+                                  "validare în lot eșuată", actor)
+                raise
+            render_pool.notify()
+        else:
+            out = [results[cid] for cid in ids]
+            idem.store(out)
+            db.commit()
+
+        return out
@@ -1,52 +1,26 @@
 from fastapi import APIRouter, Depends, HTTPException, Request
 from sqlalchemy import text
 from sqlalchemy.orm import Session
-from datetime import date
-import httpx, secrets, json, uuid
+import secrets, json, uuid
 
 from app.db import get_db
 from app.utils.security import get_current_user_claims
 from app.schemas.companies import InviteIn, InviteOut, CompanyMini, CollaborationOut
 from app.config import settings
 from .anaf import _sanitize_cui
+from app.services.anaf import anaf_client
 from app.utils.billing import upsert_billing_profile_from_anaf
+from app.utils.concurrency import run_db
+from app.utils.ratelimit import client_ip, rate_limit
 
 router = APIRouter(prefix="/companies", tags=["companies"])
 
 def _token() -> str:
     return secrets.token_urlsafe(32)
 
-@router.post("/invite", response_model=InviteOut)
-async def invite_company(payload: InviteIn, request: Request,
-                         claims = Depends(get_current_user_claims),
-                         db: Session = Depends(get_db)):
-
-    if claims.get("role") != "BASE":
-        raise HTTPException(status_code=403, detail="Doar utilizatorii BASE pot invita")
-    base_cid = str(claims.get("company_id"))
-    if not base_cid:
-        raise HTTPException(status_code=400, detail="Lipsește compania BASE a utilizatorului")
-
-    cui = _sanitize_cui(payload.cui)
-    if not (cui.isdigit() and 2 <= len(cui) <= 10):
-        raise HTTPException(status_code=400, detail="CUI invalid")
-
-    today = date.today().isoformat()
-    den = None
-    try:
-        async with httpx.AsyncClient(timeout=httpx.Timeout(6.0, connect=3.0)) as client:
-            r = await client.post("https://webservicesp.anaf.ro/api/PlatitorTvaRest/v9/tva",
-                                  json=[{"cui": int(cui), "data": today}],
-                                  headers={"Content-Type": "application/json", "Accept": "application/json"})
-        if r.status_code == 200:
-            raw = r.json()
-            found = (raw or {}).get("found") or []
-            if found:
-                dg = found[0].get("date_generale") or {}
-                den = (dg.get("denumire") or "").strip() or None
-    except Exception:
-        pass
-
+def _persist_invite(db: Session, base_cid: str, cui: str, den: str | None, raw,
+                    email: str, actor_user_id: str) -> tuple[str, dict]:
+    """Partea sincronă (DB) a invitației; rulează prin run_db, în afara event loop-ului."""
     # MySQL upsert
     db.execute(
         text("""
@@ -56,7 +30,7 @@ async def invite_company(payload: InviteIn, request: Request,
           name = COALESCE(VALUES(name), companies.name),
           email_contact = COALESCE(VALUES(email_contact), companies.email_contact)
         """),
-        {"den": den, "cui": cui, "email": str(payload.email)}
+        {"den": den, "cui": cui, "email": email}
     )
 
     row = db.execute(
@@ -65,12 +39,8 @@ async def invite_company(payload: InviteIn, request: Request,
     ).mappings().first()
     client_company_id = str(row["company_id"])
 
-    raw_cached = db.execute(
-        text("SELECT raw_response FROM anaf_queries WHERE cui=:cui ORDER BY created_at DESC LIMIT 1"),
-        {"cui": cui}
-    ).scalar()
-    if raw_cached:
-        upsert_billing_profile_from_anaf(db, client_company_id, raw_cached)
+    if raw:
+        upsert_billing_profile_from_anaf(db, client_company_id, raw)
 
     # collaborations -> PENDING (unique key on base_company_id+client_company_id)
     db.execute(
@@ -90,19 +60,55 @@ async def invite_company(payload: InviteIn, request: Request,
         INSERT INTO company_invitations(invitation_id, base_company_id, client_company_id, cui, invited_email, token)
         VALUES(:id,:b,:c,:cui,:email,:tok)
         """),
-        {"id": inv_id, "b": base_cid, "c": client_company_id, "cui": cui, "email": str(payload.email), "tok": token}
+        {"id": inv_id, "b": base_cid, "c": client_company_id, "cui": cui, "email": email, "tok": token}
     )
 
     db.execute(
         text("""INSERT INTO audit_logs(actor_user_id, actor_company_id, action, details)
                 VALUES(:uid, :cid, 'INVITE_SENT', :d)"""),
-        {"uid": str(claims.get("sub")), "cid": base_cid,
+        {"uid": actor_user_id, "cid": base_cid,
          "d": json.dumps({"invitation_id": inv_id, "client_company_id": client_company_id,
-                          "cui": cui, "email": str(payload.email)})}
+                          "cui": cui, "email": email})}
     )
 
     db.commit()
 
+    return token, dict(row)
+
+_invite_rate_limit = rate_limit(
+    "invite",
+    settings.invite_rate_limit_max_hits,
+    settings.rate_limit_window_seconds,
+)
+
+@router.post("/invite", response_model=InviteOut)
+async def invite_company(payload: InviteIn, request: Request,
+                         _: None = Depends(_invite_rate_limit),
+                         claims = Depends(get_current_user_claims),
+                         db: Session = Depends(get_db)):
+
+    if claims.get("role") != "BASE":
+        raise HTTPException(status_code=403, detail="Doar utilizatorii BASE pot invita")
+    base_cid = str(claims.get("company_id"))
+    if not base_cid:
+        raise HTTPException(status_code=400, detail="Lipsește compania BASE a utilizatorului")
+
+    cui = _sanitize_cui(payload.cui)
+    if not (cui.isdigit() and 2 <= len(cui) <= 10):
+        raise HTTPException(status_code=400, detail="CUI invalid")
+
+    raw = await anaf_client.lookup(db, cui, client_ip(request))
+    den = None
+    found = (raw.get("found") or []) if isinstance(raw, dict) else []
+    if found:
+        dg = found[0].get("date_generale") or {}
+        den = (dg.get("denumire") or "").strip() or None
+
+    token, row = await run_db(
+        _persist_invite, db, base_cid, cui, den, raw, str(payload.email), str(claims.get("sub"))
+    )
+    client_company_id = str(row["company_id"])
+
     invite_url = f"{settings.frontend_base_url.rstrip('/')}/invite/{token}"
     return {
         "token": token,
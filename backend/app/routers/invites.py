@@ -8,6 +8,7 @@ from pydantic import BaseModel, Field
 from app.db import get_db
 from app.utils.security import create_access_token
 from app.config import settings
+from app.services.billing_context import forget
 
 router = APIRouter(prefix="/invites", tags=["invites"])
 # @router.post("/accept", response_model=LoginOut)
@@ -187,6 +188,7 @@ def accept_invite(payload: AcceptInviteIn, db: Session = Depends(get_db)):
         """),
         {"cid": client_company_id, "p": phone},
     )
+    forget(db, client_company_id)
 
     # 7) Issue token and audit
     claims = {"sub": user_id, "role": "CLIENT", "company_id": client_company_id}
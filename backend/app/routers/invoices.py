@@ -1,22 +1,89 @@
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, Header, HTTPException, Query, Response
 from sqlalchemy.orm import Session
 from sqlalchemy import text, bindparam
-from app.db import get_db
+from app.db import SessionLocal, get_db
 from app.utils.security import get_current_user_claims
 from app.schemas.invoices import InvoiceOut, InvoiceItemOut
-from fastapi.responses import FileResponse
+from app.services.exports import ExportFormat, export_response, stream_query, zip_response
+from app.services.storage import BACKEND_ROOT, pdf_storage
+from app.services.render_queue import ensure_invoice_pdf
+from app.utils.pagination import NEXT_CURSOR_HEADER, encode_cursor, decode_cursor, keyset_clause
+from fastapi.responses import FileResponse, JSONResponse
 from pathlib import Path
+from datetime import date
+from typing import Optional
+import logging
+
+logger = logging.getLogger("app.invoices")
 
 router = APIRouter(prefix="/invoices", tags=["invoices"])
 
+_ITEM_COLUMNS = """
+          item_id,
+          invoice_id,
+          line_no,
+          description,
+          qty,
+          unit,
+          unit_price,
+          line_total
+"""
+
+def _items_by_invoice(db: Session, ids: list) -> dict:
+    if not ids:
+        return {}
+    q = text(f"""
+        SELECT {_ITEM_COLUMNS}
+        FROM invoice_items
+        WHERE invoice_id IN :ids
+        ORDER BY invoice_id, line_no
+    """).bindparams(bindparam("ids", expanding=True))
+    items_map: dict = {}
+    for it in db.execute(q, {"ids": ids}).mappings():
+        items_map.setdefault(it["invoice_id"], []).append(it)
+    return items_map
+
 @router.get("", response_model=list[InvoiceOut], response_model_exclude_none=False)
-def list_invoices(claims=Depends(get_current_user_claims), db: Session = Depends(get_db)):
+def list_invoices(
+    response: Response,
+    status: Optional[str] = None,
+    client_company_id: Optional[str] = None,
+    issue_from: Optional[date] = None,
+    issue_to: Optional[date] = None,
+    include_items: bool = False,
+    cursor: Optional[str] = None,
+    limit: int = Query(50, ge=1, le=200),
+    claims=Depends(get_current_user_claims),
+    db: Session = Depends(get_db),
+):
+    """
+    Paginare keyset pe (created_at, invoice_id), descrescător; cursorul următor vine în
+    X-Next-Cursor. Liniile se încarcă doar cu include_items=true (sau din /{id}/items).
+    """
     role = claims.get("role")
     cid = str(claims.get("company_id"))
     if role not in ("BASE", "CLIENT"):
         raise HTTPException(403, "Rol neacceptat")
 
-    where = "base_company_id = :cid" if role == "BASE" else "client_company_id = :cid"
+    # ambele ramuri folosesc idx_invoices_base_created / idx_invoices_client_created
+    where = ["base_company_id = :cid" if role == "BASE" else "client_company_id = :cid"]
+    params: dict = {"cid": cid, "lim": limit + 1}
+
+    if client_company_id and role == "BASE":
+        where.append("client_company_id = :filter_client")
+        params["filter_client"] = client_company_id
+    if status:
+        where.append("status = :status")
+        params["status"] = status
+    if issue_from:
+        where.append("issue_date >= :issue_from")
+        params["issue_from"] = issue_from
+    if issue_to:
+        where.append("issue_date <= :issue_to")
+        params["issue_to"] = issue_to
+    if cursor:
+        params["cur_ts"], params["cur_id"] = decode_cursor(cursor)
+        where.append(keyset_clause("created_at", "invoice_id"))
 
     rows = db.execute(
         text(f"""
@@ -35,34 +102,23 @@ def list_invoices(claims=Depends(get_current_user_claims), db: Session = Depends
           total,
           status,
           created_at,
-          pdf_path
+          pdf_path,
+          pdf_status,
+          tariff_version
         FROM invoices
-        WHERE {where}
-        ORDER BY created_at DESC
+        WHERE {" AND ".join(where)}
+        ORDER BY created_at DESC, invoice_id DESC
+        LIMIT :lim
         """),
-        {"cid": cid}
+        params
     ).mappings().all()
 
-    ids = [r["invoice_id"] for r in rows]
-    items_map = {}
-    if ids:
-        q = text("""
-            SELECT
-              item_id,
-              invoice_id,
-              line_no,
-              description,
-              qty,
-              unit,
-              unit_price,
-              line_total
-            FROM invoice_items
-            WHERE invoice_id IN :ids
-            ORDER BY invoice_id, line_no
-        """).bindparams(bindparam("ids", expanding=True))
-        items = db.execute(q, {"ids": ids}).mappings().all()
-        for it in items:
-            items_map.setdefault(it["invoice_id"], []).append(it)
+    if len(rows) > limit:
+        rows = rows[:limit]
+        last = rows[-1]
+        response.headers[NEXT_CURSOR_HEADER] = encode_cursor(last["created_at"], str(last["invoice_id"]))
+
+    items_map = _items_by_invoice(db, [r["invoice_id"] for r in rows]) if include_items else {}
 
     out: list[InvoiceOut] = []
     for r in rows:
@@ -73,6 +129,150 @@ def list_invoices(claims=Depends(get_current_user_claims), db: Session = Depends
         ))
     return out
 
+@router.get("/export")
+def export_invoices(
+    format: ExportFormat = "csv",
+    status: Optional[str] = None,
+    client_company_id: Optional[str] = None,
+    issue_from: Optional[date] = None,
+    issue_to: Optional[date] = None,
+    claims=Depends(get_current_user_claims),
+):
+    """Export CSV/NDJSON în flux: un rând per linie de factură (antetul se repetă)."""
+    role = claims.get("role")
+    cid = str(claims.get("company_id"))
+    if role not in ("BASE", "CLIENT"):
+        raise HTTPException(403, "Rol neacceptat")
+
+    where = ["i.base_company_id = :cid" if role == "BASE" else "i.client_company_id = :cid"]
+    params: dict = {"cid": cid}
+    if client_company_id and role == "BASE":
+        where.append("i.client_company_id = :filter_client")
+        params["filter_client"] = client_company_id
+    if status:
+        where.append("i.status = :status")
+        params["status"] = status
+    if issue_from:
+        where.append("i.issue_date >= :issue_from")
+        params["issue_from"] = issue_from
+    if issue_to:
+        where.append("i.issue_date <= :issue_to")
+        params["issue_to"] = issue_to
+
+    sql = f"""
+        SELECT
+          i.invoice_number, i.issue_date, i.due_date, i.status,
+          i.base_company_id, bc.name AS base_name,
+          i.client_company_id, cc.name AS client_name,
+          i.collection_id, i.currency, i.vat_rate, i.subtotal, i.vat_amount, i.total,
+          it.line_no, it.description, it.qty, it.unit, it.unit_price, it.line_total, it.weight_kg
+        FROM invoices i
+        LEFT JOIN companies bc ON bc.company_id = i.base_company_id
+        LEFT JOIN companies cc ON cc.company_id = i.client_company_id
+        LEFT JOIN invoice_items it ON it.invoice_id = i.invoice_id
+        WHERE {" AND ".join(where)}
+        ORDER BY i.created_at, i.invoice_id, it.line_no
+    """
+    columns = [
+        ("invoice_number", "Număr factură"),
+        ("issue_date", "Data emiterii"),
+        ("due_date", "Scadență"),
+        ("status", "Status"),
+        ("base_company_id", "ID furnizor"),
+        ("base_name", "Furnizor"),
+        ("client_company_id", "ID client"),
+        ("client_name", "Client"),
+        ("collection_id", "ID colectare"),
+        ("currency", "Monedă"),
+        ("vat_rate", "Cotă TVA (%)"),
+        ("subtotal", "Subtotal"),
+        ("vat_amount", "TVA"),
+        ("total", "Total"),
+        ("line_no", "Nr. linie"),
+        ("description", "Descriere"),
+        ("qty", "Cantitate"),
+        ("unit", "UM"),
+        ("unit_price", "Preț unitar"),
+        ("line_total", "Valoare linie"),
+        ("weight_kg", "Greutate (kg)"),
+    ]
+    return export_response(format, "facturi", columns, stream_query(sql, params))
+
+def _archive_entries(sql: str, params: dict):
+    """(nume, sursă) pentru fiecare factură; PDF-urile lipsă se randează pe loc."""
+    names: set[str] = set()
+    failed: list[str] = []
+    with SessionLocal() as db:
+        for r in stream_query(sql, params):
+            name = f"{r['invoice_number']}.pdf".replace("/", "-")
+            if name in names:
+                name = f"{r['invoice_number']}-{r['invoice_id']}.pdf".replace("/", "-")
+            names.add(name)
+
+            p = pdf_storage.open_path(r["pdf_sha256"]) if r["pdf_sha256"] else None
+            if p is None:
+                try:
+                    p = ensure_invoice_pdf(db, str(r["invoice_id"]))
+                except Exception:
+                    logger.exception("PDF-ul facturii %s nu a putut fi generat pentru arhivă", r["invoice_id"])
+                    db.rollback()
+                    p = None
+            if p is None:
+                failed.append(str(r["invoice_number"]))
+                continue
+            yield name, p
+
+    if failed:
+        yield "ERORI.txt", ("PDF indisponibil pentru facturile:\n" + "\n".join(failed) + "\n").encode("utf-8")
+
+@router.get("/pdf-archive")
+def pdf_archive(
+    date_from: date = Query(..., alias="from"),
+    date_to: date = Query(..., alias="to"),
+    claims=Depends(get_current_user_claims),
+):
+    """
+    Toate PDF-urile emise în [from, to] într-o singură arhivă ZIP, trimisă în flux.
+    Accesul e cel de la /{invoice_id}/pdf: BASE își vede facturile emise, CLIENT pe cele primite.
+    """
+    if date_from > date_to:
+        raise HTTPException(400, "Interval invalid")
+
+    role = claims.get("role")
+    cid = str(claims.get("company_id"))
+    where = ["issue_date >= :date_from", "issue_date <= :date_to"]
+    params: dict = {"date_from": date_from, "date_to": date_to}
+    if role == "BASE":
+        where.append("base_company_id = :cid")
+        params["cid"] = cid
+    elif role == "CLIENT":
+        where.append("client_company_id = :cid")
+        params["cid"] = cid
+
+    sql = f"""
+        SELECT invoice_id, invoice_number, pdf_sha256
+        FROM invoices
+        WHERE {" AND ".join(where)}
+        ORDER BY issue_date, invoice_number
+    """
+    return zip_response(f"facturi-{date_from}-{date_to}", _archive_entries(sql, params))
+
+@router.get("/{invoice_id}/items", response_model=list[InvoiceItemOut])
+def invoice_items(invoice_id: str, claims=Depends(get_current_user_claims), db: Session = Depends(get_db)):
+    row = db.execute(
+        text("SELECT base_company_id, client_company_id FROM invoices WHERE invoice_id = :id"),
+        {"id": invoice_id}
+    ).mappings().first()
+    if not row:
+        raise HTTPException(404, "Factura nu există")
+
+    role = claims.get("role")
+    cid  = str(claims.get("company_id"))
+    if (role == "BASE" and row["base_company_id"] != cid) or (role == "CLIENT" and row["client_company_id"] != cid):
+        raise HTTPException(403, "Nu ai acces la această factură")
+
+    return _items_by_invoice(db, [invoice_id]).get(invoice_id, [])
+
 @router.get("/{invoice_id}", response_model=InvoiceOut, response_model_exclude_none=False)
 def invoice_detail(invoice_id: str, claims=Depends(get_current_user_claims), db: Session = Depends(get_db)):
     row = db.execute(
@@ -92,7 +292,9 @@ def invoice_detail(invoice_id: str, claims=Depends(get_current_user_claims), db:
           total,
           status,
           created_at,
-          pdf_path
+          pdf_path,
+          pdf_status,
+          tariff_version
         FROM invoices
         WHERE invoice_id = :id
         """),
@@ -127,15 +329,35 @@ def invoice_detail(invoice_id: str, claims=Depends(get_current_user_claims), db:
 
     return InvoiceOut(items=[InvoiceItemOut(**it) for it in items], **row)
 
+def _etag_matches(if_none_match: str | None, etag: str) -> bool:
+    if not if_none_match:
+        return False
+    for tag in if_none_match.split(","):
+        tag = tag.strip()
+        if tag == "*" or tag.removeprefix("W/") == etag:
+            return True
+    return False
+
+def _pdf_cache_headers(sha256: str) -> dict:
+    # conținutul e imuabil pentru un hash dat, deci hash-ul e ETag-ul
+    return {"ETag": f'"{sha256}"', "Cache-Control": "private, no-cache"}
+
 @router.get("/{invoice_id}/pdf")
-def download_pdf(invoice_id: str, claims=Depends(get_current_user_claims), db: Session = Depends(get_db)):
+def download_pdf(
+    invoice_id: str,
+    if_none_match: Optional[str] = Header(None),
+    claims=Depends(get_current_user_claims),
+    db: Session = Depends(get_db),
+):
     row = db.execute(
         text("""
         SELECT
           invoice_id,
           base_company_id,
           client_company_id,
-          pdf_path
+          pdf_path,
+          pdf_sha256,
+          pdf_status
         FROM invoices WHERE invoice_id = :id
         """),
         {"id": invoice_id}
@@ -148,15 +370,38 @@ def download_pdf(invoice_id: str, claims=Depends(get_current_user_claims), db: S
     if (role == "BASE" and row["base_company_id"] != cid) or (role == "CLIENT" and row["client_company_id"] != cid):
         raise HTTPException(403, "Nu ai acces la această factură")
 
-    if not row["pdf_path"]:
-        raise HTTPException(404, "PDF indisponibil")
+    # PDF-ul e randat asincron după validare (app/services/render_queue.py)
+    if row["pdf_status"] == "PENDING":
+        return JSONResponse(
+            status_code=202,
+            content={"detail": "PDF-ul este în curs de generare", "pdf_status": "PENDING"},
+            headers={"Retry-After": "2"},
+        )
+    if row["pdf_status"] == "FAILED":
+        raise HTTPException(409, "Generarea PDF a eșuat")
+
+    p = pdf_storage.open_path(row["pdf_sha256"]) if row["pdf_sha256"] else None
+    if p is None and not row["pdf_sha256"] and row["pdf_path"]:
+        # PDF-uri salvate înainte de stocarea după hash
+        legacy = Path(row["pdf_path"])
+        if not legacy.is_absolute():
+            legacy = (BACKEND_ROOT / legacy).resolve()
+        if legacy.exists():
+            return FileResponse(str(legacy), media_type="application/pdf", filename=f"invoice-{invoice_id}.pdf")
 
-    p = Path(row["pdf_path"])
-    if not p.is_absolute():
-        BACKEND_ROOT = Path(__file__).resolve().parents[2]
-        p = (BACKEND_ROOT / p).resolve()
+    if p is None:
+        # fișierele sunt doar un cache: îl refacem din factură, articole și snapshot-ul
+        # părților; randarea actualizează pdf_sha256 / pdf_size, deci ETag-ul de mai jos
+        # e al fișierului nou, nu cel vechi (fonturile sau șablonul se pot fi schimbat)
+        p = ensure_invoice_pdf(db, invoice_id)
+        if p is None:
+            raise HTTPException(404, "PDF indisponibil")
 
-    if not p.exists():
-        raise HTTPException(404, "PDF indisponibil")
+    # numele fișierului e hash-ul conținutului de pe disc
+    sha = p.stem
+    if _etag_matches(if_none_match, f'"{sha}"'):
+        return Response(status_code=304, headers=_pdf_cache_headers(sha))
 
-    return FileResponse(str(p), media_type="application/pdf", filename=f"invoice-{invoice_id}.pdf")
+    # FileResponse servește și cererile Range (206)
+    return FileResponse(str(p), media_type="application/pdf", filename=f"invoice-{invoice_id}.pdf",
+                        headers=_pdf_cache_headers(sha))
@@ -0,0 +1,108 @@
+from fastapi import APIRouter, Depends, HTTPException
+from sqlalchemy.orm import Session
+from sqlalchemy import text
+from app.db import get_db
+from app.utils.security import get_current_user_claims
+from app.schemas.reports import CollectionsMonthlyRow, InvoicesMonthlyRow
+from app.services.aggregates import month_of
+from datetime import date
+from typing import Optional
+
+router = APIRouter(prefix="/reports", tags=["reports"])
+
+# Rapoartele citesc doar rollup-urile lunare (app/services/aggregates.py), deci costul
+# depinde de numărul de clienți și luni cerute, nu de istoricul colectărilor și facturilor.
+
+def _month_range(month_from: Optional[date], month_to: Optional[date]) -> tuple[list[str], dict]:
+    where, params = [], {}
+    if month_from:
+        where.append("a.month >= :m_from")
+        params["m_from"] = month_of(month_from)
+    if month_to:
+        where.append("a.month <= :m_to")
+        params["m_to"] = month_of(month_to)
+    return where, params
+
+@router.get("/collections-monthly", response_model=list[CollectionsMonthlyRow])
+def collections_monthly(
+    month_from: Optional[date] = None,
+    month_to: Optional[date] = None,
+    client_company_id: Optional[str] = None,
+    claims = Depends(get_current_user_claims),
+    db: Session = Depends(get_db),
+):
+    """Kg colectate și valoarea colectărilor per client și lună (după luna creării)."""
+    role = claims.get("role")
+    cid = str(claims.get("company_id"))
+    where, params = _month_range(month_from, month_to)
+
+    if role == "BASE":
+        joins = """JOIN collaborations col
+                     ON col.client_company_id = a.client_company_id
+                    AND col.base_company_id = :cid AND col.status = 'ACTIVE'"""
+        params["cid"] = cid
+    elif role == "CLIENT":
+        joins = ""
+        where.append("a.client_company_id = :cid")
+        params["cid"] = cid
+    elif role == "ADMIN":
+        joins = ""
+    else:
+        raise HTTPException(403, "Neautorizat")
+
+    if client_company_id and role != "CLIENT":
+        where.append("a.client_company_id = :filter_client")
+        params["filter_client"] = client_company_id
+
+    rows = db.execute(
+        text(f"""
+        SELECT a.client_company_id, comp.name AS client_name, a.month,
+               a.collections, a.validated, a.total_weight, a.total_cost
+          FROM agg_collections_monthly a
+          {joins}
+          LEFT JOIN companies comp ON comp.company_id = a.client_company_id
+        {("WHERE " + " AND ".join(where)) if where else ""}
+         ORDER BY a.month DESC, comp.name
+        """),
+        params,
+    ).mappings().all()
+    return [dict(r) for r in rows]
+
+@router.get("/invoices-monthly", response_model=list[InvoicesMonthlyRow])
+def invoices_monthly(
+    month_from: Optional[date] = None,
+    month_to: Optional[date] = None,
+    client_company_id: Optional[str] = None,
+    claims = Depends(get_current_user_claims),
+    db: Session = Depends(get_db),
+):
+    """RON facturați per client și lună (după luna emiterii)."""
+    role = claims.get("role")
+    cid = str(claims.get("company_id"))
+    where, params = _month_range(month_from, month_to)
+
+    if role == "BASE":
+        where.append("a.base_company_id = :cid")
+        params["cid"] = cid
+    elif role == "CLIENT":
+        where.append("a.client_company_id = :cid")
+        params["cid"] = cid
+    elif role != "ADMIN":
+        raise HTTPException(403, "Neautorizat")
+
+    if client_company_id and role != "CLIENT":
+        where.append("a.client_company_id = :filter_client")
+        params["filter_client"] = client_company_id
+
+    rows = db.execute(
+        text(f"""
+        SELECT a.base_company_id, a.client_company_id, comp.name AS client_name, a.month,
+               a.invoices, a.subtotal, a.vat_amount, a.total
+          FROM agg_invoices_monthly a
+          LEFT JOIN companies comp ON comp.company_id = a.client_company_id
+        {("WHERE " + " AND ".join(where)) if where else ""}
+         ORDER BY a.month DESC, comp.name
+        """),
+        params,
+    ).mappings().all()
+    return [dict(r) for r in rows]
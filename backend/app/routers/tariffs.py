@@ -0,0 +1,138 @@
+from fastapi import APIRouter, Depends, HTTPException
+from sqlalchemy.orm import Session
+from sqlalchemy import text
+from app.db import get_db
+from app.utils.security import get_current_user_claims
+from app.schemas.tariffs import TariffCreate, TariffOut, TariffSimulateIn, TariffSimulationOut
+from app.services.tariffs import tariff_book, parse_rates, compile_tariff
+from app.services.repricing import simulate
+from app.utils.pricing import KG_RATES, PORTABLE_RATES, PORTABLE_WEIGHTS_KG
+from datetime import datetime
+import json
+
+router = APIRouter(prefix="/tariffs", tags=["tariffs"])
+
+_SECTIONS = {
+    "portable_rates": PORTABLE_RATES,
+    "portable_weights_kg": PORTABLE_WEIGHTS_KG,
+    "kg_rates": KG_RATES,
+}
+
+def _out(r) -> dict:
+    rates = parse_rates(r["rates"])
+    out = {
+        "version": r["version"],
+        "effective_from": r["effective_from"],
+        "created_by": r["created_by"],
+        "created_at": r["created_at"],
+    }
+    for name, defaults in _SECTIONS.items():
+        out[name] = {**defaults, **(rates.get(name) or {})}
+    return out
+
+@router.get("", response_model=list[TariffOut])
+def list_tariffs(claims = Depends(get_current_user_claims), db: Session = Depends(get_db)):
+    """Toate versiunile, cea mai nouă prima. Vizibile oricărui utilizator autentificat."""
+    rows = db.execute(
+        text("""SELECT version, effective_from, rates, created_by, created_at
+                  FROM tariffs
+                 ORDER BY effective_from DESC""")
+    ).mappings().all()
+    return [_out(r) for r in rows]
+
+@router.get("/current", response_model=TariffOut)
+def current_tariff(claims = Depends(get_current_user_claims), db: Session = Depends(get_db)):
+    row = db.execute(
+        text("""SELECT version, effective_from, rates, created_by, created_at
+                  FROM tariffs
+                 WHERE effective_from <= NOW(6)
+                 ORDER BY effective_from DESC
+                 LIMIT 1""")
+    ).mappings().first()
+    if not row:
+        raise HTTPException(404, "Nu există tarife definite")
+    return _out(row)
+
+@router.post("", response_model=TariffOut)
+def create_tariff(payload: TariffCreate, claims = Depends(get_current_user_claims), db: Session = Depends(get_db)):
+    """
+    Versiune nouă de tarif (doar ADMIN). Data de intrare în vigoare nu poate fi în trecut:
+    colectările deja create rămân la prețul de la momentul creării.
+    """
+    if claims.get("role") != "ADMIN":
+        raise HTTPException(403, "Doar ADMIN poate modifica tarifele")
+    if payload.effective_from < datetime.now():
+        raise HTTPException(422, "Data de intrare în vigoare nu poate fi în trecut")
+
+    # versiunea anterioară datei noi completează categoriile omise
+    prev = db.execute(
+        text("""SELECT rates FROM tariffs
+                 WHERE effective_from <= :at
+                 ORDER BY effective_from DESC
+                 LIMIT 1
+                 FOR UPDATE"""),
+        {"at": payload.effective_from},
+    ).mappings().first()
+    prev_rates = parse_rates(prev["rates"]) if prev else {}
+
+    rates = {}
+    for name, defaults in _SECTIONS.items():
+        merged = {**defaults, **(prev_rates.get(name) or {})}
+        merged.update({k: str(v) for k, v in getattr(payload, name).items()})
+        rates[name] = merged
+
+    exists = db.execute(
+        text("SELECT 1 FROM tariffs WHERE effective_from = :at"), {"at": payload.effective_from}
+    ).first()
+    if exists:
+        raise HTTPException(409, "Există deja o versiune cu această dată")
+
+    res = db.execute(
+        text("INSERT INTO tariffs (effective_from, rates, created_by) VALUES (:at, :r, :uid)"),
+        {"at": payload.effective_from, "r": json.dumps(rates), "uid": str(claims.get("sub"))},
+    )
+    tariff_book.invalidate(db)
+    db.commit()
+    tariff_book.expire()
+
+    row = db.execute(
+        text("""SELECT version, effective_from, rates, created_by, created_at
+                  FROM tariffs WHERE version = :v"""),
+        {"v": res.lastrowid},
+    ).mappings().first()
+    return _out(row)
+
+@router.post("/simulate", response_model=TariffSimulationOut)
+def simulate_tariff(payload: TariffSimulateIn, claims = Depends(get_current_user_claims), db: Session = Depends(get_db)):
+    """
+    Impactul unui tarif propus asupra tuturor colectărilor istorice (doar ADMIN),
+    pe bază și lună, față de tariful curent sau de `baseline_version`. Nu scrie nimic.
+    """
+    if claims.get("role") != "ADMIN":
+        raise HTTPException(403, "Doar ADMIN poate simula tarife")
+
+    if payload.baseline_version is not None:
+        row = db.execute(
+            text("SELECT version, rates FROM tariffs WHERE version = :v"), {"v": payload.baseline_version}
+        ).mappings().first()
+        if not row:
+            raise HTTPException(404, "Versiunea de tarif nu există")
+        base_version, base_rates = int(row["version"]), parse_rates(row["rates"])
+    else:
+        baseline = tariff_book.for_date(db)
+        row = db.execute(
+            text("SELECT rates FROM tariffs WHERE version = :v"), {"v": baseline.version}
+        ).mappings().first()
+        base_version, base_rates = baseline.version, parse_rates(row["rates"]) if row else {}
+
+    proposed_rates = {}
+    for name in _SECTIONS:
+        proposed_rates[name] = {**(base_rates.get(name) or {}),
+                                **{k: str(v) for k, v in getattr(payload, name).items()}}
+
+    return simulate(
+        compile_tariff(base_version, base_rates),
+        compile_tariff(-1, proposed_rates),
+        payload.created_from,
+        payload.created_to,
+    )
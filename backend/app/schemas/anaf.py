@@ -1,5 +1,5 @@
 ﻿from pydantic import BaseModel, Field
-from typing import Any, Optional
+from typing import Any, List, Optional
 
 class AnafLookupIn(BaseModel):
     cui: str = Field(..., description="CUI sau RO+CUI")
@@ -14,3 +14,11 @@ class AnafSummary(BaseModel):
     inactive: Optional[bool] = None
     e_invoice: Optional[bool] = None
     raw: Any = None
+
+class AnafBatchLookupIn(BaseModel):
+    cuis: List[str] = Field(..., min_length=1, max_length=500, description="CUI-uri, cu sau fără RO")
+
+class AnafBatchItem(BaseModel):
+    cui: str
+    summary: Optional[AnafSummary] = None
+    error: Optional[str] = None
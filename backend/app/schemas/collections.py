@@ -1,14 +1,25 @@
-from pydantic import BaseModel, Field
-from typing import Optional, Dict, Literal
+from pydantic import BaseModel, Field, field_validator
+from typing import Optional, Dict, List, Literal
 from datetime import datetime
 from uuid import UUID
 
+from app.utils.rates import KG_KEYS, PORTABLE_KEYS
+
 CollectionStatus = Literal["PENDING", "VALIDATED"]
 
 class CollectionCreate(BaseModel):
     # CLIENT creează: nu trimite company_id, îl luăm din token
     batteries: Dict[str, int] = Field(default_factory=dict)
 
+    @field_validator("batteries")
+    @classmethod
+    def _known_categories(cls, v: Dict[str, int]) -> Dict[str, int]:
+        # fiecare cheie devine un rând în collection_lines (și o coloană în export)
+        unknown = sorted(set(v) - set(PORTABLE_KEYS) - set(KG_KEYS))
+        if unknown:
+            raise ValueError(f"Categorii necunoscute: {', '.join(unknown)}")
+        return v
+
 class CollectionOut(BaseModel):
     collection_id: UUID
     client_company_id: UUID
@@ -20,3 +31,21 @@ class CollectionOut(BaseModel):
     batteries_summary: Optional[str] = None
     created_at: datetime
     validated_at: Optional[datetime] = None
+
+class CollectionValidateBatchIn(BaseModel):
+    collection_ids: List[UUID] = Field(..., min_length=1, max_length=200)
+
+class CollectionValidateResult(BaseModel):
+    collection_id: UUID
+    # VALIDATED = factură emisă acum; ALREADY_VALIDATED = nimic de făcut; ERROR = vezi detail
+    result: Literal["VALIDATED", "ALREADY_VALIDATED", "ERROR"]
+    invoice_id: Optional[UUID] = None
+    invoice_number: Optional[str] = None
+    detail: Optional[str] = None
+
+class CollectionCategoryTotal(BaseModel):
+    category: str
+    label: Optional[str] = None
+    unit: Literal["buc", "kg"]
+    quantity: float
+    collections: int
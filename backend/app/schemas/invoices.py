@@ -28,3 +28,5 @@ class InvoiceOut(BaseModel):
     created_at: datetime
     items: List[InvoiceItemOut] = []
     pdf_path: str | None = None
+    pdf_status: str | None = None  # PENDING | READY | FAILED
+    tariff_version: int | None = None
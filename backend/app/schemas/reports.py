@@ -0,0 +1,23 @@
+from pydantic import BaseModel
+from typing import Optional
+from datetime import date
+from uuid import UUID
+
+class CollectionsMonthlyRow(BaseModel):
+    client_company_id: UUID
+    client_name: Optional[str] = None
+    month: date
+    collections: int
+    validated: int
+    total_weight: float
+    total_cost: float
+
+class InvoicesMonthlyRow(BaseModel):
+    base_company_id: UUID
+    client_company_id: UUID
+    client_name: Optional[str] = None
+    month: date
+    invoices: int
+    subtotal: float
+    vat_amount: float
+    total: float
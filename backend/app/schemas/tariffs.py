@@ -0,0 +1,95 @@
+from pydantic import BaseModel, Field, field_validator
+from typing import Dict, List, Optional
+from datetime import datetime
+from decimal import Decimal
+
+from app.utils.rates import KG_KEYS, PORTABLE_KEYS
+
+def _check_keys(v: Dict[str, Decimal], allowed: list[str], places: int) -> Dict[str, Decimal]:
+    unknown = sorted(set(v) - set(allowed))
+    if unknown:
+        raise ValueError(f"Categorii necunoscute: {', '.join(unknown)}")
+    if any(x < 0 for x in v.values()):
+        raise ValueError("Valorile nu pot fi negative")
+    # TariffTable lucrează în bani / grame: o zecimală în plus s-ar rotunji pe tăcute
+    too_precise = sorted(k for k, x in v.items() if -x.normalize().as_tuple().exponent > places)
+    if too_precise:
+        raise ValueError(f"Cel mult {places} zecimale: {', '.join(too_precise)}")
+    return v
+
+def _naive_local(v: Optional[datetime]) -> Optional[datetime]:
+    # în DB datele sunt naive, în ora locală (ca datetime.now()); "...Z" / "+03:00" se convertesc
+    if v is not None and v.tzinfo is not None:
+        return v.astimezone().replace(tzinfo=None)
+    return v
+
+class TariffRates(BaseModel):
+    # categoriile omise păstrează valoarea din versiunea de referință
+    portable_rates: Dict[str, Decimal] = Field(default_factory=dict)
+    portable_weights_kg: Dict[str, Decimal] = Field(default_factory=dict)
+    kg_rates: Dict[str, Decimal] = Field(default_factory=dict)
+
+    @field_validator("portable_rates")
+    @classmethod
+    def _portable_rates(cls, v):
+        return _check_keys(v, PORTABLE_KEYS, 2)  # lei / buc, la ban
+
+    @field_validator("portable_weights_kg")
+    @classmethod
+    def _portable_weights(cls, v):
+        return _check_keys(v, PORTABLE_KEYS, 3)  # kg / buc, la gram
+
+    @field_validator("kg_rates")
+    @classmethod
+    def _kg_rates(cls, v):
+        return _check_keys(v, KG_KEYS, 2)  # lei / kg, la ban
+
+class TariffCreate(TariffRates):
+    # intră în vigoare la această dată
+    effective_from: datetime
+
+    @field_validator("effective_from")
+    @classmethod
+    def _effective_local(cls, v):
+        return _naive_local(v)
+
+class TariffSimulateIn(TariffRates):
+    # implicit: tariful în vigoare acum
+    baseline_version: Optional[int] = None
+    created_from: Optional[datetime] = None
+    created_to: Optional[datetime] = None
+
+    @field_validator("created_from", "created_to")
+    @classmethod
+    def _range_local(cls, v):
+        return _naive_local(v)
+
+class TariffSimulationRow(BaseModel):
+    base_company_id: Optional[str] = None  # None = colectări fără bază activă
+    month: str                             # YYYY-MM, după created_at
+    collections: int
+    current_total: Decimal
+    proposed_total: Decimal
+    delta: Decimal
+
+class TariffSimulationOut(BaseModel):
+    baseline_version: int
+    collections: int
+    current_total: Decimal
+    proposed_total: Decimal
+    delta: Decimal
+    rows: List[TariffSimulationRow]
+
+class TariffOut(BaseModel):
+    version: int
+    effective_from: datetime
+    portable_rates: Dict[str, Decimal]
+    portable_weights_kg: Dict[str, Decimal]
+    kg_rates: Dict[str, Decimal]
+    created_by: Optional[str] = None
+    created_at: Optional[datetime] = None
+
+    @field_validator("effective_from")
+    @classmethod
+    def _effective_local(cls, v):
+        return _naive_local(v)
@@ -0,0 +1,88 @@
+# app/services/aggregates.py
+"""
+Rollup-uri lunare pentru rapoarte (`agg_collections_monthly`, `agg_invoices_monthly`).
+
+Sunt actualizate incremental în aceeași tranzacție cu crearea și validarea colectărilor,
+deci rapoartele citesc câteva rânduri per lună în loc să scaneze istoricul. Nicio funcție
+de aici nu face commit. `rebuild` le recalculează complet din tabelele sursă.
+"""
+from datetime import date, datetime
+
+from sqlalchemy import text
+from sqlalchemy.orm import Session
+
+def month_of(d: date | datetime) -> date:
+    return date(d.year, d.month, 1)
+
+def record_collection_created(
+    db: Session, client_company_id: str, created_at: datetime, total_weight, total_cost,
+) -> None:
+    db.execute(
+        text("""
+        INSERT INTO agg_collections_monthly (client_company_id, month, collections, total_weight, total_cost)
+        VALUES (:c, :m, 1, :w, :tc)
+        ON DUPLICATE KEY UPDATE collections = collections + 1,
+                                total_weight = total_weight + VALUES(total_weight),
+                                total_cost = total_cost + VALUES(total_cost)
+        """),
+        {"c": client_company_id, "m": month_of(created_at), "w": str(total_weight), "tc": str(total_cost)},
+    )
+
+def record_collections_validated(db: Session, rows: list[dict]) -> None:
+    """
+    rows: {"c": client, "m": luna colectării, "dw": Δ greutate, "dc": Δ cost}.
+    Validarea recalculează totalurile colectării, deci rollup-ul primește diferența.
+    """
+    if not rows:
+        return
+    db.execute(
+        text("""
+        INSERT INTO agg_collections_monthly (client_company_id, month, validated, total_weight, total_cost)
+        VALUES (:c, :m, 1, :dw, :dc)
+        ON DUPLICATE KEY UPDATE validated = validated + 1,
+                                total_weight = total_weight + VALUES(total_weight),
+                                total_cost = total_cost + VALUES(total_cost)
+        """),
+        rows,
+    )
+
+def record_invoices(db: Session, rows: list[dict]) -> None:
+    """rows: {"b", "c", "m": luna emiterii, "sub", "vat", "tot"}."""
+    if not rows:
+        return
+    db.execute(
+        text("""
+        INSERT INTO agg_invoices_monthly (base_company_id, client_company_id, month, invoices, subtotal, vat_amount, total)
+        VALUES (:b, :c, :m, 1, :sub, :vat, :tot)
+        ON DUPLICATE KEY UPDATE invoices = invoices + 1,
+                                subtotal = subtotal + VALUES(subtotal),
+                                vat_amount = vat_amount + VALUES(vat_amount),
+                                total = total + VALUES(total)
+        """),
+        rows,
+    )
+
+def rebuild(db: Session) -> tuple[int, int]:
+    """Recalculează ambele tabele din `collections` și `invoices`; întoarce numărul de rânduri."""
+    db.execute(text("DELETE FROM agg_collections_monthly"))
+    n_col = db.execute(text("""
+        INSERT INTO agg_collections_monthly (client_company_id, month, collections, validated, total_weight, total_cost)
+        SELECT client_company_id,
+               DATE_FORMAT(created_at, '%Y-%m-01'),
+               COUNT(*),
+               SUM(status = 'VALIDATED'),
+               COALESCE(SUM(total_weight), 0),
+               COALESCE(SUM(total_cost), 0)
+          FROM collections
+         GROUP BY client_company_id, DATE_FORMAT(created_at, '%Y-%m-01')
+    """)).rowcount
+    db.execute(text("DELETE FROM agg_invoices_monthly"))
+    n_inv = db.execute(text("""
+        INSERT INTO agg_invoices_monthly (base_company_id, client_company_id, month, invoices, subtotal, vat_amount, total)
+        SELECT base_company_id, client_company_id,
+               DATE_FORMAT(issue_date, '%Y-%m-01'),
+               COUNT(*), SUM(subtotal), SUM(vat_amount), SUM(total)
+          FROM invoices
+         GROUP BY base_company_id, client_company_id, DATE_FORMAT(issue_date, '%Y-%m-01')
+    """)).rowcount
+    return n_col, n_inv
@@ -0,0 +1,307 @@
+# app/services/anaf.py
+"""
+Client ANAF partajat de routere.
+
+- un singur httpx.AsyncClient pe durata aplicației (pool de conexiuni + keep-alive),
+  deschis/închis din evenimentele de startup/shutdown din main.py;
+- cache per (CUI, zi): întâi în memorie, apoi din `anaf_queries`, abia apoi ANAF;
+- cereri concurente pentru același CUI așteaptă aceeași interogare (single-flight);
+- lucrul cu DB (Session sincron) rulează prin run_db, nu pe event loop.
+"""
+import asyncio
+import json
+import logging
+import time
+from collections import OrderedDict
+from datetime import date
+from typing import Any
+
+import httpx
+from sqlalchemy import text, bindparam
+from sqlalchemy.orm import Session
+
+from app.config import settings
+from app.utils.concurrency import run_db
+
+logger = logging.getLogger("app.anaf")
+
+HEADERS = {"Content-Type": "application/json", "Accept": "application/json"}
+
+# Limitele documentate ale serviciului TVA v9: max. 100 CUI-uri per cerere, 1 cerere/secundă
+MAX_BATCH = 100
+MIN_INTERVAL_SECONDS = 1.0
+
+def parse_raw(value: Any) -> Any:
+    """raw_response din MySQL poate veni ca str/bytes; întoarce dict/list sau None."""
+    if value is None or isinstance(value, (dict, list)):
+        return value
+    if isinstance(value, (bytes, bytearray)):
+        value = value.decode("utf-8", "ignore")
+    try:
+        return json.loads(value)
+    except Exception:
+        return None
+
+class AnafClient:
+    def __init__(self, url: str, cache_ttl_seconds: float, cache_size: int):
+        self.url = url
+        self.cache_ttl_seconds = cache_ttl_seconds
+        self.cache_size = cache_size
+        self._http: httpx.AsyncClient | None = None
+        self._cache: OrderedDict[tuple[str, str], tuple[float, Any]] = OrderedDict()
+        self._inflight: dict[tuple[str, str], asyncio.Future] = {}
+        self._throttle = asyncio.Lock()
+        self._last_call = 0.0
+
+    async def start(self) -> None:
+        if self._http is None:
+            self._http = httpx.AsyncClient(
+                timeout=httpx.Timeout(6.0, connect=3.0),
+                limits=httpx.Limits(max_connections=20, max_keepalive_connections=10, keepalive_expiry=60),
+                headers=HEADERS,
+            )
+
+    async def close(self) -> None:
+        if self._http is not None:
+            await self._http.aclose()
+            self._http = None
+
+    # ----- cache -------------------------------------------------------------
+
+    def _cache_get(self, key: tuple[str, str]) -> Any:
+        hit = self._cache.get(key)
+        if hit is None:
+            return None
+        stored_at, raw = hit
+        if time.monotonic() - stored_at > self.cache_ttl_seconds:
+            del self._cache[key]
+            return None
+        self._cache.move_to_end(key)
+        return raw
+
+    def _cache_put(self, key: tuple[str, str], raw: Any) -> None:
+        self._cache[key] = (time.monotonic(), raw)
+        self._cache.move_to_end(key)
+        while len(self._cache) > self.cache_size:
+            self._cache.popitem(last=False)
+
+    def _db_cached(self, db: Session, cui: str, query_date: str) -> Any:
+        raw = db.execute(
+            text("""SELECT raw_response FROM anaf_queries
+                     WHERE cui = :cui AND query_date = :qd AND raw_response IS NOT NULL AND result_code = 200
+                     ORDER BY created_at DESC LIMIT 1"""),
+            {"cui": cui, "qd": query_date},
+        ).scalar()
+        return parse_raw(raw)
+
+    def _db_cached_many(self, db: Session, cuis: list[str], query_date: str) -> dict[str, Any]:
+        rows = db.execute(
+            text("""SELECT cui, raw_response FROM anaf_queries
+                     WHERE cui IN :cuis AND query_date = :qd AND raw_response IS NOT NULL AND result_code = 200
+                     ORDER BY created_at""").bindparams(bindparam("cuis", expanding=True)),
+            {"cuis": cuis, "qd": query_date},
+        ).all()
+        out: dict[str, Any] = {}
+        for cui, raw in rows:
+            raw = parse_raw(raw)
+            if raw is not None:
+                out[cui] = raw
+        return out
+
+    def _db_log(self, db: Session, rows: list[dict]) -> None:
+        # un singur INSERT (executemany) pentru toate rândurile
+        db.execute(
+            text("""
+                INSERT INTO anaf_queries (cui, query_date, raw_response, result_code, message, client_ip)
+                VALUES (:cui, :qd, :raw, :code, :msg, :ip)
+            """),
+            rows,
+        )
+        db.commit()
+
+    def _db_latest(self, db: Session, cui: str) -> Any:
+        raw = db.execute(
+            text("""SELECT raw_response FROM anaf_queries
+                     WHERE cui = :cui AND raw_response IS NOT NULL AND result_code = 200
+                     ORDER BY created_at DESC LIMIT 1"""),
+            {"cui": cui},
+        ).scalar()
+        return parse_raw(raw)
+
+    # ----- ANAF ----------------------------------------------------------------
+
+    async def _post(self, body: list[dict]) -> tuple[int | None, Any, str | None]:
+        """Întoarce (cod HTTP, JSON, mesaj eroare)."""
+        await self.start()
+        try:
+            resp = await self._http.post(self.url, json=body)
+            return resp.status_code, resp.json(), None
+        except Exception as e:
+            return None, None, f"request_failed: {type(e).__name__}"
+
+    async def _post_throttled(self, body: list[dict]) -> tuple[int | None, Any, str | None]:
+        # cererile în lot sunt serializate și distanțate conform limitei ANAF
+        async with self._throttle:
+            wait = self._last_call + MIN_INTERVAL_SECONDS - time.monotonic()
+            if wait > 0:
+                await asyncio.sleep(wait)
+            try:
+                return await self._post(body)
+            finally:
+                self._last_call = time.monotonic()
+
+    @staticmethod
+    def _split_batch(raw: Any, cuis: list[str]) -> dict[str, Any]:
+        """Împarte răspunsul multi-CUI în răspunsuri cu aceeași formă ca o cerere simplă."""
+        if not isinstance(raw, dict):
+            return {}
+        head = {k: v for k, v in raw.items() if k not in ("found", "notFound")}
+        out: dict[str, Any] = {}
+        for f in raw.get("found") or []:
+            dg = f.get("date_generale") or {}
+            c = str(dg.get("cui") or f.get("cui") or "")
+            if c in cuis:
+                out[c] = {**head, "found": [f], "notFound": []}
+        for nf in raw.get("notFound") or []:
+            c = str(nf.get("cui") if isinstance(nf, dict) else nf)
+            if c in cuis and c not in out:
+                out[c] = {**head, "found": [], "notFound": [nf]}
+        return out
+
+    async def lookup_many(self, db: Session, cuis: list[str], client_ip: str | None = None) -> dict[str, Any]:
+        """
+        Varianta în lot a `lookup`: cache-ul (memorie + anaf_queries) e consultat cu o singură
+        interogare, restul CUI-urilor merg la ANAF în loturi de MAX_BATCH, iar toate
+        răspunsurile noi sunt salvate cu un singur INSERT bulk. CUI-urile deja în interogare
+        în alt apel nu se mai trimit.
+        """
+        today = date.today().isoformat()
+        out: dict[str, Any] = {}
+
+        missing = []
+        for cui in dict.fromkeys(cuis):
+            raw = self._cache_get((cui, today))
+            if raw is not None:
+                out[cui] = raw
+            else:
+                missing.append(cui)
+
+        if missing:
+            for cui, raw in (await run_db(self._db_cached_many, db, missing, today)).items():
+                out[cui] = raw
+                self._cache_put((cui, today), raw)
+            missing = [c for c in missing if c not in out]
+
+        # single-flight ca în `lookup`: CUI-urile aflate deja în interogare (simplă sau în
+        # alt lot) sunt așteptate, nu trimise încă o dată; pe restul le revendicăm noi
+        loop = asyncio.get_running_loop()
+        owned: dict[str, asyncio.Future] = {}
+        waiting: dict[str, asyncio.Future] = {}
+        for cui in missing:
+            fut = self._inflight.get((cui, today))
+            if fut is not None:
+                waiting[cui] = fut
+            else:
+                owned[cui] = self._inflight[(cui, today)] = loop.create_future()
+
+        try:
+            log_rows: list[dict] = []
+            mine = list(owned)
+            for i in range(0, len(mine), MAX_BATCH):
+                chunk = mine[i:i + MAX_BATCH]
+                code, raw, msg = await self._post_throttled([{"cui": int(c), "data": today} for c in chunk])
+                per_cui = self._split_batch(raw, chunk) if code == 200 else {}
+                for cui in chunk:
+                    r = per_cui.get(cui)
+                    log_rows.append({
+                        "cui": cui,
+                        "qd": today,
+                        "raw": None if r is None else json.dumps(r),
+                        "code": code,
+                        "msg": msg,
+                        "ip": client_ip,
+                    })
+                    if r is not None:
+                        out[cui] = r
+                        self._cache_put((cui, today), r)
+                    owned[cui].set_result(r)
+
+            if log_rows:
+                await run_db(self._db_log, db, log_rows)
+        except BaseException as e:
+            for fut in owned.values():
+                if not fut.done():
+                    fut.set_exception(e)
+                    fut.exception()
+            raise
+        finally:
+            for cui in owned:
+                self._inflight.pop((cui, today), None)
+
+        if waiting:
+            # o interogare străină eșuată lasă doar CUI-ul ei fără răspuns, nu tot lotul
+            await asyncio.wait(waiting.values())
+            for cui, fut in waiting.items():
+                if not fut.cancelled() and fut.exception() is None and fut.result() is not None:
+                    out[cui] = fut.result()
+        return out
+
+    async def lookup(self, db: Session, cui: str, client_ip: str | None = None) -> Any:
+        """
+        Răspunsul ANAF pentru CUI (deja sanitizat) la data de azi, sau None dacă ANAF nu
+        răspunde și nu avem nimic în cache. Fiecare apel real la ANAF e jurnalizat în anaf_queries.
+        """
+        today = date.today().isoformat()
+        key = (cui, today)
+
+        raw = self._cache_get(key)
+        if raw is not None:
+            return raw
+
+        raw = await run_db(self._db_cached, db, cui, today)
+        if raw is not None:
+            self._cache_put(key, raw)
+            return raw
+
+        fut = self._inflight.get(key)
+        if fut is not None:
+            raw = await asyncio.shield(fut)
+            # un lot (lookup_many) pune None fără să caute ultimul răspuns bun
+            return raw if raw is not None else await run_db(self._db_latest, db, cui)
+
+        fut = asyncio.get_running_loop().create_future()
+        self._inflight[key] = fut
+        try:
+            code, raw, msg = await self._post([{"cui": int(cui), "data": today}])
+            if code != 200:
+                # corpul unui 429/5xx nu e un răspuns valid: nu-l jurnalizăm ca atare și nu-l
+                # servim din cache; cădem pe ultimul răspuns bun
+                raw = None
+            await run_db(self._db_log, db, [{
+                "cui": cui,
+                "qd": today,
+                "raw": None if raw is None else json.dumps(raw),
+                "code": code,
+                "msg": msg,
+                "ip": client_ip,
+            }])
+
+            if raw is not None:
+                self._cache_put(key, raw)
+            else:
+                raw = await run_db(self._db_latest, db, cui)
+            fut.set_result(raw)
+            return raw
+        except BaseException as e:
+            fut.set_exception(e)
+            # nimeni altcineva nu așteaptă -> evită "exception was never retrieved"
+            fut.exception()
+            raise
+        finally:
+            self._inflight.pop(key, None)
+
+anaf_client = AnafClient(
+    url=settings.anaf_url,
+    cache_ttl_seconds=settings.anaf_cache_ttl_seconds,
+    cache_size=settings.anaf_cache_size,
+)
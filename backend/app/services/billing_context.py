@@ -0,0 +1,145 @@
+# app/services/billing_context.py
+"""
+Contextul de facturare al unei perechi bază–client, dintr-o singură interogare.
+
+`load_billing_context` aduce profilul bazei, profilul clientului și setările de facturare
+ale bazei într-un singur drum la DB. Același obiect servește verificarea `ready()` de la
+validare și profilele copiate pe factură la emitere (InvoiceWriter), din care se randează PDF-ul.
+
+Memoizare pe două niveluri:
+- în `Session.info`, deci pe durata unei cereri / a unei sesiuni de worker;
+- opțional, profilele (nu și setările) într-un cache per proces cu TTL scurt
+  (`billing_profile_cache_ttl_seconds`, 0 = dezactivat). PUT /billing/profile îl golește
+  local; ceilalți workeri văd modificarea după cel mult TTL.
+"""
+import threading
+import time
+from typing import NamedTuple
+
+from sqlalchemy import text
+from sqlalchemy.orm import Session
+
+from app.config import settings
+
+# câmpurile de profil folosite de PDF (render_invoice_pdf)
+PROFILE_FIELDS = (
+    "company_name", "cui", "legal_name", "address_line", "city", "county", "postal_code",
+    "country", "bank_name", "iban", "email_billing", "phone_billing",
+)
+SETTINGS_FIELDS = ("base_company_id", "series_code", "next_number", "year_reset", "due_days", "default_vat_rate")
+
+_CONTEXT_SQL = text("""
+  SELECT c.company_id, c.name AS company_name, c.cui,
+         p.company_id IS NOT NULL AS has_profile,
+         p.legal_name, p.address_line, p.city, p.county, p.postal_code,
+         COALESCE(p.country,'RO') AS country, p.bank_name, p.iban,
+         p.email_billing, p.phone_billing,
+         s.base_company_id, s.series_code, s.next_number, s.year_reset, s.due_days, s.default_vat_rate
+    FROM companies c
+    LEFT JOIN company_billing_profiles p ON p.company_id = c.company_id
+    LEFT JOIN company_invoice_settings s ON s.base_company_id = c.company_id AND c.company_id = :b
+   WHERE c.company_id IN (:b, :c)
+""")
+
+_SETTINGS_SQL = text("""
+  SELECT base_company_id, series_code, next_number, year_reset, due_days, default_vat_rate
+    FROM company_invoice_settings
+   WHERE base_company_id = :b
+""")
+
+class Profile(NamedTuple):
+    fields: dict        # PROFILE_FIELDS; gol dacă firma nu există
+    has_profile: bool   # există rând în company_billing_profiles
+
+_MISSING = Profile({}, False)
+
+class BillingContext(NamedTuple):
+    base: Profile
+    client: Profile
+    settings: dict | None
+
+    def ready(self) -> tuple[bool, str]:
+        if not self.base.has_profile:
+            return False, "Completează profilul de facturare al BAZEI"
+        if not self.settings:
+            return False, "Configurează setările de facturare (serie/număr) pentru BAZĂ"
+        if not self.client.has_profile:
+            return False, "Completează profilul de facturare al CLIENTULUI"
+        return True, ""
+
+class _ProfileCache:
+    def __init__(self, ttl_seconds: float, max_size: int = 5000):
+        self.ttl = ttl_seconds
+        self.max_size = max_size
+        self._data: dict[str, tuple[float, Profile]] = {}
+        self._lock = threading.Lock()
+
+    def get(self, company_id: str) -> Profile | None:
+        if self.ttl <= 0:
+            return None
+        with self._lock:
+            hit = self._data.get(company_id)
+            if hit is None:
+                return None
+            if hit[0] < time.monotonic():
+                del self._data[company_id]
+                return None
+            return hit[1]
+
+    def put(self, company_id: str, profile: Profile) -> None:
+        if self.ttl <= 0:
+            return
+        with self._lock:
+            if len(self._data) >= self.max_size:
+                self._data.clear()
+            self._data[company_id] = (time.monotonic() + self.ttl, profile)
+
+    def invalidate(self, company_id: str) -> None:
+        with self._lock:
+            self._data.pop(company_id, None)
+
+profile_cache = _ProfileCache(settings.billing_profile_cache_ttl_seconds)
+
+def _memo_key(base_company_id: str, client_company_id: str) -> tuple:
+    return ("billing_ctx", base_company_id, client_company_id)
+
+def load_billing_context(db: Session, base_company_id: str, client_company_id: str) -> BillingContext:
+    key = _memo_key(base_company_id, client_company_id)
+    ctx = db.info.get(key)
+    if ctx is not None:
+        return ctx
+
+    base = profile_cache.get(base_company_id)
+    client = profile_cache.get(client_company_id)
+    params = {"b": base_company_id, "c": client_company_id}
+    if base is not None and client is not None:
+        # profilele din cache; setările se citesc mereu proaspete
+        row = db.execute(_SETTINGS_SQL, params).mappings().first()
+        sett = dict(row) if row else None
+    else:
+        sett = None
+        found: dict[str, Profile] = {}
+        for r in db.execute(_CONTEXT_SQL, params).mappings():
+            cid = str(r["company_id"])
+            found[cid] = Profile({f: r[f] for f in PROFILE_FIELDS}, bool(r["has_profile"]))
+            if r["base_company_id"] is not None:
+                sett = {f: r[f] for f in SETTINGS_FIELDS}
+        base = found.get(base_company_id, _MISSING)
+        client = found.get(client_company_id, _MISSING)
+        for cid, p in found.items():
+            profile_cache.put(cid, p)
+
+    ctx = BillingContext(base, client, sett)
+    db.info[key] = ctx
+    return ctx
+
+def forget(db: Session, company_id: str | None = None) -> None:
+    """
+    Uită contextele memoizate în sesiune (toate, sau doar cele care implică `company_id`)
+    și profilul firmei din cache-ul de proces.
+    """
+    for key in [k for k in db.info if isinstance(k, tuple) and k and k[0] == "billing_ctx"]:
+        if company_id is None or company_id in key[1:]:
+            del db.info[key]
+    if company_id is not None:
+        profile_cache.invalidate(company_id)
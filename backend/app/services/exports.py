@@ -0,0 +1,137 @@
+# app/services/exports.py
+"""
+Export CSV / NDJSON / ZIP în flux.
+Rândurile vin printr-un cursor server-side (yield_per), deci memoria rămâne constantă
+indiferent de câte facturi sau colectări se exportă.
+"""
+import csv
+import io
+import json
+import zipfile
+from pathlib import Path
+from datetime import date, datetime
+from decimal import Decimal
+from typing import Iterable, Iterator, Literal
+
+from fastapi.responses import StreamingResponse
+from sqlalchemy import text
+
+from app.db import SessionLocal
+
+ExportFormat = Literal["csv", "ndjson"]
+
+BATCH_ROWS = 500
+ZIP_CHUNK = 64 * 1024
+
+def stream_query(sql: str, params: dict, batch: int = BATCH_ROWS) -> Iterator[dict]:
+    """
+    Sesiune proprie: dependința get_db se închide înainte ca StreamingResponse
+    să termine de trimis corpul.
+    """
+    with SessionLocal() as db:
+        result = db.execute(text(sql).execution_options(yield_per=batch), params)
+        for row in result.mappings():
+            yield row
+
+def _cell(v):
+    if v is None:
+        return ""
+    if isinstance(v, (datetime, date)):
+        return v.isoformat()
+    if isinstance(v, Decimal):
+        return str(v)
+    return v
+
+def _json_default(v):
+    if isinstance(v, (datetime, date)):
+        return v.isoformat()
+    if isinstance(v, Decimal):
+        return str(v)
+    return str(v)
+
+def _csv_chunks(columns: list[tuple[str, str]], rows: Iterable[dict]) -> Iterator[str]:
+    buf = io.StringIO()
+    w = csv.writer(buf)
+    buf.write("\ufeff")  # BOM: Excel deschide corect diacriticele
+    w.writerow([title for _, title in columns])
+    n = 0
+    for r in rows:
+        w.writerow([_cell(r.get(key)) for key, _ in columns])
+        n += 1
+        if n % BATCH_ROWS == 0:
+            yield buf.getvalue()
+            buf.seek(0)
+            buf.truncate()
+    yield buf.getvalue()
+
+def _ndjson_chunks(columns: list[tuple[str, str]], rows: Iterable[dict]) -> Iterator[str]:
+    parts: list[str] = []
+    for r in rows:
+        parts.append(json.dumps({key: r.get(key) for key, _ in columns},
+                                default=_json_default, ensure_ascii=False))
+        if len(parts) >= BATCH_ROWS:
+            yield "\n".join(parts) + "\n"
+            parts.clear()
+    if parts:
+        yield "\n".join(parts) + "\n"
+
+def export_response(fmt: ExportFormat, filename: str,
+                    columns: list[tuple[str, str]], rows: Iterable[dict]) -> StreamingResponse:
+    """`columns` = [(cheie, titlu coloană CSV)]; NDJSON folosește cheile."""
+    if fmt == "ndjson":
+        body, media, ext = _ndjson_chunks(columns, rows), "application/x-ndjson", "ndjson"
+    else:
+        body, media, ext = _csv_chunks(columns, rows), "text/csv; charset=utf-8", "csv"
+    return StreamingResponse(
+        body,
+        media_type=media,
+        headers={"Content-Disposition": f'attachment; filename="{filename}.{ext}"'},
+    )
+
+class _ZipSink:
+    """Destinație fără seek pentru zipfile: acumulează octeții până îi preia generatorul."""
+
+    def __init__(self):
+        self._parts: list[bytes] = []
+
+    def write(self, b) -> int:
+        self._parts.append(bytes(b))
+        return len(b)
+
+    def flush(self) -> None:
+        pass
+
+    def drain(self) -> bytes:
+        out = b"".join(self._parts)
+        self._parts.clear()
+        return out
+
+def zip_chunks(entries: Iterable[tuple[str, Path | bytes]]) -> Iterator[bytes]:
+    """
+    Construiește arhiva pe măsură ce e trimisă: în memorie stă cel mult un bloc
+    de ZIP_CHUNK (plus directorul central, câteva zeci de octeți per fișier).
+    Fără seek, zipfile scrie dimensiunile în data descriptor după fiecare fișier.
+    """
+    sink = _ZipSink()
+    with zipfile.ZipFile(sink, "w", compression=zipfile.ZIP_DEFLATED, compresslevel=6) as zf:
+        for name, source in entries:
+            with zf.open(name, "w", force_zip64=True) as dst:
+                if isinstance(source, Path):
+                    with source.open("rb") as src:
+                        while chunk := src.read(ZIP_CHUNK):
+                            dst.write(chunk)
+                            if data := sink.drain():
+                                yield data
+                else:
+                    dst.write(source)
+            if data := sink.drain():
+                yield data
+    yield sink.drain()
+
+def zip_response(filename: str, entries: Iterable[tuple[str, Path | bytes]]) -> StreamingResponse:
+    """`entries` = [(nume în arhivă, cale sau conținut)], consumate leneș."""
+    return StreamingResponse(
+        zip_chunks(entries),
+        media_type="application/zip",
+        headers={"Content-Disposition": f'attachment; filename="{filename}.zip"'},
+    )
@@ -0,0 +1,222 @@
+# app/services/idempotency.py
+"""
+Header-ul `Idempotency-Key` pentru endpoint-urile care scriu (creare / validare colectări).
+
+Prima cerere cu o cheie o revendică în `idempotency_keys` (IN_PROGRESS, tranzacție proprie),
+execută endpoint-ul și salvează răspunsul cu `store()` în aceeași tranzacție cu scrierile
+lui, deci cheia devine DONE exact când devin vizibile și datele. O reîncercare primește
+răspunsul salvat direct din `idempotency_keys`, fără să atingă colectările sau facturile.
+
+Duplicatele concurente nu se execută de două ori:
+- în același proces așteaptă pe un Event al primei cereri (fără interogări);
+- între procese așteaptă (cu pauze crescătoare) până când rândul devine DONE.
+O cerere care eșuează își șterge rândul IN_PROGRESS, ca reîncercarea să poată rula;
+un rând rămas după un crash e preluat după `idempotency_lock_seconds`.
+
+Cheile sunt per firmă și endpoint și expiră după `idempotency_ttl_hours`.
+"""
+import hashlib
+import json
+import threading
+import time
+import uuid
+from typing import Any
+
+from fastapi import HTTPException
+from fastapi.encoders import jsonable_encoder
+from sqlalchemy import text
+from sqlalchemy.orm import Session
+
+from app.config import settings
+from app.db import engine
+
+HEADER = "Idempotency-Key"
+REPLAYED_HEADER = "Idempotent-Replayed"
+MAX_KEY_LENGTH = 128
+
+_inflight: dict[tuple[str, str, str], threading.Event] = {}
+_inflight_lock = threading.Lock()
+
+def fingerprint(body: Any) -> str:
+    raw = json.dumps(jsonable_encoder(body), sort_keys=True, separators=(",", ":"))
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+class IdempotentCall:
+    """
+    Folosit ca context manager în jurul corpului endpoint-ului:
+
+        with idempotency.guard(db, company_id, "collections.create", key, payload) as idem:
+            if idem.replayed:
+                return idem.response
+            ...
+            idem.store(out)
+            db.commit()
+    """
+
+    def __init__(self, db: Session, company_id: str, endpoint: str, key: str | None, body: Any):
+        if key is not None and not (0 < len(key) <= MAX_KEY_LENGTH):
+            raise HTTPException(400, f"{HEADER} trebuie să aibă între 1 și {MAX_KEY_LENGTH} caractere")
+        self.db = db
+        self.company_id = company_id
+        self.endpoint = endpoint
+        self.key = key
+        self.fingerprint = fingerprint(body) if key is not None else ""
+        self.owner = str(uuid.uuid4())
+        self.replayed = False
+        self.response: Any = None
+        self._leader = False
+        self._claimed = False
+        self._stored = False
+
+    @property
+    def _id(self) -> tuple[str, str, str]:
+        return (self.company_id, self.endpoint, self.key or "")
+
+    @property
+    def _params(self) -> dict:
+        return {"c": self.company_id, "e": self.endpoint, "k": self.key}
+
+    # ----- revendicare ---------------------------------------------------------
+
+    def _try_claim(self) -> bool:
+        """True dacă rândul e al nostru; altfel completează replay-ul sau întoarce False (în curs)."""
+        p = {**self._params, "f": self.fingerprint, "o": self.owner}
+        # INSERT-ul în tranzacția lui: lock-ul partajat pus pe un duplicat se eliberează
+        # imediat, deci două preluări concurente de mai jos nu se pot bloca reciproc
+        with engine.begin() as conn:
+            if conn.execute(
+                text("""
+                INSERT IGNORE INTO idempotency_keys (company_id, endpoint, idem_key, fingerprint, status, owner)
+                VALUES (:c, :e, :k, :f, 'IN_PROGRESS', :o)
+                """),
+                p,
+            ).rowcount == 1:
+                return True
+
+        with engine.begin() as conn:
+            row = conn.execute(
+                text(f"""
+                SELECT fingerprint, status, owner, response,
+                       created_at < NOW(6) - INTERVAL {int(settings.idempotency_ttl_hours)} HOUR AS expired,
+                       updated_at < NOW(6) - INTERVAL {int(settings.idempotency_lock_seconds)} SECOND AS stale
+                  FROM idempotency_keys
+                 WHERE company_id = :c AND endpoint = :e AND idem_key = :k
+                """),
+                p,
+            ).mappings().first()
+            if row is None:
+                return False  # șters între timp de o cerere eșuată: încercăm din nou
+
+            # cheie expirată sau cerere abandonată (crash): o preluăm, dacă nu ne-a luat-o altcineva
+            if row["expired"] or (row["status"] == "IN_PROGRESS" and row["stale"]):
+                return conn.execute(
+                    text("""
+                    UPDATE idempotency_keys
+                       SET fingerprint = :f, status = 'IN_PROGRESS', owner = :o, response = NULL,
+                           created_at = NOW(6)
+                     WHERE company_id = :c AND endpoint = :e AND idem_key = :k AND owner = :prev
+                    """),
+                    {**p, "prev": row["owner"]},
+                ).rowcount == 1
+
+        if row["fingerprint"] != self.fingerprint:
+            raise HTTPException(422, f"{HEADER} a fost deja folosită pentru o cerere diferită")
+        if row["status"] == "DONE":
+            self.replayed = True
+            self.response = json.loads(row["response"]) if row["response"] else None
+        return False
+
+    def _acquire(self) -> None:
+        deadline = time.monotonic() + settings.idempotency_wait_seconds
+        pause = 0.05
+        while True:
+            with _inflight_lock:
+                ev = _inflight.get(self._id)
+                if ev is None:
+                    _inflight[self._id] = threading.Event()
+                    self._leader = True
+            if not self._leader:
+                # același proces: așteptăm cererea în curs, apoi citim rezultatul ei
+                if not ev.wait(max(0.0, deadline - time.monotonic())):
+                    break
+                continue
+
+            try:
+                self._claimed = self._try_claim()
+            except BaseException:
+                self._wake()
+                raise
+            if self._claimed or self.replayed:
+                return
+            # alt proces execută cererea: eliberăm Event-ul local și reîncercăm după o pauză
+            self._wake()
+            if time.monotonic() + pause > deadline:
+                break
+            time.sleep(pause)
+            pause = min(pause * 2, 0.5)
+
+        raise HTTPException(409, f"O cerere cu același {HEADER} este încă în curs")
+
+    def _wake(self) -> None:
+        if self._leader:
+            with _inflight_lock:
+                ev = _inflight.pop(self._id, None)
+            self._leader = False
+            if ev is not None:
+                ev.set()
+
+    # ----- API pentru endpoint -----------------------------------------------------
+
+    def store(self, response: Any) -> None:
+        """În tranzacția endpoint-ului, chiar înainte de commit. Fără cheie nu face nimic."""
+        if not self._claimed:
+            return
+        updated = self.db.execute(
+            text("""
+            UPDATE idempotency_keys SET status = 'DONE', response = :r
+             WHERE company_id = :c AND endpoint = :e AND idem_key = :k AND owner = :o
+            """),
+            {**self._params, "o": self.owner, "r": json.dumps(jsonable_encoder(response))},
+        ).rowcount
+        if updated != 1:
+            # am depășit idempotency_lock_seconds și cheia a fost preluată de o reîncercare:
+            # fără commit, altfel operația s-ar executa de două ori. __exit__ face rollback,
+            # iar DELETE-ul lui (filtrat pe owner) nu atinge rândul celeilalte cereri
+            raise HTTPException(409, f"O cerere cu același {HEADER} a preluat execuția; reîncearcă")
+        self._stored = True
+
+    def __enter__(self) -> "IdempotentCall":
+        if self.key is not None:
+            self._acquire()
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        try:
+            if self._claimed and (exc_type is not None or not self._stored):
+                # cererea a eșuat (sau nu a salvat nimic): cheia rămâne liberă pentru reîncercare;
+                # dacă răspunsul a apucat să fie salvat cu commit, rândul e DONE și rămâne.
+                # Rollback întâi: sesiunea poate ține lock pe rând (după store, fără commit)
+                self.db.rollback()
+                with engine.begin() as conn:
+                    conn.execute(
+                        text("""
+                        DELETE FROM idempotency_keys
+                         WHERE company_id = :c AND endpoint = :e AND idem_key = :k
+                           AND owner = :o AND status = 'IN_PROGRESS'
+                        """),
+                        {**self._params, "o": self.owner},
+                    )
+        finally:
+            self._wake()
+
+def guard(db: Session, company_id: str, endpoint: str, key: str | None, body: Any) -> IdempotentCall:
+    return IdempotentCall(db, company_id, endpoint, key, body)
+
+def purge_expired(db: Session) -> int:
+    """Șterge cheile mai vechi de idempotency_ttl_hours (fără commit)."""
+    return db.execute(
+        text(f"""
+        DELETE FROM idempotency_keys
+         WHERE created_at < NOW(6) - INTERVAL {int(settings.idempotency_ttl_hours)} HOUR
+        """)
+    ).rowcount
@@ -0,0 +1,202 @@
+# app/services/numbering.py
+"""
+Alocarea numerelor de factură, fără lock pe `company_invoice_settings`.
+
+Numerele vin din `invoice_number_counters` (un contor per bază, serie și an; anul e 0
+pentru seriile fără resetare anuală), într-o tranzacție separată și scurtă: un UPDATE
+atomic cu LAST_INSERT_ID, fără nimic altceva ținut sub lock. Validarea continuă apoi
+în tranzacția ei.
+
+Ca seria să rămână fără goluri, fiecare număr alocat e înregistrat în
+`invoice_number_slots` ca RESERVED:
+- validarea reușită șterge rezervarea în aceeași tranzacție cu factura (`confirm`);
+- validarea eșuată o eliberează (`release`, FREE + audit INVOICE_NUMBER_VOIDED);
+- o rezervare rămasă după un crash e eliberată după RESERVATION_TTL_MINUTES.
+Numerele FREE sunt refolosite primele, în ordine crescătoare (audit INVOICE_NUMBER_REUSED).
+"""
+import json
+from datetime import date
+
+from sqlalchemy import bindparam, text
+from sqlalchemy.engine import Connection
+from sqlalchemy.orm import Session
+
+from app.db import engine
+
+RESERVATION_TTL_MINUTES = 10
+
+def format_number(series: str, year_reset: bool, today: date, num: int) -> str:
+    return f"{series}-{today.year}-{num:06d}" if year_reset else f"{series}-{num:06d}"
+
+def counter_year(year_reset: bool, today: date) -> int:
+    return today.year if year_reset else 0
+
+def _audit(conn: Connection, base_company_id: str, actor_user_id: str | None, action: str, details: dict) -> None:
+    conn.execute(
+        text("""INSERT INTO audit_logs(actor_user_id, actor_company_id, action, details)
+                VALUES (:uid, :cid, :a, :d)"""),
+        {"uid": actor_user_id, "cid": base_company_id, "a": action, "d": json.dumps(details)},
+    )
+
+def _number_prefix(series: str, year: int) -> str:
+    # partea fixă din format_number pentru contorul (serie, an)
+    return f"{series}-{year}-" if year else f"{series}-"
+
+def _ensure_counter(conn: Connection, base_company_id: str, series: str, year: int) -> None:
+    """
+    Un contor nou pornește după orice număr deja emis în același format (de ex. la
+    dezactivarea resetării anuale, "INV-000123" din perioada de dinainte), altfel ar
+    emite numere existente. Contorul anual mai pornește și de la next_number din setări
+    dacă e primul al seriei; cel fără an (year = 0) pornește mereu cel puțin de acolo,
+    fiindcă next_number e contorul vechi al numerelor "SERIE-NNNNNN".
+    """
+    prefix = _number_prefix(series, year)
+    conn.execute(
+        text("""
+        INSERT IGNORE INTO invoice_number_counters (base_company_id, series_code, year, next_number)
+        SELECT :b, :s, :y,
+               GREATEST(
+                 IF(:y = 0 OR NOT EXISTS(SELECT 1 FROM invoice_number_counters
+                                          WHERE base_company_id = :b AND series_code = :s),
+                    COALESCE((SELECT next_number FROM company_invoice_settings WHERE base_company_id = :b), 1),
+                    1),
+                 COALESCE((SELECT MAX(CAST(SUBSTRING(i.invoice_number, CHAR_LENGTH(:p) + 1) AS UNSIGNED))
+                             FROM invoices i
+                            WHERE i.base_company_id = :b
+                              AND LEFT(i.invoice_number, CHAR_LENGTH(:p)) = :p
+                              AND SUBSTRING(i.invoice_number, CHAR_LENGTH(:p) + 1) REGEXP '^[0-9]+$'), 0) + 1
+               )
+        """),
+        {"b": base_company_id, "s": series, "y": year, "p": prefix},
+    )
+
+def allocate(
+    base_company_id: str,
+    series: str,
+    year_reset: bool,
+    today: date,
+    n: int = 1,
+    actor_user_id: str | None = None,
+) -> list[tuple[int, str]]:
+    """
+    Rezervă `n` numere și face commit imediat, pe o conexiune proprie.
+    Întoarce [(număr, număr formatat)], crescător.
+    """
+    year = counter_year(year_reset, today)
+    key = {"b": base_company_id, "s": series, "y": year}
+    with engine.begin() as conn:
+        # rezervări orfane (proces oprit între alocare și commit-ul facturii)
+        conn.execute(
+            text(f"""
+            UPDATE invoice_number_slots s
+               SET s.status = 'FREE'
+             WHERE s.base_company_id = :b AND s.series_code = :s AND s.year = :y
+               AND s.status = 'RESERVED'
+               AND s.reserved_at < NOW(6) - INTERVAL {RESERVATION_TTL_MINUTES} MINUTE
+               AND NOT EXISTS (SELECT 1 FROM invoices i
+                                WHERE i.base_company_id = s.base_company_id
+                                  AND i.invoice_number = s.invoice_number)
+            """),
+            key,
+        )
+
+        reused = [r[0] for r in conn.execute(
+            text("""
+            SELECT number FROM invoice_number_slots
+             WHERE base_company_id = :b AND series_code = :s AND year = :y AND status = 'FREE'
+             ORDER BY number
+             LIMIT :n
+             FOR UPDATE SKIP LOCKED
+            """),
+            {**key, "n": n},
+        ).all()]
+        if reused:
+            conn.execute(
+                text("""
+                UPDATE invoice_number_slots SET status = 'RESERVED', reserved_at = NOW(6)
+                 WHERE base_company_id = :b AND series_code = :s AND year = :y AND number IN :nums
+                """).bindparams(bindparam("nums", expanding=True)),
+                {**key, "nums": reused},
+            )
+            _audit(conn, base_company_id, actor_user_id, "INVOICE_NUMBER_REUSED",
+                   {"series": series, "year": year, "numbers": reused})
+
+        fresh: list[int] = []
+        k = n - len(reused)
+        if k > 0:
+            bump = text("""
+                UPDATE invoice_number_counters
+                   SET next_number = LAST_INSERT_ID(next_number + :k)
+                 WHERE base_company_id = :b AND series_code = :s AND year = :y
+            """)
+            # UPDATE întâi: INSERT IGNORE pe un rând existent ar lua un lock partajat
+            # și două alocări concurente s-ar bloca reciproc la upgrade
+            if conn.execute(bump, {**key, "k": k}).rowcount == 0:
+                _ensure_counter(conn, base_company_id, series, year)
+                conn.execute(bump, {**key, "k": k})
+            end = int(conn.execute(text("SELECT LAST_INSERT_ID()")).scalar())
+            fresh = list(range(end - k, end))
+            conn.execute(
+                text("""
+                INSERT INTO invoice_number_slots (base_company_id, series_code, year, number, invoice_number, status, reserved_at)
+                VALUES (:b, :s, :y, :num, :no, 'RESERVED', NOW(6))
+                """),
+                [{**key, "num": x, "no": format_number(series, year_reset, today, x)} for x in fresh],
+            )
+
+    return [(x, format_number(series, year_reset, today, x)) for x in sorted(reused + fresh)]
+
+def confirm(db: Session, base_company_id: str, series: str, year_reset: bool, today: date, numbers: list[int]) -> None:
+    """În tranzacția facturii: numerele devin definitive odată cu commit-ul ei."""
+    db.execute(
+        text("""
+        DELETE FROM invoice_number_slots
+         WHERE base_company_id = :b AND series_code = :s AND year = :y AND number IN :nums
+        """).bindparams(bindparam("nums", expanding=True)),
+        {"b": base_company_id, "s": series, "y": counter_year(year_reset, today), "nums": numbers},
+    )
+
+def release(
+    base_company_id: str,
+    series: str,
+    year_reset: bool,
+    today: date,
+    numbers: list[int],
+    reason: str,
+    actor_user_id: str | None = None,
+) -> None:
+    """Anulează rezervările unei validări eșuate; numerele vor fi refolosite."""
+    if not numbers:
+        return
+    year = counter_year(year_reset, today)
+    with engine.begin() as conn:
+        conn.execute(
+            text("""
+            UPDATE invoice_number_slots SET status = 'FREE'
+             WHERE base_company_id = :b AND series_code = :s AND year = :y
+               AND status = 'RESERVED' AND number IN :nums
+            """).bindparams(bindparam("nums", expanding=True)),
+            {"b": base_company_id, "s": series, "y": year, "nums": numbers},
+        )
+        _audit(conn, base_company_id, actor_user_id, "INVOICE_NUMBER_VOIDED",
+               {"series": series, "year": year, "numbers": numbers, "reason": reason})
+
+def peek_next(db: Session, base_company_id: str, series: str, year_reset: bool, today: date) -> int | None:
+    """Următorul număr nou din contor (fără cele FREE), pentru afișare în setări."""
+    v = db.execute(
+        text("""SELECT next_number FROM invoice_number_counters
+                 WHERE base_company_id = :b AND series_code = :s AND year = :y"""),
+        {"b": base_company_id, "s": series, "y": counter_year(year_reset, today)},
+    ).scalar()
+    return int(v) if v is not None else None
+
+def set_floor(db: Session, base_company_id: str, series: str, year_reset: bool, today: date, next_number: int) -> None:
+    """Sare contorul anului curent la `next_number` (doar înainte; fără commit)."""
+    db.execute(
+        text("""
+        INSERT INTO invoice_number_counters (base_company_id, series_code, year, next_number)
+        VALUES (:b, :s, :y, :n)
+        ON DUPLICATE KEY UPDATE next_number = GREATEST(next_number, VALUES(next_number))
+        """),
+        {"b": base_company_id, "s": series, "y": counter_year(year_reset, today), "n": next_number},
+    )
@@ -1,7 +1,9 @@
 # app/services/pdf.py
 from pathlib import Path
 import io
+import threading
 from decimal import Decimal, ROUND_HALF_UP
+from reportlab import rl_config
 from reportlab.lib.pagesizes import A4
 from reportlab.lib import colors
 from reportlab.lib.units import mm
@@ -12,6 +14,10 @@ from reportlab.pdfbase.ttfonts import TTFont
 
 FONTS_DIR = Path(__file__).resolve().parent.parent / "templates" / "fonts"
 
+# fără dată de creare și ID aleator în PDF: aceleași date dau aceiași octeți (și același SHA-256),
+# cât timp fonturile și șablonul nu se schimbă; download_pdf ia oricum ETag-ul din fișierul servit
+rl_config.invariant = 1
+
 def _try_register_noto() -> tuple[str, str]:
     """
     Try to register Noto Sans (Unicode). If fonts are missing,
@@ -57,50 +63,70 @@ def _fmt_addr(p: dict) -> str:
         parts.append(str(p["country"]))
     return ", ".join(parts)
 
-def render_invoice_pdf(invoice: dict, items: list[dict], base_profile: dict, client_profile: dict) -> bytes:
+class PdfRenderer:
     """
-    Generează PDF (bytes) cu ReportLab.
-    - Folosește Noto Sans dacă e disponibil; altfel Helvetica.
-    - Afișează coloană de greutate (kg) dacă item-urile includ 'weight_kg'.
+    Renderer de facturi construit o singură dată per proces: fonturile sunt înregistrate,
+    iar stilurile de paragraf și TableStyle-urile sunt create aici și doar citite la randare.
+    Apelanții furnizează numai datele.
     """
-    font_normal, font_bold = _try_register_noto()
-
-    buf = io.BytesIO()
-    doc = SimpleDocTemplate(
-        buf,
-        pagesize=A4,
-        leftMargin=16 * mm,
-        rightMargin=16 * mm,
-        topMargin=16 * mm,
-        bottomMargin=16 * mm,
-        title=f"Factura {invoice.get('invoice_number','')}",
-    )
-
-    ss = getSampleStyleSheet()
-    normal = ParagraphStyle(
-        "NormalCustom", parent=ss["Normal"], fontName=font_normal, fontSize=10, leading=13
-    )
-    strong = ParagraphStyle(
-        "BoldCustom", parent=normal, fontName=font_bold
-    )
-    h1 = ParagraphStyle(
-        "H1Custom", parent=strong, fontSize=16, leading=18, spaceAfter=6
-    )
-    small = ParagraphStyle(
-        "SmallCustom", parent=normal, fontSize=9, leading=11, textColor=colors.grey
-    )
-
-    story = []
-    # Header
-    story.append(Paragraph(f"Factura {invoice.get('invoice_number','')}", h1))
-    story.append(Paragraph(
-        f"Emisă: {invoice.get('issue_date','')} • Scadentă: {invoice.get('due_date','')}", small
-    ))
-    story.append(Spacer(1, 6))
-
-    # Furnizor / Client
-    def block_company(title, p):
+
+    def __init__(self):
+        self.font_normal, self.font_bold = _try_register_noto()
+        font_normal, font_bold = self.font_normal, self.font_bold
+
+        ss = getSampleStyleSheet()
+        self.normal = ParagraphStyle(
+            "NormalCustom", parent=ss["Normal"], fontName=font_normal, fontSize=10, leading=13
+        )
+        self.strong = ParagraphStyle(
+            "BoldCustom", parent=self.normal, fontName=font_bold
+        )
+        self.h1 = ParagraphStyle(
+            "H1Custom", parent=self.strong, fontSize=16, leading=18, spaceAfter=6
+        )
+        self.small = ParagraphStyle(
+            "SmallCustom", parent=self.normal, fontSize=9, leading=11, textColor=colors.grey
+        )
+
+        self.company_style = TableStyle([
+            ("FONT", (0,0), (-1,-1), font_normal, 10),
+            ("VALIGN", (0,0), (-1,-1), "TOP"),
+            ("BOTTOMPADDING", (0,0), (-1,-1), 1),
+            ("TOPPADDING", (0,0), (-1,-1), 1),
+        ])
+        self.top_style = TableStyle([("VALIGN", (0,0), (-1,-1), "TOP")])
+        self.lines_style = TableStyle([
+            ("FONT", (0,0), (-1,-1), font_normal, 10),
+            ("GRID", (0,0), (-1,-1), 0.25, colors.HexColor("#DDDDDD")),
+            ("BACKGROUND", (0,0), (-1,0), colors.HexColor("#F7F7F7")),
+            ("ALIGN", (2,1), (-1,-1), "RIGHT"),
+            ("ALIGN", (1,0), (1,0), "LEFT"),
+            ("VALIGN", (0,0), (-1,-1), "MIDDLE"),
+            ("BOTTOMPADDING", (0,0), (-1,-1), 4),
+            ("TOPPADDING", (0,0), (-1,-1), 4),
+        ])
+        self.totals_style = TableStyle([
+            ("FONT", (0,0), (-1,-1), font_normal, 10),
+            ("ALIGN", (1,0), (-1,-1), "RIGHT"),
+            ("LINEABOVE", (1,2), (2,2), 0.25, colors.black),
+            ("FONT", (1,2), (2,2), font_bold, 10),
+            ("RIGHTPADDING", (2,0), (2,-1), 2),
+        ])
+
+    def warm(self) -> None:
+        """O randare de probă: încarcă tabelele de glife și drumul de subsetare TTF."""
+        self.render(
+            invoice={"invoice_number": "WARMUP", "issue_date": "", "due_date": "",
+                     "vat_rate": "19", "subtotal": "0", "vat_amount": "0", "total": "0"},
+            items=[{"line_no": 1, "description": "ăâîșț ĂÂÎȘȚ 0123456789", "qty": 1,
+                    "unit": "buc", "unit_price": 0, "line_total": 0, "weight_kg": 0}],
+            base_profile={"legal_name": "Furnizor", "cui": "1"},
+            client_profile={"legal_name": "Client", "cui": "2"},
+        )
+
+    def _block_company(self, title, p):
         p = p or {}
+        normal, strong = self.normal, self.strong
         lines = []
         lines.append([Paragraph(f"<b>{title}</b>", strong), ""])
         name = p.get("legal_name") or p.get("company_name", "")
@@ -115,91 +141,120 @@ def render_invoice_pdf(invoice: dict, items: list[dict], base_profile: dict, cli
         if p.get("email_billing"): lines.append([f"Email: {p['email_billing']}", ""])
         if p.get("phone_billing"): lines.append([f"Telefon: {p['phone_billing']}", ""])
         tbl = Table(lines, colWidths=[85*mm, 85*mm])
-        tbl.setStyle(TableStyle([
-            ("FONT", (0,0), (-1,-1), font_normal, 10),
-            ("VALIGN", (0,0), (-1,-1), "TOP"),
-            ("BOTTOMPADDING", (0,0), (-1,-1), 1),
-            ("TOPPADDING", (0,0), (-1,-1), 1),
-        ]))
+        tbl.setStyle(self.company_style)
         return tbl
 
-    top_tbl = Table(
-        [[block_company("Furnizor (BASE)", base_profile),
-          block_company("Client", client_profile)]],
-        colWidths=[90*mm, 90*mm],
-        hAlign="LEFT"
-    )
-    top_tbl.setStyle(TableStyle([("VALIGN", (0,0), (-1,-1), "TOP")]))
-    story.append(Spacer(1, 6))
-    story.append(top_tbl)
-    story.append(Spacer(1, 8))
-
-    # Tabel linii
-    currency = invoice.get("currency", "RON")
-    has_weight = any("weight_kg" in it for it in (items or []))
-
-    if has_weight:
-        head = ["#", "Descriere", "Greutate (kg)", "Cant.", "UM", "Preț unitar", "Valoare"]
-        col_widths = [12*mm, 66*mm, 22*mm, 18*mm, 14*mm, 24*mm, 24*mm]  # total ~180mm
-    else:
-        head = ["#", "Descriere", "Cant.", "UM", "Preț unitar", "Valoare"]
-        col_widths = [12*mm, 78*mm, 18*mm, 14*mm, 30*mm, 28*mm]
-
-    data = [head]
-    for it in (items or []):
-        row = [
-            it.get("line_no", 1),
-            it.get("description", ""),
-        ]
+    def render(self, invoice: dict, items: list[dict], base_profile: dict, client_profile: dict) -> bytes:
+        """
+        Generează PDF (bytes) cu ReportLab.
+        - Folosește Noto Sans dacă e disponibil; altfel Helvetica.
+        - Afișează coloană de greutate (kg) dacă item-urile includ 'weight_kg'.
+        """
+        h1, small = self.h1, self.small
+
+        buf = io.BytesIO()
+        doc = SimpleDocTemplate(
+            buf,
+            pagesize=A4,
+            leftMargin=16 * mm,
+            rightMargin=16 * mm,
+            topMargin=16 * mm,
+            bottomMargin=16 * mm,
+            title=f"Factura {invoice.get('invoice_number','')}",
+        )
+
+        story = []
+        # Header
+        story.append(Paragraph(f"Factura {invoice.get('invoice_number','')}", h1))
+        story.append(Paragraph(
+            f"Emisă: {invoice.get('issue_date','')} • Scadentă: {invoice.get('due_date','')}", small
+        ))
+        story.append(Spacer(1, 6))
+
+        # Furnizor / Client
+        top_tbl = Table(
+            [[self._block_company("Furnizor (BASE)", base_profile),
+              self._block_company("Client", client_profile)]],
+            colWidths=[90*mm, 90*mm],
+            hAlign="LEFT"
+        )
+        top_tbl.setStyle(self.top_style)
+        story.append(Spacer(1, 6))
+        story.append(top_tbl)
+        story.append(Spacer(1, 8))
+
+        # Tabel linii
+        currency = invoice.get("currency", "RON")
+        has_weight = any("weight_kg" in it for it in (items or []))
+
         if has_weight:
-            row.append(_fmt2(it.get("weight_kg", 0)))
-        row.extend([
-            _fmt2(it.get("qty", 0)),
-            it.get("unit", ""),
-            f"{_fmt2(it.get('unit_price', 0))} {currency}",
-            f"{_fmt2(it.get('line_total', 0))} {currency}",
-        ])
-        data.append(row)
-
-    line_tbl = Table(
-        data,
-        colWidths=col_widths,
-        repeatRows=1
-    )
-    line_tbl.setStyle(TableStyle([
-        ("FONT", (0,0), (-1,-1), font_normal, 10),
-        ("GRID", (0,0), (-1,-1), 0.25, colors.HexColor("#DDDDDD")),
-        ("BACKGROUND", (0,0), (-1,0), colors.HexColor("#F7F7F7")),
-        ("ALIGN", (2,1), (-1,-1), "RIGHT"),
-        ("ALIGN", (1,0), (1,0), "LEFT"),
-        ("VALIGN", (0,0), (-1,-1), "MIDDLE"),
-        ("BOTTOMPADDING", (0,0), (-1,-1), 4),
-        ("TOPPADDING", (0,0), (-1,-1), 4),
-    ]))
-    story.append(line_tbl)
-    story.append(Spacer(1, 6))
-
-    # Totaluri
-    subtotal = _fmt2(invoice.get("subtotal", 0))
-    vat_rate = invoice.get("vat_rate", "0")
-    vat_amount = _fmt2(invoice.get("vat_amount", 0))
-    total = _fmt2(invoice.get("total", 0))
-
-    totals = Table([
-        ["", "Subtotal", f"{subtotal} {currency}"],
-        ["", f"TVA ({vat_rate}%)", f"{vat_amount} {currency}"],
-        ["", "Total", f"{total} {currency}"],
-    ], colWidths=[110*mm, 40*mm, 40*mm])
-    totals.setStyle(TableStyle([
-        ("FONT", (0,0), (-1,-1), font_normal, 10),
-        ("ALIGN", (1,0), (-1,-1), "RIGHT"),
-        ("LINEABOVE", (1,2), (2,2), 0.25, colors.black),
-        ("FONT", (1,2), (2,2), font_bold, 10),
-        ("RIGHTPADDING", (2,0), (2,-1), 2),
-    ]))
-    story.append(totals)
-    story.append(Spacer(1, 8))
-    story.append(Paragraph("Document generat automat.", small))
-
-    doc.build(story)
-    return buf.getvalue()
+            head = ["#", "Descriere", "Greutate (kg)", "Cant.", "UM", "Preț unitar", "Valoare"]
+            col_widths = _COLS_WITH_WEIGHT
+        else:
+            head = ["#", "Descriere", "Cant.", "UM", "Preț unitar", "Valoare"]
+            col_widths = _COLS_NO_WEIGHT
+
+        data = [head]
+        for it in (items or []):
+            row = [
+                it.get("line_no", 1),
+                it.get("description", ""),
+            ]
+            if has_weight:
+                row.append(_fmt2(it.get("weight_kg", 0)))
+            row.extend([
+                _fmt2(it.get("qty", 0)),
+                it.get("unit", ""),
+                f"{_fmt2(it.get('unit_price', 0))} {currency}",
+                f"{_fmt2(it.get('line_total', 0))} {currency}",
+            ])
+            data.append(row)
+
+        line_tbl = Table(
+            data,
+            colWidths=col_widths,
+            repeatRows=1
+        )
+        line_tbl.setStyle(self.lines_style)
+        story.append(line_tbl)
+        story.append(Spacer(1, 6))
+
+        # Totaluri
+        subtotal = _fmt2(invoice.get("subtotal", 0))
+        vat_rate = invoice.get("vat_rate", "0")
+        vat_amount = _fmt2(invoice.get("vat_amount", 0))
+        total = _fmt2(invoice.get("total", 0))
+
+        totals = Table([
+            ["", "Subtotal", f"{subtotal} {currency}"],
+            ["", f"TVA ({vat_rate}%)", f"{vat_amount} {currency}"],
+            ["", "Total", f"{total} {currency}"],
+        ], colWidths=_COLS_TOTALS)
+        totals.setStyle(self.totals_style)
+        story.append(totals)
+        story.append(Spacer(1, 8))
+        story.append(Paragraph("Document generat automat.", small))
+
+        doc.build(story)
+        return buf.getvalue()
+
+_COLS_WITH_WEIGHT = [12*mm, 66*mm, 22*mm, 18*mm, 14*mm, 24*mm, 24*mm]  # total ~180mm
+_COLS_NO_WEIGHT = [12*mm, 78*mm, 18*mm, 14*mm, 30*mm, 28*mm]
+_COLS_TOTALS = [110*mm, 40*mm, 40*mm]
+
+_renderer: PdfRenderer | None = None
+_renderer_lock = threading.Lock()
+
+def get_renderer() -> PdfRenderer:
+    """Renderer-ul procesului, creat (și încălzit) la primul apel; main.py îl cere la startup."""
+    global _renderer
+    if _renderer is None:
+        with _renderer_lock:
+            if _renderer is None:
+                r = PdfRenderer()
+                r.warm()
+                _renderer = r
+    return _renderer
+
+def render_invoice_pdf(invoice: dict, items: list[dict], base_profile: dict, client_profile: dict) -> bytes:
+    return get_renderer().render(invoice, items, base_profile, client_profile)
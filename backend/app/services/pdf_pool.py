@@ -0,0 +1,133 @@
+# app/services/pdf_pool.py
+"""
+Randare PDF în procese separate.
+
+Layout-ul ReportLab e CPU-bound și ține GIL-ul, deci în procesul API iese cel mult
+un PDF odată. `PdfRenderPool` trimite randările la un ProcessPoolExecutor cu
+`pdf_pool_processes` procese (fiecare worker uvicorn are pool-ul lui, deci mărimea e
+fixă, nu câte nuclee); fiecare proces își încarcă fonturile și stilurile la pornire.
+"""
+import logging
+import multiprocessing
+import threading
+import time
+from concurrent.futures import Future, ProcessPoolExecutor, TimeoutError as FutureTimeout
+from typing import Iterable
+
+from app.config import settings
+from app.services.pdf import get_renderer
+
+logger = logging.getLogger("app.pdf_pool")
+
+# (invoice, items, base_profile, client_profile) — exact argumentele lui render_invoice_pdf
+PdfJob = tuple[dict, list[dict], dict, dict]
+
+def _init_worker() -> None:
+    get_renderer()
+
+def _render_job(job: PdfJob) -> bytes:
+    invoice, items, base_profile, client_profile = job
+    return get_renderer().render(invoice, items, base_profile, client_profile)
+
+class PdfRenderTimeout(Exception):
+    pass
+
+class PdfRenderPool:
+    """
+    - `processes`: numărul de procese; 0 = randare în procesul curent (fără pool)
+    - `max_pending`: câte joburi pot aștepta în pool; peste el `submit` blochează (backpressure)
+    - `timeout_seconds`: termenul per job, numărat de la trimitere
+    Un job depășit e raportat ca PdfRenderTimeout; procesul care îl rulează nu poate fi
+    întrerupt, dar rezultatul lui e ignorat.
+    """
+
+    def __init__(self, processes: int, max_pending: int, timeout_seconds: float):
+        self.processes = processes
+        self.max_pending = max(1, max_pending)
+        self.timeout_seconds = timeout_seconds
+        self._executor: ProcessPoolExecutor | None = None
+        self._slots = threading.BoundedSemaphore(self.max_pending)
+        self._lock = threading.Lock()
+
+    @property
+    def running(self) -> bool:
+        return self._executor is not None
+
+    def start(self) -> None:
+        with self._lock:
+            if self._executor is not None or self.processes <= 0:
+                return
+            # spawn: procesul API are fire (workeri de coadă, pool DB), iar fork-ul lor e nesigur
+            self._executor = ProcessPoolExecutor(
+                max_workers=self.processes,
+                mp_context=multiprocessing.get_context("spawn"),
+                initializer=_init_worker,
+            )
+
+    def stop(self) -> None:
+        with self._lock:
+            ex, self._executor = self._executor, None
+        if ex is not None:
+            ex.shutdown(wait=False, cancel_futures=True)
+
+    def submit(self, job: PdfJob) -> Future:
+        """Trimite un job; blochează cât timp sunt deja `max_pending` joburi în lucru."""
+        ex = self._executor
+        if ex is None:
+            raise RuntimeError("PdfRenderPool nu este pornit")
+        self._slots.acquire()
+        try:
+            fut = ex.submit(_render_job, job)
+        except BaseException:
+            self._slots.release()
+            raise
+        fut.add_done_callback(lambda _f: self._slots.release())
+        return fut
+
+    def _wait(self, fut: Future, deadline: float) -> bytes:
+        try:
+            return fut.result(timeout=max(0.0, deadline - time.monotonic()))
+        except FutureTimeout:
+            fut.cancel()
+            raise PdfRenderTimeout(f"Randarea PDF a depășit {self.timeout_seconds:.0f}s")
+
+    def render(self, job: PdfJob) -> bytes:
+        """Un singur PDF; în procesul curent dacă pool-ul nu rulează."""
+        if self._executor is None:
+            return _render_job(job)
+        deadline = time.monotonic() + self.timeout_seconds
+        return self._wait(self.submit(job), deadline)
+
+    def render_many(self, jobs: Iterable[PdfJob]) -> list[bytes | Exception]:
+        """
+        Randează un lot (re-randări, rulări de final de lună). Rezultatele vin în ordinea
+        joburilor; un job eșuat sau depășit apare ca excepție pe poziția lui, fără să
+        oprească restul lotului.
+        """
+        if self._executor is None:
+            out: list[bytes | Exception] = []
+            for job in jobs:
+                try:
+                    out.append(_render_job(job))
+                except Exception as e:
+                    out.append(e)
+            return out
+
+        submitted: list[tuple[Future, float]] = []
+        for job in jobs:
+            # submit blochează la max_pending, deci lotul nu umple memoria cu joburi
+            submitted.append((self.submit(job), time.monotonic() + self.timeout_seconds))
+
+        results: list[bytes | Exception] = []
+        for fut, deadline in submitted:
+            try:
+                results.append(self._wait(fut, deadline))
+            except Exception as e:
+                results.append(e)
+        return results
+
+pdf_pool = PdfRenderPool(
+    processes=settings.pdf_pool_processes,
+    max_pending=settings.pdf_pool_max_pending,
+    timeout_seconds=settings.pdf_render_timeout_seconds,
+)
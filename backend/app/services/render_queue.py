@@ -0,0 +1,318 @@
+# app/services/render_queue.py
+"""
+Coadă de randare PDF pentru facturi.
+
+Validarea doar înscrie un job în `pdf_render_jobs` (în aceeași tranzacție cu factura),
+iar workerii de aici îl preiau după commit și randează PDF-ul în afara lock-urilor
+de numerotare. Starea e vizibilă pe factură în `invoices.pdf_status`.
+"""
+import json
+import logging
+import threading
+from contextlib import contextmanager
+from pathlib import Path
+
+from sqlalchemy import text
+from sqlalchemy.orm import Session
+
+from app.config import settings
+from app.db import SessionLocal, engine
+from app.services.billing_context import load_billing_context
+from app.services.pdf_pool import pdf_pool
+from app.services.storage import pdf_storage
+
+logger = logging.getLogger("app.render_queue")
+
+def enqueue_render(db: Session, invoice_id: str) -> None:
+    """Pune factura în coadă. Nu face commit: jobul devine vizibil odată cu factura."""
+    enqueue_renders(db, [invoice_id])
+
+def enqueue_renders(db: Session, invoice_ids: list[str]) -> None:
+    """Variantă bulk (un executemany per tabel) pentru validările în lot."""
+    if not invoice_ids:
+        return
+    params = [{"id": i} for i in invoice_ids]
+    db.execute(
+        text("""
+        INSERT INTO pdf_render_jobs (invoice_id, status, attempts)
+        VALUES (:id, 'QUEUED', 0)
+        ON DUPLICATE KEY UPDATE status = 'QUEUED', attempts = 0, last_error = NULL
+        """),
+        params,
+    )
+    db.execute(
+        text("UPDATE invoices SET pdf_status = 'PENDING' WHERE invoice_id = :id"),
+        params,
+    )
+
+def load_invoice_for_pdf(db: Session, invoice_id: str) -> tuple[dict, list[dict], dict, dict] | None:
+    """Reconstruiește din DB argumentele pentru render_invoice_pdf."""
+    inv = db.execute(
+        text("""
+        SELECT invoice_id, base_company_id, client_company_id, invoice_number,
+               issue_date, due_date, currency, vat_rate, subtotal, vat_amount, total,
+               base_snapshot, client_snapshot
+          FROM invoices
+         WHERE invoice_id = :id
+        """),
+        {"id": invoice_id},
+    ).mappings().first()
+    if not inv:
+        return None
+
+    rows = db.execute(
+        text("""
+        SELECT line_no, description, qty, unit, unit_price, line_total, weight_kg
+          FROM invoice_items
+         WHERE invoice_id = :id
+         ORDER BY line_no
+        """),
+        {"id": invoice_id},
+    ).mappings().all()
+
+    items = []
+    for r in rows:
+        it = {
+            "line_no": r["line_no"],
+            "description": r["description"],
+            "qty": str(r["qty"]),
+            "unit": r["unit"],
+            "unit_price": str(r["unit_price"]),
+            "line_total": str(r["line_total"]),
+        }
+        if r["weight_kg"] is not None:
+            it["weight_kg"] = str(r["weight_kg"])
+        items.append(it)
+
+    invoice = {
+        "invoice_number": inv["invoice_number"],
+        "issue_date": inv["issue_date"].isoformat(),
+        "due_date": inv["due_date"].isoformat(),
+        "currency": inv["currency"],
+        "vat_rate": str(inv["vat_rate"]),
+        "subtotal": str(inv["subtotal"]),
+        "vat_amount": str(inv["vat_amount"]),
+        "total": str(inv["total"]),
+    }
+
+    # părțile așa cum erau la emitere (InvoiceWriter); fără snapshot doar facturile
+    # dinaintea coloanelor, care iau profilele curente
+    base, client = _snapshot(inv["base_snapshot"]), _snapshot(inv["client_snapshot"])
+    if base is None or client is None:
+        ctx = load_billing_context(db, str(inv["base_company_id"]), str(inv["client_company_id"]))
+        base = base if base is not None else dict(ctx.base.fields)
+        client = client if client is not None else dict(ctx.client.fields)
+    return invoice, items, base, client
+
+def _snapshot(raw) -> dict | None:
+    if raw is None:
+        return None
+    return json.loads(raw) if isinstance(raw, (str, bytes)) else dict(raw)
+
+def _store_pdf(db: Session, invoice_id: str, pdf_bytes: bytes) -> Path:
+    stored = pdf_storage.put(pdf_bytes)
+    db.execute(
+        text("""
+        UPDATE invoices
+           SET pdf_path = :p, pdf_sha256 = :sha, pdf_size = :size, pdf_status = 'READY'
+         WHERE invoice_id = :id
+        """),
+        {"p": stored.key, "sha": stored.sha256, "size": stored.size, "id": invoice_id},
+    )
+    return pdf_storage.path_for(stored.sha256)
+
+def render_invoice_to_file(db: Session, invoice_id: str) -> Path | None:
+    """Randează PDF-ul facturii, îl scrie pe disc și marchează factura READY (fără commit)."""
+    loaded = load_invoice_for_pdf(db, invoice_id)
+    if loaded is None:
+        return None
+    return _store_pdf(db, invoice_id, pdf_pool.render(loaded))
+
+_local_locks: dict[str, list] = {}  # invoice_id -> [Lock, utilizatori]
+_local_locks_guard = threading.Lock()
+
+@contextmanager
+def _invoice_lock(invoice_id: str):
+    """
+    Un singur randator per factură: lock în proces pentru firele de aici, plus
+    GET_LOCK în MySQL (pe o conexiune proprie) pentru celelalte procese uvicorn.
+    """
+    with _local_locks_guard:
+        entry = _local_locks.setdefault(invoice_id, [threading.Lock(), 0])
+        entry[1] += 1
+    try:
+        with entry[0], engine.connect() as conn:
+            name = f"pdf:{invoice_id}"
+            got = conn.execute(
+                text("SELECT GET_LOCK(:n, :t)"), {"n": name, "t": settings.pdf_lock_timeout_seconds}
+            ).scalar()
+            try:
+                yield
+            finally:
+                if got:
+                    conn.execute(text("SELECT RELEASE_LOCK(:n)"), {"n": name})
+    finally:
+        with _local_locks_guard:
+            entry[1] -= 1
+            if entry[1] == 0:
+                _local_locks.pop(invoice_id, None)
+
+def ensure_invoice_pdf(db: Session, invoice_id: str) -> Path | None:
+    """
+    PDF-ul facturii pe disc, regenerat din DB dacă lipsește (evacuat din cache sau
+    pierdut). Descărcările concurente ale aceleiași facturi randează o singură dată:
+    cine prinde lock-ul randează și face commit, ceilalți găsesc fișierul după el.
+    """
+    def current() -> tuple[str | None, Path | None]:
+        sha = db.execute(
+            text("SELECT pdf_sha256 FROM invoices WHERE invoice_id = :id"), {"id": invoice_id}
+        ).scalar()
+        return sha, (pdf_storage.open_path(sha) if sha else None)
+
+    sha, path = current()
+    if path is not None:
+        return path
+
+    with _invoice_lock(invoice_id):
+        # fără lock (timeout) randăm oricum: rezultatul e identic, doar munca se dublează
+        db.rollback()  # snapshot nou: vedem commit-ul celui care a randat înainte
+        sha, path = current()
+        if path is not None:
+            return path
+        path = render_invoice_to_file(db, invoice_id)
+        db.commit()
+        return path
+
+def render_invoices_to_files(db: Session, invoice_ids: list[str]) -> dict[str, Path | Exception | None]:
+    """
+    Variantă în lot (re-randări, final de lună): toate PDF-urile merg în paralel prin
+    pdf_pool.render_many. Facturile eșuate rămân neatinse în DB. Fără commit.
+    """
+    out: dict[str, Path | Exception | None] = {}
+    ids, jobs = [], []
+    for invoice_id in invoice_ids:
+        loaded = load_invoice_for_pdf(db, invoice_id)
+        if loaded is None:
+            out[invoice_id] = None
+            continue
+        ids.append(invoice_id)
+        jobs.append(loaded)
+
+    for invoice_id, res in zip(ids, pdf_pool.render_many(jobs)):
+        out[invoice_id] = res if isinstance(res, Exception) else _store_pdf(db, invoice_id, res)
+    return out
+
+class RenderWorkerPool:
+    """
+    Threaduri care consumă `pdf_render_jobs`.
+    Joburile sunt revendicate cu FOR UPDATE SKIP LOCKED, deci mai multe procese
+    uvicorn pot rula workeri în paralel fără să randeze aceeași factură de două ori.
+    """
+
+    def __init__(self, workers: int, poll_seconds: float, max_attempts: int):
+        self.workers = workers
+        self.poll_seconds = poll_seconds
+        self.max_attempts = max_attempts
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._threads: list[threading.Thread] = []
+
+    def start(self) -> None:
+        if self._threads or self.workers <= 0:
+            return
+        self._stop.clear()
+        self._requeue_stale()
+        for i in range(self.workers):
+            t = threading.Thread(target=self._run, name=f"pdf-render-{i}", daemon=True)
+            t.start()
+            self._threads.append(t)
+
+    def stop(self, timeout: float = 5.0) -> None:
+        self._stop.set()
+        self._wake.set()
+        for t in self._threads:
+            t.join(timeout)
+        self._threads.clear()
+
+    def notify(self) -> None:
+        """Trezește workerii imediat după commit-ul unei facturi noi."""
+        self._wake.set()
+
+    def _requeue_stale(self) -> None:
+        # joburi rămase RUNNING după un restart
+        try:
+            with SessionLocal() as db:
+                db.execute(text("""
+                    UPDATE pdf_render_jobs SET status = 'QUEUED'
+                     WHERE status = 'RUNNING'
+                       AND updated_at < NOW(6) - INTERVAL 5 MINUTE
+                """))
+                db.commit()
+        except Exception:
+            logger.exception("Nu am putut recupera joburile PDF blocate")
+
+    def _claim(self, db: Session) -> tuple[int, str, int] | None:
+        row = db.execute(text("""
+            SELECT job_id, invoice_id, attempts
+              FROM pdf_render_jobs
+             WHERE status = 'QUEUED'
+             ORDER BY job_id
+             LIMIT 1
+             FOR UPDATE SKIP LOCKED
+        """)).mappings().first()
+        if not row:
+            db.rollback()
+            return None
+        db.execute(
+            text("UPDATE pdf_render_jobs SET status = 'RUNNING', attempts = attempts + 1 WHERE job_id = :j"),
+            {"j": row["job_id"]},
+        )
+        db.commit()
+        return row["job_id"], str(row["invoice_id"]), int(row["attempts"]) + 1
+
+    def run_once(self) -> bool:
+        """Procesează un singur job; întoarce False dacă nu era nimic în coadă."""
+        with SessionLocal() as db:
+            claimed = self._claim(db)
+            if claimed is None:
+                return False
+            job_id, invoice_id, attempts = claimed
+            try:
+                render_invoice_to_file(db, invoice_id)
+                db.execute(
+                    text("UPDATE pdf_render_jobs SET status = 'DONE', last_error = NULL WHERE job_id = :j"),
+                    {"j": job_id},
+                )
+                db.commit()
+            except Exception as e:
+                db.rollback()
+                logger.exception("Randarea PDF a eșuat pentru factura %s", invoice_id)
+                failed = attempts >= self.max_attempts
+                db.execute(
+                    text("UPDATE pdf_render_jobs SET status = :s, last_error = :err WHERE job_id = :j"),
+                    {"s": "FAILED" if failed else "QUEUED", "err": f"{type(e).__name__}: {e}", "j": job_id},
+                )
+                if failed:
+                    db.execute(
+                        text("UPDATE invoices SET pdf_status = 'FAILED' WHERE invoice_id = :id"),
+                        {"id": invoice_id},
+                    )
+                db.commit()
+            return True
+
+    def _run(self) -> None:
+        while not self._stop.is_set():
+            try:
+                busy = self.run_once()
+            except Exception:
+                logger.exception("Eroare în workerul PDF")
+                busy = False
+            if not busy:
+                self._wake.wait(self.poll_seconds)
+                self._wake.clear()
+
+render_pool = RenderWorkerPool(
+    workers=settings.pdf_render_workers,
+    poll_seconds=settings.pdf_render_poll_seconds,
+    max_attempts=settings.pdf_render_max_attempts,
+)
@@ -0,0 +1,122 @@
+# app/services/repricing.py
+"""
+Re-calcularea în masă a colectărilor istorice (simulare „what-if” pentru tarife noi).
+
+Colectările vin în flux; fiecare bucată devine o matrice NumPy (rânduri = colectări,
+coloane = PORTABLE_KEYS + KG_KEYS), iar totalurile pentru tariful curent și cel propus
+ies dintr-o singură înmulțire de matrice per bucată. Rotunjirea e aceeași ca în
+`pricing.price`: portabilele sunt exacte în bani, liniile în kg se rotunjesc la ban.
+"""
+import json
+from datetime import datetime
+from decimal import Decimal
+
+import numpy as np
+
+from app.services.exports import stream_query
+from app.utils.pricing import TariffTable, quantity_vector
+from app.utils.rates import PORTABLE_KEYS
+
+CHUNK_ROWS = 10_000
+
+_N_PORTABLE = len(PORTABLE_KEYS)
+
+def _batteries(raw) -> dict:
+    if isinstance(raw, (str, bytes, bytearray)):
+        try:
+            raw = json.loads(raw)
+        except Exception:
+            return {}
+    return raw if isinstance(raw, dict) else {}
+
+def _price_matrix(q: np.ndarray, rates: np.ndarray) -> np.ndarray:
+    """
+    q: (n, k) cantități (bucăți, apoi grame); rates: (k, m) bani per unitate pentru m tarife.
+    Întoarce (n, m) bani. Portabilele: o înmulțire de matrice; kg: bani * grame / 1000
+    rotunjit la ban per linie, ca pe factură.
+    """
+    qp, qk = q[:, :_N_PORTABLE], q[:, _N_PORTABLE:]
+    portable = qp @ rates[:_N_PORTABLE]
+    kg = ((qk[:, :, None] * rates[None, _N_PORTABLE:, :] + 500) // 1000).sum(axis=1)
+    return portable + kg
+
+def simulate(
+    baseline: TariffTable,
+    proposed: TariffTable,
+    created_from: datetime | None = None,
+    created_to: datetime | None = None,
+    chunk_rows: int = CHUNK_ROWS,
+) -> dict:
+    """
+    Totaluri (bani) pe (bază, lună) pentru tariful de referință și cel propus.
+    Baza e cea care a facturat colectarea; pentru cele nevalidate, colaborarea activă.
+    """
+    where, params = [], {}
+    if created_from:
+        where.append("c.created_at >= :created_from")
+        params["created_from"] = created_from
+    if created_to:
+        where.append("c.created_at < :created_to")
+        params["created_to"] = created_to
+    sql = f"""
+        SELECT c.batteries,
+               DATE_FORMAT(c.created_at, '%Y-%m') AS month,
+               COALESCE(i.base_company_id, (
+                   SELECT MIN(co.base_company_id) FROM collaborations co
+                    WHERE co.client_company_id = c.client_company_id AND co.status = 'ACTIVE'
+               )) AS base_company_id
+          FROM collections c
+          LEFT JOIN invoices i ON i.collection_id = c.collection_id
+        {("WHERE " + " AND ".join(where)) if where else ""}
+    """
+
+    # (k, 2): coloana 0 = referință, 1 = propus
+    rates = np.array([baseline.rate_vector(), proposed.rate_vector()], dtype=np.int64).T
+    groups: dict[tuple[str | None, str], np.ndarray] = {}
+
+    def flush(keys: list, qty: list) -> None:
+        if not qty:
+            return
+        totals = _price_matrix(np.array(qty, dtype=np.int64), rates)
+        index: dict = {}
+        idx = np.fromiter((index.setdefault(k, len(index)) for k in keys), dtype=np.int64, count=len(keys))
+        acc = np.zeros((len(index), 3), dtype=np.int64)
+        np.add.at(acc[:, 0], idx, 1)
+        np.add.at(acc[:, 1:], idx, totals)
+        for k, i in index.items():
+            if k in groups:
+                groups[k] += acc[i]
+            else:
+                groups[k] = acc[i].copy()
+
+    keys: list = []
+    qty: list = []
+    for r in stream_query(sql, params):
+        keys.append((str(r["base_company_id"]) if r["base_company_id"] else None, r["month"]))
+        qty.append(quantity_vector(_batteries(r["batteries"])))
+        if len(qty) >= chunk_rows:
+            flush(keys, qty)
+            keys, qty = [], []
+    flush(keys, qty)
+
+    cents = lambda n: Decimal(int(n)).scaleb(-2)
+    rows = []
+    total = np.zeros(3, dtype=np.int64)
+    for (base_id, month), (n, cur, new) in sorted(groups.items(), key=lambda kv: (kv[0][1], kv[0][0] or "")):
+        total += (n, cur, new)
+        rows.append({
+            "base_company_id": base_id,
+            "month": month,
+            "collections": int(n),
+            "current_total": cents(cur),
+            "proposed_total": cents(new),
+            "delta": cents(new - cur),
+        })
+    return {
+        "baseline_version": baseline.version,
+        "collections": int(total[0]),
+        "current_total": cents(total[1]),
+        "proposed_total": cents(total[2]),
+        "delta": cents(total[2] - total[1]),
+        "rows": rows,
+    }
@@ -0,0 +1,135 @@
+# app/services/storage.py
+"""
+Stocare PDF adresată prin conținut.
+
+Fiecare fișier e salvat sub SHA-256-ul conținutului, în directoare sharduite
+(`ab/cd/abcd….pdf`), deci două randări identice ocupă un singur fișier. Scrierea
+trece printr-un fișier temporar în același director și `os.replace`, astfel încât
+un cititor vede fie fișierul complet, fie nimic.
+
+Directorul e tratat ca un cache: cu `max_bytes` setat, fișierele citite cel mai
+demult (mtime, reîmprospătat la fiecare citire) sunt șterse când se depășește
+plafonul. Un PDF lipsă se regenerează din DB (render_queue.ensure_invoice_pdf).
+"""
+import hashlib
+import os
+import tempfile
+import threading
+import time
+from pathlib import Path
+from typing import NamedTuple
+
+from app.config import settings
+
+BACKEND_ROOT = Path(__file__).resolve().parents[2]
+
+class StoredPdf(NamedTuple):
+    sha256: str
+    size: int
+    key: str  # calea relativă la rădăcina stocării
+
+class LocalPdfStorage:
+    """Backend pe sistemul de fișiere local; rădăcina e întotdeauna absolută."""
+
+    def __init__(self, root: Path, max_bytes: int = 0, min_age_seconds: float = 60.0):
+        self.root = root.resolve()
+        self.max_bytes = max_bytes            # 0 = fără plafon
+        self.min_age_seconds = min_age_seconds  # fișierele atinse recent nu sunt evacuate
+        self._lock = threading.Lock()
+        self._approx_bytes: int | None = None
+
+    @staticmethod
+    def key_for(sha256: str) -> str:
+        return f"{sha256[:2]}/{sha256[2:4]}/{sha256}.pdf"
+
+    def path_for(self, sha256: str) -> Path:
+        return self.root / self.key_for(sha256)
+
+    def exists(self, sha256: str) -> bool:
+        return self.path_for(sha256).is_file()
+
+    def open_path(self, sha256: str) -> Path | None:
+        """Calea fișierului dacă e pe disc, marcat ca folosit acum; None dacă a fost evacuat."""
+        path = self.path_for(sha256)
+        try:
+            os.utime(path)
+        except FileNotFoundError:
+            return None
+        return path
+
+    def put(self, data: bytes) -> StoredPdf:
+        sha = hashlib.sha256(data).hexdigest()
+        path = self.path_for(sha)
+        if not path.is_file():
+            path.parent.mkdir(parents=True, exist_ok=True)
+            fd, tmp = tempfile.mkstemp(dir=path.parent, prefix=".tmp-", suffix=".pdf")
+            try:
+                with os.fdopen(fd, "wb") as f:
+                    f.write(data)
+                    f.flush()
+                    os.fsync(f.fileno())
+                os.replace(tmp, path)
+            except BaseException:
+                try:
+                    os.unlink(tmp)
+                except FileNotFoundError:
+                    pass
+                raise
+            self._account(len(data))
+        else:
+            os.utime(path)
+        return StoredPdf(sha, len(data), self.key_for(sha))
+
+    def _entries(self) -> list[tuple[float, int, Path]]:
+        out = []
+        for p in self.root.glob("??/??/*.pdf"):
+            try:
+                st = p.stat()
+            except FileNotFoundError:
+                continue
+            out.append((st.st_mtime, st.st_size, p))
+        return out
+
+    def _account(self, added: int) -> None:
+        if not self.max_bytes:
+            return
+        with self._lock:
+            if self._approx_bytes is None:
+                self._approx_bytes = sum(size for _, size, _ in self._entries())
+            else:
+                self._approx_bytes += added
+            if self._approx_bytes > self.max_bytes:
+                self._evict_locked()
+
+    def evict(self) -> int:
+        """Șterge fișierele reci până la 90% din plafon; întoarce câte au fost șterse."""
+        if not self.max_bytes:
+            return 0
+        with self._lock:
+            return self._evict_locked()
+
+    def _evict_locked(self) -> int:
+        entries = sorted(self._entries())
+        total = sum(size for _, size, _ in entries)
+        target = int(self.max_bytes * 0.9)
+        cutoff = time.time() - self.min_age_seconds
+        removed = 0
+        for mtime, size, p in entries:
+            if total <= target or mtime > cutoff:
+                break
+            try:
+                p.unlink()
+            except FileNotFoundError:
+                pass
+            total -= size
+            removed += 1
+        # alte procese pot scrie în același director; totalul e doar o estimare
+        self._approx_bytes = total
+        return removed
+
+def _root() -> Path:
+    if settings.pdf_storage_dir:
+        return Path(settings.pdf_storage_dir)
+    return BACKEND_ROOT / "files" / "pdf-store"
+
+pdf_storage = LocalPdfStorage(_root(), max_bytes=settings.pdf_cache_max_bytes)
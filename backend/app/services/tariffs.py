@@ -0,0 +1,81 @@
+# app/services/tariffs.py
+"""
+Versiunile de tarif din tabela `tariffs`, ținute în memorie per proces.
+
+Fiecare versiune are o dată de intrare în vigoare; o colectare se facturează cu
+versiunea valabilă la `created_at`, chiar dacă e validată după o schimbare de preț.
+Cache-ul se reîncarcă doar când `cache_versions('tariffs')` crește (verificat cel mult
+o dată la `tariff_poll_seconds`), deci calculul de preț nu atinge DB-ul pe drumul cald.
+"""
+import bisect
+import json
+import threading
+from datetime import datetime
+
+from sqlalchemy import text
+from sqlalchemy.orm import Session
+
+from app.config import settings
+from app.utils.cache_versions import VersionWatch, bump_version
+from app.utils.pricing import (
+    DEFAULT_TARIFF, KG_RATES, PORTABLE_RATES, PORTABLE_WEIGHTS_KG, TariffTable,
+)
+
+CACHE_NAME = "tariffs"
+
+def parse_rates(raw) -> dict:
+    if isinstance(raw, (str, bytes, bytearray)):
+        raw = json.loads(raw)
+    return raw or {}
+
+def compile_tariff(version: int, rates: dict) -> TariffTable:
+    """Cheile lipsă din JSON (categorii adăugate ulterior) iau valorile implicite din pricing.py."""
+    return TariffTable(
+        {**PORTABLE_RATES, **(rates.get("portable_rates") or {})},
+        {**PORTABLE_WEIGHTS_KG, **(rates.get("portable_weights_kg") or {})},
+        {**KG_RATES, **(rates.get("kg_rates") or {})},
+        version=version,
+    )
+
+class TariffBook:
+    def __init__(self, poll_seconds: float):
+        self._watch = VersionWatch(CACHE_NAME, poll_seconds)
+        self._lock = threading.Lock()
+        self._loaded: int | None = None
+        self._starts: list[datetime] = []
+        self._tables: list[TariffTable] = []
+
+    def _refresh(self, db: Session) -> None:
+        v = self._watch.current(db)
+        if v == self._loaded:
+            return
+        rows = db.execute(
+            text("SELECT version, effective_from, rates FROM tariffs ORDER BY effective_from")
+        ).mappings().all()
+        starts = [r["effective_from"] for r in rows]
+        tables = [compile_tariff(int(r["version"]), parse_rates(r["rates"])) for r in rows]
+        with self._lock:
+            self._starts, self._tables, self._loaded = starts, tables, v
+
+    def for_date(self, db: Session, at: datetime | None = None) -> TariffTable:
+        """Tariful în vigoare la `at` (implicit acum); cel implicit dacă tabela e goală."""
+        self._refresh(db)
+        at = at or datetime.now()
+        with self._lock:
+            i = bisect.bisect_right(self._starts, at) - 1
+            return self._tables[i] if i >= 0 else DEFAULT_TARIFF
+
+    def by_version(self, db: Session, version: int) -> TariffTable | None:
+        self._refresh(db)
+        with self._lock:
+            return next((t for t in self._tables if t.version == version), None)
+
+    def invalidate(self, db: Session) -> None:
+        """În tranzacția care scrie în `tariffs`; ceilalți workeri reîncarcă la următorul poll."""
+        bump_version(db, CACHE_NAME)
+
+    def expire(self) -> None:
+        """După commit: procesul curent recitește versiunea la următorul apel."""
+        self._watch.expire()
+
+tariff_book = TariffBook(settings.tariff_poll_seconds)
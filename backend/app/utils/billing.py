@@ -3,6 +3,8 @@ from sqlalchemy import text
 from datetime import datetime
 import json
 
+from app.services.billing_context import forget, load_billing_context
+
 def extract_profile_from_anaf_raw(raw) -> dict:
     """Accept MySQL JSON (str/bytes) or dict and return a dict."""
     if raw is None:
@@ -92,27 +94,8 @@ def upsert_billing_profile_from_anaf(db: Session, company_id: str, raw: dict | s
         """),
         {"cid": company_id, **data}
     )
+    forget(db, company_id)
 
 def billing_ready(db: Session, base_cid: str, client_cid: str) -> tuple[bool, str]:
-    # baza: profil + settings
-    base_p = db.execute(
-        text("SELECT 1 FROM company_billing_profiles WHERE company_id = :cid"),
-        {"cid": base_cid},
-    ).scalar()
-    base_s = db.execute(
-        text("SELECT 1 FROM company_invoice_settings WHERE base_company_id = :cid"),
-        {"cid": base_cid},
-    ).scalar()
-    # client: profil
-    client_p = db.execute(
-        text("SELECT 1 FROM company_billing_profiles WHERE company_id = :cid"),
-        {"cid": client_cid},
-    ).scalar()
-
-    if not base_p:
-        return False, "Completează profilul de facturare al BAZEI"
-    if not base_s:
-        return False, "Configurează setările de facturare (serie/număr) pentru BAZĂ"
-    if not client_p:
-        return False, "Completează profilul de facturare al CLIENTULUI"
-    return True, ""
+    # o singură interogare, memoizată în sesiune (refolosită apoi de validare)
+    return load_billing_context(db, base_cid, client_cid).ready()
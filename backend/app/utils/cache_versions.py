@@ -0,0 +1,57 @@
+import threading
+import time
+
+from sqlalchemy import text
+from sqlalchemy.orm import Session
+
+
+class VersionWatch:
+    """
+    Un rând din `cache_versions`, ținut în memorie.
+    Rândul se recitește cel mult o dată la `poll_seconds`, deci un bump făcut de alt
+    worker devine vizibil aici în cel mult atât, fără o interogare per cerere.
+    """
+
+    def __init__(self, name: str, poll_seconds: float):
+        self.name = name
+        self.poll_seconds = poll_seconds
+        self._version: int | None = None
+        self._checked_at = 0.0
+        self._lock = threading.Lock()
+
+    def peek(self) -> int | None:
+        """Versiunea din memorie dacă a fost citită în ultimele `poll_seconds`, altfel None (fără DB)."""
+        with self._lock:
+            if self._version is not None and time.monotonic() - self._checked_at < self.poll_seconds:
+                return self._version
+            return None
+
+    def current(self, db: Session) -> int:
+        now = time.monotonic()
+        with self._lock:
+            if self._version is not None and now - self._checked_at < self.poll_seconds:
+                return self._version
+        v = db.execute(
+            text("SELECT version FROM cache_versions WHERE name = :n"),
+            {"n": self.name},
+        ).scalar()
+        with self._lock:
+            self._version = int(v or 0)
+            self._checked_at = now
+            return self._version
+
+    def expire(self) -> None:
+        """Forțează recitirea la următorul apel (imediat după un bump local)."""
+        with self._lock:
+            self._checked_at = 0.0
+
+
+def bump_version(db: Session, name: str) -> None:
+    """Incrementează versiunea `name`. Fără commit: bump-ul intră odată cu scrierea apelantului."""
+    db.execute(
+        text("""
+            INSERT INTO cache_versions (name, version) VALUES (:n, 1)
+            ON DUPLICATE KEY UPDATE version = version + 1
+        """),
+        {"n": name},
+    )
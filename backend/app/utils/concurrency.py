@@ -0,0 +1,26 @@
+import functools
+from typing import Any, Callable, TypeVar
+
+import anyio
+import anyio.to_thread
+
+from app.config import settings
+
+T = TypeVar("T")
+
+_db_limiter: anyio.CapacityLimiter | None = None
+
+def _limiter() -> anyio.CapacityLimiter:
+    # created lazily: a CapacityLimiter needs a running event loop
+    global _db_limiter
+    if _db_limiter is None:
+        _db_limiter = anyio.CapacityLimiter(settings.db_thread_pool_size)
+    return _db_limiter
+
+async def run_db(fn: Callable[..., T], *args: Any, **kwargs: Any) -> T:
+    """
+    Run blocking (sync SQLAlchemy) work from an `async def` endpoint on a bounded
+    worker-thread pool, so DB round trips don't stall the event loop.
+    The bound should stay at or below the engine's connection pool size.
+    """
+    return await anyio.to_thread.run_sync(functools.partial(fn, *args, **kwargs), limiter=_limiter())
@@ -0,0 +1,25 @@
+import base64
+from datetime import datetime
+
+from fastapi import HTTPException
+
+# Header în care listele paginate întorc cursorul pentru pagina următoare
+NEXT_CURSOR_HEADER = "X-Next-Cursor"
+
+def encode_cursor(created_at: datetime, row_id: str) -> str:
+    """Cursor opac pentru paginarea keyset pe (created_at, id)."""
+    raw = f"{created_at.isoformat()}|{row_id}"
+    return base64.urlsafe_b64encode(raw.encode("utf-8")).decode("ascii").rstrip("=")
+
+def decode_cursor(cursor: str) -> tuple[datetime, str]:
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        raw = base64.urlsafe_b64decode(padded.encode("ascii")).decode("utf-8")
+        ts, row_id = raw.split("|", 1)
+        return datetime.fromisoformat(ts), row_id
+    except Exception:
+        raise HTTPException(status_code=400, detail="Cursor invalid")
+
+def keyset_clause(created_col: str, id_col: str) -> str:
+    """Predicatul „după cursor” pentru ORDER BY created_at DESC, id DESC."""
+    return (f"({created_col} < :cur_ts OR ({created_col} = :cur_ts AND {id_col} < :cur_id))")
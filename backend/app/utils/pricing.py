@@ -1,92 +1,201 @@
 # app/utils/pricing.py
+"""
+Motorul unic de prețuri pentru colectări.
+
+Tarifele sunt compilate o singură dată într-un `TariffTable`: vectori în ordinea fixă
+PORTABLE_KEYS + KG_KEYS (app/utils/rates.py), cu prețuri în bani și greutăți în grame
+(milli-kg). Calculul se face în întregi; singura rotunjire (ROUND_HALF_UP la bani) e
+pe linia de auto/industrial, la fel ca pe factură. `price()` e folosit și la crearea
+colectării, și la validare, deci totalul estimat și cel facturat nu mai pot diverge.
+"""
 from __future__ import annotations
+
 from decimal import Decimal, ROUND_HALF_UP
-from typing import Any, Dict
-
-# === TARIFE ===
-# Portable (lei / buc)
-PORTABLE_RATES: Dict[str, Decimal] = {
-    "pastila":     Decimal("0.01"),
-    "g_0_50":      Decimal("0.04"),
-    "g_51_150":    Decimal("0.11"),
-    "g_151_250":   Decimal("0.38"),
-    "g_251_500":   Decimal("0.80"),
-    "g_501_750":   Decimal("0.98"),
-    "g_751_1000":  Decimal("1.20"),
-    "g_over_1000": Decimal("1.38"),
+from typing import Any, Mapping, NamedTuple
+
+from app.utils.rates import KG_KEYS, LABELS, PORTABLE_KEYS
+
+# === TARIFE IMPLICITE ===
+# Portabile (lei / buc)
+PORTABLE_RATES: dict[str, str] = {
+    "portable_pastila":   "0.01",
+    "portable_0_50":      "0.04",
+    "portable_51_150":    "0.11",
+    "portable_151_250":   "0.38",
+    "portable_251_500":   "0.80",
+    "portable_501_750":   "0.98",
+    "portable_751_1000":  "1.20",
+    "portable_1000_plus": "1.38",
 }
 
-# Auto & industriale (lei / kg)
-AUTO_IND_RATES: Dict[str, Decimal] = {
-    "auto_plumb":  Decimal("0.35"),  # 3a
-    "auto_nicd":   Decimal("1.38"),  # 3b
-    "auto_altele": Decimal("1.38"),  # 3c
-    "ind_plumb":   Decimal("0.35"),  # 4a
-    "ind_nicd":    Decimal("1.38"),  # 4b
-    "ind_altele":  Decimal("1.38"),  # 4c
+# Greutate estimată (kg / buc) pentru portabile
+PORTABLE_WEIGHTS_KG: dict[str, str] = {
+    "portable_pastila":   "0.010",
+    "portable_0_50":      "0.050",
+    "portable_51_150":    "0.150",
+    "portable_151_250":   "0.250",
+    "portable_251_500":   "0.500",
+    "portable_501_750":   "0.750",
+    "portable_751_1000":  "1.000",
+    "portable_1000_plus": "1.000",
 }
 
-# Structură cu zerouri pentru inițializare/normalizare
-DEFAULT_BATTERIES: Dict[str, Dict[str, Decimal | int | float]] = {
-    "portable": {k: 0 for k in PORTABLE_RATES.keys()},
-    "auto_ind": {k: 0 for k in AUTO_IND_RATES.keys()},
+# Auto & industriale (lei / kg); cantitatea introdusă e deja în kg
+KG_RATES: dict[str, str] = {
+    "auto_3a":        "0.35",
+    "auto_3b":        "1.38",
+    "auto_3c":        "1.38",
+    "industrial_4a":  "0.35",
+    "industrial_4b":  "1.38",
+    "industrial_4c":  "1.38",
 }
 
-def _to_int(x: Any) -> int:
+def _scaled(x: Any, exp: int) -> int:
+    """x * 10**exp ca întreg (ROUND_HALF_UP); ValueError pentru valori nenumerice."""
+    if type(x) is int:
+        return x * 10 ** exp
     try:
-        return int(x) if x is not None else 0
-    except Exception:
-        return 0
+        d = Decimal(str(x))
+    except ArithmeticError:
+        raise ValueError(f"Valoare numerică invalidă: {x!r}") from None
+    if not d.is_finite():
+        raise ValueError(f"Valoare numerică invalidă: {x!r}")
+    return int(d.scaleb(exp).to_integral_value(rounding=ROUND_HALF_UP))
 
-def _to_dec(x: Any) -> Decimal:
-    try:
-        return Decimal(str(x)) if x is not None else Decimal("0")
-    except Exception:
-        return Decimal("0")
+def _count(x: Any) -> int:
+    return x if type(x) is int else _scaled(x, 0)
 
-def normalize_batteries(b: Any) -> Dict[str, Dict[str, Decimal | int]]:
-    """
-    Asigură cheile așteptate și tipuri numerice (int pentru bucăți, Decimal pentru kg).
-    """
-    b = b or {}
-    out = {
-        "portable": {},
-        "auto_ind": {},
-    }
-    p = (b.get("portable") or {})
-    for k in PORTABLE_RATES:
-        out["portable"][k] = _to_int(p.get(k, 0))
-
-    a = (b.get("auto_ind") or {})
-    for k in AUTO_IND_RATES:
-        out["auto_ind"][k] = _to_dec(a.get(k, 0))
-    return out
-
-def compute_totals(batteries: Any) -> Dict[str, Decimal]:
+def _round_milli(x: int) -> int:
+    # x e în miimi din unitatea țintă, nenegativ
+    return (x + 500) // 1000
+
+def _dec(units: int, places: int) -> Decimal:
+    return Decimal(units).scaleb(-places)
+
+class PriceLine(NamedTuple):
+    key: str
+    description: str
+    qty: Decimal
+    unit: str
+    unit_price: Decimal
+    line_total: Decimal
+    weight_kg: Decimal
+
+class Quote(NamedTuple):
+    lines: list[PriceLine]
+    subtotal: Decimal       # lei, suma liniilor
+    total_weight: Decimal   # kg, 2 zecimale
+    tariff_version: int
+
+class TariffTable:
+    """Tarife compilate în vectori întregi, în ordinea PORTABLE_KEYS / KG_KEYS."""
+
+    __slots__ = ("version", "portable", "kg")
+
+    def __init__(
+        self,
+        portable_rates: Mapping[str, Any],
+        portable_weights_kg: Mapping[str, Any],
+        kg_rates: Mapping[str, Any],
+        version: int = 0,
+    ):
+        self.version = version
+        # (cheie, bani / buc, grame / buc)
+        self.portable: tuple[tuple[str, int, int], ...] = tuple(
+            (k, _scaled(portable_rates[k], 2), _scaled(portable_weights_kg[k], 3)) for k in PORTABLE_KEYS
+        )
+        # (cheie, bani / kg)
+        self.kg: tuple[tuple[str, int], ...] = tuple(
+            (k, _scaled(kg_rates[k], 2)) for k in KG_KEYS
+        )
+
+    def rate_vector(self) -> list[int]:
+        """Bani per unitate, în ordinea PORTABLE_KEYS + KG_KEYS."""
+        return [c for _, c, _ in self.portable] + [c for _, c in self.kg]
+
+    def weight_vector(self) -> list[int]:
+        """Grame per unitate (1000 pentru cheile în kg), în aceeași ordine."""
+        return [g for _, _, g in self.portable] + [1000] * len(self.kg)
+
+DEFAULT_TARIFF = TariffTable(PORTABLE_RATES, PORTABLE_WEIGHTS_KG, KG_RATES)
+
+def quantity_vector(batteries: Mapping[str, Any]) -> list[int]:
     """
-    Calculează subtotal (lei) și greutate totală (kg) pe baza structurii din pasul 1.
-    Returnează:
-      - subtotal: Decimal (lei, rotunjit 2 zecimale)
-      - total_weight: Decimal (kg, rotunjit 2 zecimale)
+    Cantitățile în ordinea PORTABLE_KEYS + KG_KEYS: bucăți, apoi grame. Cele negative
+    devin 0, exact cum le ignoră `price()` / `price_totals()`.
     """
-    b = normalize_batteries(batteries)
-
-    # Portable: lei/buc * bucăți
-    subtotal_portable = sum(
-        PORTABLE_RATES[k] * Decimal(b["portable"][k])
-        for k in PORTABLE_RATES.keys()
-    )
-
-    # Auto/ind: lei/kg * kg și greutatea totală
-    subtotal_auto = sum(
-        AUTO_IND_RATES[k] * _to_dec(b["auto_ind"][k])
-        for k in AUTO_IND_RATES.keys()
-    )
-    total_weight = sum(
-        _to_dec(b["auto_ind"][k]) for k in AUTO_IND_RATES.keys()
-    )
-
-    subtotal = (subtotal_portable + subtotal_auto).quantize(Decimal("0.01"), rounding=ROUND_HALF_UP)
-    total_weight = total_weight.quantize(Decimal("0.01"), rounding=ROUND_HALF_UP)
-
-    return {"subtotal": subtotal, "total_weight": total_weight}
+    get = batteries.get
+    return ([max(0, _count(get(k) or 0)) for k in PORTABLE_KEYS]
+            + [max(0, _scaled(get(k) or 0, 3)) for k in KG_KEYS])
+
+def price_totals(batteries: Mapping[str, Any], table: TariffTable | None = None) -> tuple[int, int]:
+    """(subtotal în bani, greutate în grame), fără a construi liniile."""
+    t = table or DEFAULT_TARIFF
+    get = batteries.get
+    cents = grams = 0
+    for key, rate, weight in t.portable:
+        q = get(key)
+        if q:
+            q = _count(q)
+            if q > 0:
+                cents += q * rate
+                grams += q * weight
+    for key, rate in t.kg:
+        w = get(key)
+        if w:
+            g = _scaled(w, 3)
+            if g > 0:
+                cents += _round_milli(g * rate)
+                grams += g
+    return cents, grams
+
+def price(batteries: Mapping[str, Any], table: TariffTable | None = None) -> Quote:
+    """Liniile de factură și totalurile pentru o colectare."""
+    t = table or DEFAULT_TARIFF
+    get = batteries.get
+    lines: list[PriceLine] = []
+    cents = grams = 0
+
+    # portabile (buc)
+    for key, rate, weight in t.portable:
+        q = get(key)
+        q = _count(q) if q else 0
+        if q <= 0:
+            continue
+        line_c, line_g = q * rate, q * weight
+        lines.append(PriceLine(
+            key=key,
+            description=f"{LABELS[key]} (portabil)",
+            qty=Decimal(q),
+            unit="buc",
+            unit_price=_dec(rate, 2),
+            line_total=_dec(line_c, 2),
+            weight_kg=_dec((line_g + 5) // 10, 2),
+        ))
+        cents += line_c
+        grams += line_g
+
+    # auto/industrial (kg)
+    for key, rate in t.kg:
+        w = get(key)
+        g = _scaled(w, 3) if w else 0
+        if g <= 0:
+            continue
+        line_c = _round_milli(g * rate)
+        lines.append(PriceLine(
+            key=key,
+            description=LABELS[key],
+            qty=_dec(g, 3),
+            unit="kg",
+            unit_price=_dec(rate, 2),
+            line_total=_dec(line_c, 2),
+            weight_kg=_dec(g, 3),
+        ))
+        cents += line_c
+        grams += g
+
+    return Quote(lines, _dec(cents, 2), _dec((grams + 5) // 10, 2), t.version)
+
+def totals_as_decimal(cents: int, grams: int) -> tuple[Decimal, Decimal]:
+    """(subtotal lei, greutate kg) rotunjite la 2 zecimale, ca în coloanele din `collections`."""
+    return _dec(cents, 2), _dec((grams + 5) // 10, 2)
@@ -0,0 +1,141 @@
+# app/utils/ratelimit.py
+"""
+Rate limiting GCRA (generic cell rate algorithm).
+
+Per cheie se păstrează un singur număr, TAT (theoretical arrival time), deci memoria
+e fixă indiferent de limită. Backend-ul în memorie are evicție LRU (număr maxim de chei);
+backend-ul DB (`rate_limits`) e partajat între toți workerii uvicorn, deci limita
+nu mai devine N× cu N procese.
+"""
+import ipaddress
+import threading
+import time
+from collections import OrderedDict
+from typing import Callable, Protocol
+
+from fastapi import HTTPException, Request
+from sqlalchemy import text
+
+from app.config import settings
+from app.db import engine
+
+class RateLimitBackend(Protocol):
+    def hit(self, key: str, now: float, interval: float, window: float) -> bool:
+        """Înregistrează o cerere; întoarce False dacă trebuie refuzată."""
+        ...
+
+def _gcra(tat: float | None, now: float, interval: float, window: float) -> float | None:
+    """Noul TAT dacă cererea e permisă, altfel None."""
+    new_tat = max(tat or now, now) + interval
+    if new_tat - now > window:
+        return None
+    return new_tat
+
+class MemoryBackend:
+    def __init__(self, max_keys: int):
+        self.max_keys = max_keys
+        self._tat: OrderedDict[str, float] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def hit(self, key: str, now: float, interval: float, window: float) -> bool:
+        with self._lock:
+            new_tat = _gcra(self._tat.get(key), now, interval, window)
+            if new_tat is None:
+                self._tat.move_to_end(key)
+                return False
+            self._tat[key] = new_tat
+            self._tat.move_to_end(key)
+            # o cheie evacuată e echivalentă cu una nouă (bucket plin)
+            while len(self._tat) > self.max_keys:
+                self._tat.popitem(last=False)
+            return True
+
+    def __len__(self) -> int:
+        return len(self._tat)
+
+class DbBackend:
+    """TAT-ul stă în `rate_limits`; fiecare verificare e o tranzacție scurtă separată."""
+
+    CLEANUP_EVERY = 1000
+
+    def __init__(self):
+        self._calls = 0
+
+    def hit(self, key: str, now: float, interval: float, window: float) -> bool:
+        with engine.begin() as conn:
+            # rândul trebuie să existe înainte de FOR UPDATE: pe o cheie lipsă, InnoDB pune
+            # un gap lock, iar două cereri noi cu aceeași cheie s-ar bloca reciproc la INSERT.
+            # tat = 0 e un bucket plin, la fel ca o cheie necunoscută
+            conn.execute(
+                text("INSERT IGNORE INTO rate_limits (bucket_key, tat) VALUES (:k, 0)"),
+                {"k": key},
+            )
+            tat = conn.execute(
+                text("SELECT tat FROM rate_limits WHERE bucket_key = :k FOR UPDATE"),
+                {"k": key},
+            ).scalar()
+            new_tat = _gcra(tat, now, interval, window)
+            if new_tat is None:
+                return False
+            conn.execute(
+                text("UPDATE rate_limits SET tat = :t WHERE bucket_key = :k"),
+                {"k": key, "t": new_tat},
+            )
+            self._calls += 1
+            if self._calls % self.CLEANUP_EVERY == 0:
+                # bucket-urile cu TAT în trecut sunt pline; le putem șterge
+                conn.execute(text("DELETE FROM rate_limits WHERE tat < :now LIMIT 1000"), {"now": now})
+            return True
+
+def _make_backend() -> RateLimitBackend:
+    if settings.rate_limit_backend == "db":
+        return DbBackend()
+    return MemoryBackend(settings.rate_limit_max_keys)
+
+backend: RateLimitBackend = _make_backend()
+
+def _parse_networks(entries: list[str]) -> tuple:
+    return tuple(ipaddress.ip_network(e.strip(), strict=False) for e in entries if e.strip())
+
+_trusted_proxies = _parse_networks(settings.trusted_proxies)
+
+def _is_trusted(host: str) -> bool:
+    try:
+        addr = ipaddress.ip_address(host)
+    except ValueError:
+        return False
+    return any(addr in net for net in _trusted_proxies)
+
+def client_ip(request: Request) -> str:
+    """
+    IP-ul clientului. X-Forwarded-For contează doar dacă cererea vine de la un proxy din
+    `trusted_proxies`; atunci luăm primul hop din dreapta care nu e proxy de încredere
+    (cele din stânga le poate scrie clientul însuși).
+    """
+    peer = request.client.host if request.client else "unknown"
+    fwd = request.headers.get("x-forwarded-for")
+    if not fwd or not _is_trusted(peer):
+        return peer
+    hops = [h.strip() for h in fwd.split(",") if h.strip()]
+    for hop in reversed(hops):
+        if not _is_trusted(hop):
+            return hop
+    return hops[0] if hops else peer
+
+def rate_limit(scope: str, max_hits: int, window_seconds: float,
+               detail: str = "Prea multe cereri. Încearcă mai târziu.") -> Callable[[Request], None]:
+    """
+    Dependință FastAPI: max. `max_hits` cereri per IP în `window_seconds` (cu burst de
+    `max_hits`), separat pentru fiecare `scope`.
+    """
+    interval = window_seconds / max_hits
+
+    def dependency(request: Request) -> None:
+        if not backend.hit(f"{scope}:{client_ip(request)}", time.time(), interval, window_seconds):
+            raise HTTPException(
+                status_code=429,
+                detail=detail,
+                headers={"Retry-After": str(max(1, int(interval)))},
+            )
+
+    return dependency
@@ -39,36 +39,4 @@ LABELS: Final[dict[str, str]] = {
     "industrial_4c": "Industrial 4c",
 }
 
-# RON per piece (portables)
-PORTABLE_RATES: Final[dict[str, float]] = {
-    "portable_pastila": 0.01,
-    "portable_0_50": 0.04,
-    "portable_51_150": 0.11,
-    "portable_151_250": 0.38,
-    "portable_251_500": 0.80,
-    "portable_501_750": 0.98,
-    "portable_751_1000": 1.20,
-    "portable_1000_plus": 1.38,
-}
-
-# Estimated kg per piece (portables)
-PORTABLE_WEIGHTS_KG: Final[dict[str, float]] = {
-    "portable_pastila": 0.010,
-    "portable_0_50": 0.050,
-    "portable_51_150": 0.150,
-    "portable_151_250": 0.250,
-    "portable_251_500": 0.500,
-    "portable_501_750": 0.750,
-    "portable_751_1000": 1.000,
-    "portable_1000_plus": 1.000,
-}
-
-# RON per kg (auto/industrial)
-KG_RATES: Final[dict[str, float]] = {
-    "auto_3a": 0.35,
-    "auto_3b": 1.38,
-    "auto_3c": 1.38,
-    "industrial_4a": 0.35,
-    "industrial_4b": 1.38,
-    "industrial_4c": 1.38,
-}
+# Tarifele (lei / buc, kg / buc, lei / kg) sunt în app/utils/pricing.py.
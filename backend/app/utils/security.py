@@ -1,4 +1,5 @@
-﻿import uuid, datetime as dt
+﻿import uuid, datetime as dt, threading, time
+from collections import OrderedDict
 from jose import jwt, JWTError 
 from typing import Any, Dict
 
@@ -9,6 +10,8 @@ from sqlalchemy import text
 
 from app.config import settings
 from app.db import get_db
+from .cache_versions import VersionWatch, bump_version
+from .concurrency import run_db
 from .typing import StrDict
 
 JWT_ALG = "HS256"
@@ -39,6 +42,82 @@ def decode_token(secret: str, token: str) -> Dict[str, Any]:
     except jwt.InvalidTokenError:
         raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Token invalid")
 
+class SessionCache:
+    """
+    LRU per worker cu sesiunile deja confirmate ca nerevocate, după JTI.
+    O intrare trăiește cel mult `ttl_seconds` (și niciodată după `exp`-ul tokenului);
+    tot cache-ul se golește când se schimbă versiunea de revocări `user_sessions`.
+    """
+
+    def __init__(self, max_size: int, ttl_seconds: float):
+        self.max_size = max_size
+        self.ttl_seconds = ttl_seconds
+        self._entries: OrderedDict[str, tuple[str, float]] = OrderedDict()
+        self._version: int | None = None
+        self._lock = threading.Lock()
+
+    def contains(self, jti: str, uid: str, version: int) -> bool:
+        now = time.monotonic()
+        with self._lock:
+            if version != self._version:
+                self._entries.clear()
+                self._version = version
+            entry = self._entries.get(jti)
+            if entry is None or entry[0] != uid or entry[1] <= now:
+                if entry is not None:
+                    del self._entries[jti]
+                return False
+            self._entries.move_to_end(jti)
+            return True
+
+    def add(self, jti: str, uid: str, version: int, exp: int | None = None) -> None:
+        expires = time.monotonic() + self.ttl_seconds
+        if exp is not None:
+            expires = min(expires, time.monotonic() + (exp - now_utc().timestamp()))
+        with self._lock:
+            if version != self._version:
+                return
+            self._entries[jti] = (uid, expires)
+            self._entries.move_to_end(jti)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def discard(self, jti: str) -> None:
+        with self._lock:
+            self._entries.pop(jti, None)
+
+session_cache = SessionCache(settings.session_cache_size, settings.session_cache_ttl_seconds)
+_revocations = VersionWatch("user_sessions", settings.session_revocation_poll_seconds)
+
+def revoke_session(db: Session, uid: str, jti: str) -> int:
+    """Revocă o sesiune și incrementează versiunea de revocări. Fără commit."""
+    res = db.execute(
+        text("""
+            UPDATE user_sessions
+            SET revoked_at = NOW()
+            WHERE user_id = :uid AND jti = :jti AND revoked_at IS NULL
+        """),
+        {"uid": uid, "jti": jti}
+    )
+    bump_version(db, "user_sessions")
+    session_cache.discard(jti)
+    _revocations.expire()
+    return res.rowcount
+
+def _check_session(db: Session, jti: str, uid: str, exp: int | None) -> None:
+    version = _revocations.current(db)
+    row = db.execute(
+        text("SELECT revoked_at FROM user_sessions WHERE jti = :jti AND user_id = :uid"),
+        {"jti": jti, "uid": uid}
+    ).mappings().first()
+
+    if not row:
+        raise HTTPException(status_code=401, detail="Sesiune inexistentă")
+    if row["revoked_at"] is not None:
+        raise HTTPException(status_code=401, detail="Sesiune revocată")
+
+    session_cache.add(jti, uid, version, exp)
+
 _security = HTTPBearer(auto_error=True)
 
 async def get_current_user_claims(
@@ -54,15 +133,11 @@ async def get_current_user_claims(
     if not jti or not uid:
         raise HTTPException(status_code=401, detail="Sesiune invalidă")
 
-    row = db.execute(
-        text("SELECT revoked_at FROM user_sessions WHERE jti = :jti AND user_id = :uid"),
-        {"jti": jti, "uid": uid}
-    ).mappings().first()
-
-    if not row:
-        raise HTTPException(status_code=401, detail="Sesiune inexistentă")
-    if row["revoked_at"] is not None:
-        raise HTTPException(status_code=401, detail="Sesiune revocată")
+    # revocările din alte procese devin vizibile în cel mult session_revocation_poll_seconds;
+    # pe un hit nu atingem nici DB-ul, nici pool-ul de fire
+    version = _revocations.peek()
+    if version is None or not session_cache.contains(jti, uid, version):
+        await run_db(_check_session, db, jti, uid, claims.get("exp"))
 
     request.state.jwt = claims
     return claims
@@ -0,0 +1,50 @@
+"""invoices.base_snapshot + client_snapshot (datele părților la emitere, pentru PDF)
+
+Revision ID: 1c5e8a7f3d92
+Revises: 8d2f6a41c7e3
+Create Date: 2025-10-17 10:18:44.271930
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '1c5e8a7f3d92'
+down_revision: Union[str, Sequence[str], None] = '8d2f6a41c7e3'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+# aceleași câmpuri ca billing_context.PROFILE_FIELDS / _CONTEXT_SQL
+_SNAPSHOT = """
+  JSON_OBJECT(
+    'company_name', {c}.name, 'cui', {c}.cui, 'legal_name', {p}.legal_name,
+    'address_line', {p}.address_line, 'city', {p}.city, 'county', {p}.county,
+    'postal_code', {p}.postal_code, 'country', COALESCE({p}.country, 'RO'),
+    'bank_name', {p}.bank_name, 'iban', {p}.iban,
+    'email_billing', {p}.email_billing, 'phone_billing', {p}.phone_billing
+  )
+"""
+
+
+def upgrade():
+    op.add_column("invoices", sa.Column("base_snapshot", sa.JSON(), nullable=True))
+    op.add_column("invoices", sa.Column("client_snapshot", sa.JSON(), nullable=True))
+
+    # facturile existente: cel mai bun lucru disponibil sunt profilele de acum
+    op.execute(f"""
+        UPDATE invoices i
+          JOIN companies bc ON bc.company_id = i.base_company_id
+          LEFT JOIN company_billing_profiles bp ON bp.company_id = bc.company_id
+          JOIN companies cc ON cc.company_id = i.client_company_id
+          LEFT JOIN company_billing_profiles cp ON cp.company_id = cc.company_id
+           SET i.base_snapshot = {_SNAPSHOT.format(c="bc", p="bp")},
+               i.client_snapshot = {_SNAPSHOT.format(c="cc", p="cp")}
+    """)
+
+def downgrade():
+    op.drop_column("invoices", "client_snapshot")
+    op.drop_column("invoices", "base_snapshot")
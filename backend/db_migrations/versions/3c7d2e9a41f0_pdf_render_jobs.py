@@ -0,0 +1,61 @@
+"""pdf render jobs + invoices.pdf_status
+
+Revision ID: 3c7d2e9a41f0
+Revises: 9b039ef656ef
+Create Date: 2025-10-12 10:21:07.481920
+
+"""
+from typing import Sequence, Union
+from sqlalchemy.dialects import mysql
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '3c7d2e9a41f0'
+down_revision: Union[str, Sequence[str], None] = '9b039ef656ef'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+NOW6 = sa.text("CURRENT_TIMESTAMP(6)")
+UTF8 = {"mysql_charset": "utf8mb4", "mysql_collate": "utf8mb4_unicode_ci"}
+
+
+def upgrade():
+    # PENDING | READY | FAILED
+    op.add_column(
+        "invoices",
+        sa.Column("pdf_status", sa.String(16), nullable=False, server_default=sa.text("'PENDING'")),
+    )
+    # greutatea pe linie, ca PDF-ul să poată fi randat doar din DB
+    op.add_column("invoice_items", sa.Column("weight_kg", sa.Numeric(12, 3), nullable=True))
+
+    op.create_table(
+        "pdf_render_jobs",
+        sa.Column("job_id", sa.BigInteger(), primary_key=True, autoincrement=True),
+        sa.Column("invoice_id", sa.String(36), sa.ForeignKey("invoices.invoice_id", ondelete="CASCADE"),
+                  nullable=False, unique=True),
+        sa.Column("status", sa.String(16), nullable=False, server_default=sa.text("'QUEUED'")),  # QUEUED | RUNNING | DONE | FAILED
+        sa.Column("attempts", sa.Integer(), nullable=False, server_default=sa.text("0")),
+        sa.Column("last_error", sa.Text(), nullable=True),
+        sa.Column("created_at", mysql.DATETIME(fsp=6), nullable=False, server_default=NOW6),
+        sa.Column("updated_at", mysql.DATETIME(fsp=6), nullable=False,
+                  server_default=sa.text("CURRENT_TIMESTAMP(6) ON UPDATE CURRENT_TIMESTAMP(6)")),
+        **UTF8
+    )
+    op.create_index("idx_pdf_render_jobs_status", "pdf_render_jobs", ["status", "job_id"])
+
+    # facturile existente: cele cu fișier sunt gata, restul intră în coadă
+    op.execute("UPDATE invoices SET pdf_status = 'READY' WHERE pdf_path IS NOT NULL")
+    op.execute("""
+        INSERT INTO pdf_render_jobs (invoice_id)
+        SELECT invoice_id FROM invoices WHERE pdf_path IS NULL
+    """)
+
+def downgrade():
+    op.drop_index("idx_pdf_render_jobs_status", table_name="pdf_render_jobs")
+    op.drop_table("pdf_render_jobs")
+    op.drop_column("invoice_items", "weight_kg")
+    op.drop_column("invoices", "pdf_status")
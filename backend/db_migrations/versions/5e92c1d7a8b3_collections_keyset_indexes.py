@@ -0,0 +1,32 @@
+"""indexuri pentru paginarea keyset a colectărilor
+
+Revision ID: 5e92c1d7a8b3
+Revises: b81f4a06c2d5
+Create Date: 2025-10-13 16:12:54.730218
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision: str = '5e92c1d7a8b3'
+down_revision: Union[str, Sequence[str], None] = 'b81f4a06c2d5'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade():
+    # BASE: colaborările ACTIVE ale bazei -> clienții, apoi idx_collections_client_created
+    op.create_index(
+        "idx_collaborations_base_status_client",
+        "collaborations",
+        ["base_company_id", "status", "client_company_id"],
+    )
+    # ADMIN: parcurgere globală în ordinea cursorului, fără filesort
+    op.create_index("idx_collections_created_id", "collections", ["created_at", "collection_id"])
+
+def downgrade():
+    op.drop_index("idx_collections_created_id", table_name="collections")
+    op.drop_index("idx_collaborations_base_status_client", table_name="collaborations")
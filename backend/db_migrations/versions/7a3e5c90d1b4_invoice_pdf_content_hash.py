@@ -0,0 +1,28 @@
+"""invoices.pdf_sha256 + pdf_size (content-addressed PDF storage)
+
+Revision ID: 7a3e5c90d1b4
+Revises: d4a6f0b9e317
+Create Date: 2025-10-13 09:42:18.305114
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '7a3e5c90d1b4'
+down_revision: Union[str, Sequence[str], None] = 'd4a6f0b9e317'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade():
+    # NULL pentru PDF-urile vechi din files/invoices/, servite în continuare după pdf_path
+    op.add_column("invoices", sa.Column("pdf_sha256", sa.CHAR(64), nullable=True))
+    op.add_column("invoices", sa.Column("pdf_size", sa.BigInteger(), nullable=True))
+
+def downgrade():
+    op.drop_column("invoices", "pdf_size")
+    op.drop_column("invoices", "pdf_sha256")
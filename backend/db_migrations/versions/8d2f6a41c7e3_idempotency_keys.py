@@ -0,0 +1,47 @@
+"""idempotency_keys (Idempotency-Key pentru creare și validare colectări)
+
+Revision ID: 8d2f6a41c7e3
+Revises: f51b0e8c3a97
+Create Date: 2025-10-16 09:42:51.603217
+
+"""
+from typing import Sequence, Union
+from sqlalchemy.dialects import mysql
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '8d2f6a41c7e3'
+down_revision: Union[str, Sequence[str], None] = 'f51b0e8c3a97'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+NOW6 = sa.text("CURRENT_TIMESTAMP(6)")
+UTF8 = {"mysql_charset": "utf8mb4", "mysql_collate": "utf8mb4_unicode_ci"}
+
+
+def upgrade():
+    op.create_table(
+        "idempotency_keys",
+        sa.Column("company_id", sa.String(36), sa.ForeignKey("companies.company_id", ondelete="CASCADE"),
+                  primary_key=True),
+        sa.Column("endpoint", sa.String(64), primary_key=True),
+        sa.Column("idem_key", sa.String(128), primary_key=True),
+        # sha256 peste corpul cererii: aceeași cheie cu alt conținut e respinsă
+        sa.Column("fingerprint", sa.CHAR(64), nullable=False),
+        sa.Column("status", sa.String(16), nullable=False),  # IN_PROGRESS | DONE
+        sa.Column("owner", sa.CHAR(36), nullable=False),
+        sa.Column("response", mysql.LONGTEXT(), nullable=True),
+        sa.Column("created_at", mysql.DATETIME(fsp=6), nullable=False, server_default=NOW6),
+        sa.Column("updated_at", mysql.DATETIME(fsp=6), nullable=False,
+                  server_default=sa.text("CURRENT_TIMESTAMP(6) ON UPDATE CURRENT_TIMESTAMP(6)")),
+        **UTF8
+    )
+    op.create_index("idx_idempotency_keys_created", "idempotency_keys", ["created_at"])
+
+def downgrade():
+    op.drop_index("idx_idempotency_keys_created", table_name="idempotency_keys")
+    op.drop_table("idempotency_keys")
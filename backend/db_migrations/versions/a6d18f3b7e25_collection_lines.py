@@ -0,0 +1,80 @@
+"""collection_lines + collections.batteries_summary
+
+Revision ID: a6d18f3b7e25
+Revises: e2b7c4d95f08
+Create Date: 2025-10-14 16:38:09.551207
+
+"""
+from typing import Sequence, Union
+import json
+from decimal import Decimal
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'a6d18f3b7e25'
+down_revision: Union[str, Sequence[str], None] = 'e2b7c4d95f08'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+UTF8 = {"mysql_charset": "utf8mb4", "mysql_collate": "utf8mb4_unicode_ci"}
+BATCH = 1000
+
+
+def _summary(bats: dict) -> str:
+    # același format ca routers/collections.py::_batteries_summary
+    return ", ".join(f"{k}: {v}" for k, v in bats.items()
+                     if isinstance(v, (int, float, Decimal)) and not isinstance(v, bool) and v)
+
+
+def upgrade():
+    # o linie per categorie cu cantitate nenulă (bucăți pentru portabile, kg pentru auto/industriale)
+    op.create_table(
+        "collection_lines",
+        sa.Column("collection_id", sa.String(36), sa.ForeignKey("collections.collection_id", ondelete="CASCADE"),
+                  primary_key=True),
+        sa.Column("category", sa.String(64), primary_key=True),
+        sa.Column("quantity", sa.Numeric(14, 3), nullable=False),
+        **UTF8
+    )
+    op.create_index("idx_collection_lines_category", "collection_lines", ["category", "collection_id"])
+    op.add_column("collections", sa.Column("batteries_summary", sa.Text(), nullable=True))
+
+    # backfill din JSON, pe loturi în ordinea cheii primare
+    conn = op.get_bind()
+    last = ""
+    while True:
+        rows = conn.execute(
+            sa.text("""SELECT collection_id, batteries FROM collections
+                        WHERE collection_id > :last ORDER BY collection_id LIMIT :n"""),
+            {"last": last, "n": BATCH},
+        ).all()
+        if not rows:
+            break
+        lines, summaries = [], []
+        for cid, raw in rows:
+            try:
+                bats = json.loads(raw) if isinstance(raw, (str, bytes, bytearray)) else (raw or {})
+            except Exception:
+                bats = {}
+            if not isinstance(bats, dict):
+                bats = {}
+            for k, v in bats.items():
+                if isinstance(v, (int, float)) and not isinstance(v, bool) and v:
+                    lines.append({"c": cid, "k": k, "q": str(v)})
+            summaries.append({"c": cid, "s": _summary(bats)})
+        if lines:
+            conn.execute(
+                sa.text("INSERT INTO collection_lines (collection_id, category, quantity) VALUES (:c, :k, :q)"),
+                lines,
+            )
+        conn.execute(sa.text("UPDATE collections SET batteries_summary = :s WHERE collection_id = :c"), summaries)
+        last = rows[-1][0]
+
+def downgrade():
+    op.drop_column("collections", "batteries_summary")
+    op.drop_index("idx_collection_lines_category", table_name="collection_lines")
+    op.drop_table("collection_lines")
@@ -0,0 +1,38 @@
+"""cache_versions (invalidare cache-uri in-process)
+
+Revision ID: b81f4a06c2d5
+Revises: 3c7d2e9a41f0
+Create Date: 2025-10-13 09:47:31.205114
+
+"""
+from typing import Sequence, Union
+from sqlalchemy.dialects import mysql
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'b81f4a06c2d5'
+down_revision: Union[str, Sequence[str], None] = '3c7d2e9a41f0'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+UTF8 = {"mysql_charset": "utf8mb4", "mysql_collate": "utf8mb4_unicode_ci"}
+
+
+def upgrade():
+    # un rând per cache; workerii compară versiunea și își golesc copia locală
+    op.create_table(
+        "cache_versions",
+        sa.Column("name", sa.String(64), primary_key=True),
+        sa.Column("version", sa.BigInteger(), nullable=False, server_default=sa.text("0")),
+        sa.Column("updated_at", mysql.DATETIME(fsp=6), nullable=False,
+                  server_default=sa.text("CURRENT_TIMESTAMP(6) ON UPDATE CURRENT_TIMESTAMP(6)")),
+        **UTF8
+    )
+    op.execute("INSERT INTO cache_versions (name, version) VALUES ('user_sessions', 0)")
+
+def downgrade():
+    op.drop_table("cache_versions")
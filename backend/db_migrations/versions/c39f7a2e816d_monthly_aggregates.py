@@ -0,0 +1,78 @@
+"""agg_collections_monthly + agg_invoices_monthly (rollup-uri pentru rapoarte)
+
+Revision ID: c39f7a2e816d
+Revises: a6d18f3b7e25
+Create Date: 2025-10-15 10:12:44.730581
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'c39f7a2e816d'
+down_revision: Union[str, Sequence[str], None] = 'a6d18f3b7e25'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+UTF8 = {"mysql_charset": "utf8mb4", "mysql_collate": "utf8mb4_unicode_ci"}
+
+
+def upgrade():
+    # luna = prima zi a lunii în care a fost creată colectarea
+    op.create_table(
+        "agg_collections_monthly",
+        sa.Column("client_company_id", sa.String(36), sa.ForeignKey("companies.company_id", ondelete="CASCADE"),
+                  primary_key=True),
+        sa.Column("month", sa.Date(), primary_key=True),
+        sa.Column("collections", sa.Integer(), nullable=False, server_default=sa.text("0")),
+        sa.Column("validated", sa.Integer(), nullable=False, server_default=sa.text("0")),
+        sa.Column("total_weight", sa.Numeric(16, 3), nullable=False, server_default=sa.text("0")),
+        sa.Column("total_cost", sa.Numeric(16, 2), nullable=False, server_default=sa.text("0")),
+        **UTF8
+    )
+    # luna = prima zi a lunii de emitere
+    op.create_table(
+        "agg_invoices_monthly",
+        sa.Column("base_company_id", sa.String(36), sa.ForeignKey("companies.company_id", ondelete="CASCADE"),
+                  primary_key=True),
+        sa.Column("client_company_id", sa.String(36), sa.ForeignKey("companies.company_id", ondelete="CASCADE"),
+                  primary_key=True),
+        sa.Column("month", sa.Date(), primary_key=True),
+        sa.Column("invoices", sa.Integer(), nullable=False, server_default=sa.text("0")),
+        sa.Column("subtotal", sa.Numeric(16, 2), nullable=False, server_default=sa.text("0")),
+        sa.Column("vat_amount", sa.Numeric(16, 2), nullable=False, server_default=sa.text("0")),
+        sa.Column("total", sa.Numeric(16, 2), nullable=False, server_default=sa.text("0")),
+        **UTF8
+    )
+    op.create_index("idx_agg_invoices_client_month", "agg_invoices_monthly", ["client_company_id", "month"])
+
+    # popularea inițială, ca aggregates.rebuild(): rapoartele citesc doar aceste tabele,
+    # deci fără ea istoricul ar lipsi până la un `python -m app.cli rebuild-aggregates`
+    op.execute("""
+        INSERT INTO agg_collections_monthly (client_company_id, month, collections, validated, total_weight, total_cost)
+        SELECT client_company_id,
+               DATE_FORMAT(created_at, '%Y-%m-01'),
+               COUNT(*),
+               SUM(status = 'VALIDATED'),
+               COALESCE(SUM(total_weight), 0),
+               COALESCE(SUM(total_cost), 0)
+          FROM collections
+         GROUP BY client_company_id, DATE_FORMAT(created_at, '%Y-%m-01')
+    """)
+    op.execute("""
+        INSERT INTO agg_invoices_monthly (base_company_id, client_company_id, month, invoices, subtotal, vat_amount, total)
+        SELECT base_company_id, client_company_id,
+               DATE_FORMAT(issue_date, '%Y-%m-01'),
+               COUNT(*), SUM(subtotal), SUM(vat_amount), SUM(total)
+          FROM invoices
+         GROUP BY base_company_id, client_company_id, DATE_FORMAT(issue_date, '%Y-%m-01')
+    """)
+
+def downgrade():
+    op.drop_index("idx_agg_invoices_client_month", table_name="agg_invoices_monthly")
+    op.drop_table("agg_invoices_monthly")
+    op.drop_table("agg_collections_monthly")
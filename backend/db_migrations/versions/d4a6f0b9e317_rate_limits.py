@@ -0,0 +1,36 @@
+"""rate_limits (GCRA partajat între workeri)
+
+Revision ID: d4a6f0b9e317
+Revises: 5e92c1d7a8b3
+Create Date: 2025-10-14 11:05:42.118306
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'd4a6f0b9e317'
+down_revision: Union[str, Sequence[str], None] = '5e92c1d7a8b3'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+UTF8 = {"mysql_charset": "utf8mb4", "mysql_collate": "utf8mb4_unicode_ci"}
+
+
+def upgrade():
+    # un rând per (scope, IP): doar TAT-ul GCRA, ca epoch seconds
+    op.create_table(
+        "rate_limits",
+        sa.Column("bucket_key", sa.String(191), primary_key=True),
+        sa.Column("tat", sa.Float(precision=53), nullable=False),
+        **UTF8
+    )
+    op.create_index("idx_rate_limits_tat", "rate_limits", ["tat"])
+
+def downgrade():
+    op.drop_index("idx_rate_limits_tat", table_name="rate_limits")
+    op.drop_table("rate_limits")
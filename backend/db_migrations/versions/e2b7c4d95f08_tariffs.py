@@ -0,0 +1,68 @@
+"""tariffs (versiuni de tarif cu dată de intrare în vigoare) + invoices.tariff_version
+
+Revision ID: e2b7c4d95f08
+Revises: 7a3e5c90d1b4
+Create Date: 2025-10-14 11:05:42.917360
+
+"""
+from typing import Sequence, Union
+import json
+from sqlalchemy.dialects import mysql
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'e2b7c4d95f08'
+down_revision: Union[str, Sequence[str], None] = '7a3e5c90d1b4'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+NOW6 = sa.text("CURRENT_TIMESTAMP(6)")
+UTF8 = {"mysql_charset": "utf8mb4", "mysql_collate": "utf8mb4_unicode_ci"}
+
+# tarifele în vigoare la momentul migrării (copie fixă, independentă de cod)
+INITIAL_RATES = {
+    "portable_rates": {
+        "portable_pastila": "0.01", "portable_0_50": "0.04", "portable_51_150": "0.11",
+        "portable_151_250": "0.38", "portable_251_500": "0.80", "portable_501_750": "0.98",
+        "portable_751_1000": "1.20", "portable_1000_plus": "1.38",
+    },
+    "portable_weights_kg": {
+        "portable_pastila": "0.010", "portable_0_50": "0.050", "portable_51_150": "0.150",
+        "portable_151_250": "0.250", "portable_251_500": "0.500", "portable_501_750": "0.750",
+        "portable_751_1000": "1.000", "portable_1000_plus": "1.000",
+    },
+    "kg_rates": {
+        "auto_3a": "0.35", "auto_3b": "1.38", "auto_3c": "1.38",
+        "industrial_4a": "0.35", "industrial_4b": "1.38", "industrial_4c": "1.38",
+    },
+}
+
+
+def upgrade():
+    op.create_table(
+        "tariffs",
+        sa.Column("version", sa.Integer(), primary_key=True, autoincrement=True),
+        sa.Column("effective_from", mysql.DATETIME(fsp=6), nullable=False, unique=True),
+        # {"portable_rates": {...}, "portable_weights_kg": {...}, "kg_rates": {...}}, valori ca text zecimal
+        sa.Column("rates", sa.JSON(), nullable=False),
+        sa.Column("created_by", sa.String(36), nullable=True),
+        sa.Column("created_at", mysql.DATETIME(fsp=6), nullable=False, server_default=NOW6),
+        **UTF8
+    )
+    op.get_bind().execute(
+        sa.text("INSERT INTO tariffs (version, effective_from, rates) VALUES (1, '2000-01-01 00:00:00', :r)"),
+        {"r": json.dumps(INITIAL_RATES)},
+    )
+    op.execute("INSERT INTO cache_versions (name, version) VALUES ('tariffs', 0)")
+
+    op.add_column("invoices", sa.Column("tariff_version", sa.Integer(), nullable=True))
+    op.execute("UPDATE invoices SET tariff_version = 1")
+
+def downgrade():
+    op.drop_column("invoices", "tariff_version")
+    op.execute("DELETE FROM cache_versions WHERE name = 'tariffs'")
+    op.drop_table("tariffs")
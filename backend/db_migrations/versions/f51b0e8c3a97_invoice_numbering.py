@@ -0,0 +1,71 @@
+"""invoice_number_counters + invoice_number_slots (numerotare fără lock pe setări)
+
+Revision ID: f51b0e8c3a97
+Revises: c39f7a2e816d
+Create Date: 2025-10-15 15:26:03.118442
+
+"""
+from typing import Sequence, Union
+from sqlalchemy.dialects import mysql
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'f51b0e8c3a97'
+down_revision: Union[str, Sequence[str], None] = 'c39f7a2e816d'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+UTF8 = {"mysql_charset": "utf8mb4", "mysql_collate": "utf8mb4_unicode_ci"}
+
+
+def upgrade():
+    # year = 0 pentru seriile fără resetare anuală
+    op.create_table(
+        "invoice_number_counters",
+        sa.Column("base_company_id", sa.String(36), sa.ForeignKey("companies.company_id", ondelete="CASCADE"),
+                  primary_key=True),
+        sa.Column("series_code", sa.String(16), primary_key=True),
+        sa.Column("year", sa.SmallInteger(), primary_key=True),
+        sa.Column("next_number", sa.Integer(), nullable=False, server_default=sa.text("1")),
+        **UTF8
+    )
+    # numere alocate dar încă nefolosite: RESERVED (validare în curs) | FREE (anulate, de refolosit)
+    op.create_table(
+        "invoice_number_slots",
+        sa.Column("base_company_id", sa.String(36), sa.ForeignKey("companies.company_id", ondelete="CASCADE"),
+                  primary_key=True),
+        sa.Column("series_code", sa.String(16), primary_key=True),
+        sa.Column("year", sa.SmallInteger(), primary_key=True),
+        sa.Column("number", sa.Integer(), primary_key=True),
+        sa.Column("invoice_number", sa.String(64), nullable=False),
+        sa.Column("status", sa.String(16), nullable=False),
+        sa.Column("reserved_at", mysql.DATETIME(fsp=6), nullable=True),
+        **UTF8
+    )
+    op.create_index("idx_invoice_number_slots_status", "invoice_number_slots",
+                    ["base_company_id", "series_code", "year", "status", "number"])
+
+    # contorul anului curent continuă din company_invoice_settings.next_number
+    op.execute("""
+        INSERT INTO invoice_number_counters (base_company_id, series_code, year, next_number)
+        SELECT base_company_id, series_code, IF(year_reset, YEAR(CURDATE()), 0), next_number
+          FROM company_invoice_settings
+    """)
+
+def downgrade():
+    # next_number din setări preia contorul anului curent, ca numerotarea veche să continue corect
+    op.execute("""
+        UPDATE company_invoice_settings s
+          JOIN invoice_number_counters c
+            ON c.base_company_id = s.base_company_id
+           AND c.series_code = s.series_code
+           AND c.year = IF(s.year_reset, YEAR(CURDATE()), 0)
+           SET s.next_number = GREATEST(s.next_number, c.next_number)
+    """)
+    op.drop_index("idx_invoice_number_slots_status", table_name="invoice_number_slots")
+    op.drop_table("invoice_number_slots")
+    op.drop_table("invoice_number_counters")
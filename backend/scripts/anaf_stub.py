@@ -0,0 +1,48 @@
+"""
+Stub local pentru serviciul ANAF TVA v9 (benchmark-uri / dezvoltare).
+
+    python scripts/anaf_stub.py --port 8799 --delay 0.3
+    ANAF_URL=http://127.0.0.1:8799/tva uvicorn app.main:app
+"""
+import argparse
+import asyncio
+from datetime import date
+
+import uvicorn
+from starlette.applications import Starlette
+from starlette.requests import Request
+from starlette.responses import JSONResponse
+from starlette.routing import Route
+
+DELAY = 0.0
+
+async def tva(request: Request) -> JSONResponse:
+    body = await request.json()
+    await asyncio.sleep(DELAY)
+    found = [
+        {
+            "date_generale": {
+                "cui": item["cui"],
+                "data": item.get("data") or date.today().isoformat(),
+                "denumire": f"STUB SRL {item['cui']}",
+                "adresa": "Str. Exemplu 1, București",
+                "nrRegCom": f"J40/{item['cui']}/2020",
+                "telefon": "0700000000",
+                "stare_inregistrare": "INREGISTRAT din data 01.01.2020",
+            },
+            "inregistrare_scop_Tva": {"scpTVA": True},
+            "inregistrare_RTVAI": {},
+        }
+        for item in body
+    ]
+    return JSONResponse({"cod": 200, "message": "SUCCESS", "found": found, "notFound": []})
+
+app = Starlette(routes=[Route("/tva", tva, methods=["POST"])])
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--port", type=int, default=8799)
+    ap.add_argument("--delay", type=float, default=0.3, help="latență simulată (secunde)")
+    args = ap.parse_args()
+    DELAY = args.delay
+    uvicorn.run(app, host="127.0.0.1", port=args.port, log_level="warning")
@@ -0,0 +1,69 @@
+"""
+Benchmark de încărcare pentru /anaf/lookup.
+
+Trimite N lookup-uri concurente (CUI-uri distincte, deci fără cache) și, în paralel,
+cereri /healthz. Dacă DB-ul ar bloca event loop-ul, latența /healthz ar crește odată
+cu lookup-urile; cu lucrul DB mutat pe fire, trebuie să rămână de ordinul milisecundelor.
+
+    python scripts/anaf_stub.py --delay 0.3 &
+    ANAF_URL=http://127.0.0.1:8799/tva uvicorn app.main:app --port 8000 &
+    python scripts/bench_anaf_lookup.py --token <JWT> --concurrency 50
+"""
+import argparse
+import asyncio
+import random
+import statistics
+import time
+
+import httpx
+
+def _pct(values: list[float], p: float) -> float:
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * p))] * 1000 if values else 0.0
+
+async def main() -> None:
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--base-url", default="http://127.0.0.1:8000")
+    ap.add_argument("--token", required=True)
+    ap.add_argument("--concurrency", type=int, default=50)
+    ap.add_argument("--rate-limit-spoof", action="store_true",
+                    help="x-forwarded-for diferit per cerere, ca limitatorul să nu intervină")
+    args = ap.parse_args()
+
+    headers = {"Authorization": f"Bearer {args.token}"}
+    lookup_lat: list[float] = []
+    health_lat: list[float] = []
+    done = asyncio.Event()
+
+    async with httpx.AsyncClient(base_url=args.base_url, timeout=30) as client:
+        async def one_lookup(i: int) -> None:
+            h = dict(headers)
+            if args.rate_limit_spoof:
+                h["x-forwarded-for"] = f"10.0.{i // 250}.{i % 250}"
+            cui = str(random.randint(10_000_000, 49_999_999))
+            t = time.perf_counter()
+            await client.post("/anaf/lookup", json={"cui": cui}, headers=h)
+            lookup_lat.append(time.perf_counter() - t)
+
+        async def probe_health() -> None:
+            while not done.is_set():
+                t = time.perf_counter()
+                await client.get("/healthz")
+                health_lat.append(time.perf_counter() - t)
+                await asyncio.sleep(0.01)
+
+        prober = asyncio.create_task(probe_health())
+        t0 = time.perf_counter()
+        await asyncio.gather(*(one_lookup(i) for i in range(args.concurrency)))
+        wall = time.perf_counter() - t0
+        done.set()
+        await prober
+
+    print(f"lookups: {len(lookup_lat)} în {wall:.2f}s "
+          f"(p50 {_pct(lookup_lat, .5):.0f} ms, p95 {_pct(lookup_lat, .95):.0f} ms)")
+    if health_lat:
+        print(f"/healthz în timpul testului: {len(health_lat)} cereri, "
+              f"medie {statistics.mean(health_lat) * 1000:.1f} ms, p95 {_pct(health_lat, .95):.1f} ms")
+
+if __name__ == "__main__":
+    asyncio.run(main())
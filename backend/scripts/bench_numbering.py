@@ -0,0 +1,148 @@
+"""
+Benchmark + verificare pentru alocarea numerelor de factură (app/services/numbering.py).
+
+Rulează T fire care alocă numere pentru aceeași bază și serie, cu o "validare" simulată
+de --work-ms după alocare, în două variante:
+- legacy: SELECT ... FOR UPDATE pe company_invoice_settings, ținut pe toată validarea;
+- allocator: numbering.allocate, apoi validarea în afara lock-ului; un procent de
+  --fail-pct din validări eșuează și eliberează numărul (release).
+
+La final verifică faptul că numerele confirmate sunt unice și fără goluri (după ce
+numerele eliberate au fost refolosite). Rulează pe o bază de test; creează și șterge
+o companie proprie.
+
+    python scripts/bench_numbering.py --threads 16 --ops 200 --work-ms 20
+"""
+import argparse
+import os
+import random
+import sys
+import threading
+import time
+import uuid
+from datetime import date
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from sqlalchemy import text  # noqa: E402
+
+from app.db import engine  # noqa: E402
+from app.services import numbering  # noqa: E402
+
+SERIES = "BENCH"
+
+def _setup() -> str:
+    cid = str(uuid.uuid4())
+    with engine.begin() as conn:
+        conn.execute(
+            text("INSERT INTO companies(company_id, company_type, name) VALUES (:id, 'BASE', :n)"),
+            {"id": cid, "n": f"bench-{cid[:8]}"},
+        )
+        conn.execute(
+            text("""INSERT INTO company_invoice_settings(base_company_id, series_code, next_number, year_reset)
+                    VALUES (:id, :s, 1, 0)"""),
+            {"id": cid, "s": SERIES},
+        )
+    return cid
+
+def _teardown(cid: str) -> None:
+    with engine.begin() as conn:
+        for table in ("invoice_number_slots", "invoice_number_counters"):
+            conn.execute(text(f"DELETE FROM {table} WHERE base_company_id = :id"), {"id": cid})
+        conn.execute(text("DELETE FROM audit_logs WHERE actor_company_id = :id"), {"id": cid})
+        conn.execute(text("DELETE FROM company_invoice_settings WHERE base_company_id = :id"), {"id": cid})
+        conn.execute(text("DELETE FROM companies WHERE company_id = :id"), {"id": cid})
+
+def legacy_once(cid: str, work_s: float) -> int:
+    with engine.begin() as conn:
+        num = int(conn.execute(
+            text("SELECT next_number FROM company_invoice_settings WHERE base_company_id = :id FOR UPDATE"),
+            {"id": cid},
+        ).scalar())
+        conn.execute(
+            text("UPDATE company_invoice_settings SET next_number = next_number + 1 WHERE base_company_id = :id"),
+            {"id": cid},
+        )
+        time.sleep(work_s)  # validarea, cu lock-ul ținut
+    return num
+
+def allocator_once(cid: str, work_s: float, fail_pct: float) -> int | None:
+    today = date.today()
+    [(num, _)] = numbering.allocate(cid, SERIES, False, today, 1)
+    time.sleep(work_s)  # validarea, fără lock
+    if random.random() * 100 < fail_pct:
+        numbering.release(cid, SERIES, False, today, [num], "bench")
+        return None
+    with engine.begin() as conn:
+        conn.execute(
+            text("""DELETE FROM invoice_number_slots
+                     WHERE base_company_id = :b AND series_code = :s AND year = 0 AND number = :n"""),
+            {"b": cid, "s": SERIES, "n": num},
+        )
+    return num
+
+def run(name: str, fn, threads: int, ops: int) -> list[int]:
+    out: list[int] = []
+    lock = threading.Lock()
+
+    def worker():
+        mine = []
+        for _ in range(ops):
+            n = fn()
+            if n is not None:
+                mine.append(n)
+        with lock:
+            out.extend(mine)
+
+    ts = [threading.Thread(target=worker) for _ in range(threads)]
+    t0 = time.perf_counter()
+    for t in ts:
+        t.start()
+    for t in ts:
+        t.join()
+    dt = time.perf_counter() - t0
+    print(f"{name:>10}: {threads * ops} alocări în {dt:.2f}s -> {threads * ops / dt:,.0f}/s")
+    return out
+
+def check(name: str, nums: list[int]) -> bool:
+    dupes = len(nums) - len(set(nums))
+    expected = set(range(1, len(nums) + 1))
+    gaps = sorted(expected - set(nums))
+    print(f"{name:>10}: {len(nums)} confirmate, {dupes} duplicate, {len(gaps)} goluri")
+    return dupes == 0 and not gaps
+
+def main() -> int:
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--threads", type=int, default=16)
+    ap.add_argument("--ops", type=int, default=100, help="alocări per fir")
+    ap.add_argument("--work-ms", type=float, default=20.0)
+    ap.add_argument("--fail-pct", type=float, default=5.0)
+    args = ap.parse_args()
+    work_s = args.work_ms / 1000
+
+    ok = True
+    cid = _setup()
+    try:
+        nums = run("legacy", lambda: legacy_once(cid, work_s), args.threads, args.ops)
+        ok &= check("legacy", nums)
+    finally:
+        _teardown(cid)
+
+    cid = _setup()
+    try:
+        nums = run("allocator", lambda: allocator_once(cid, work_s, args.fail_pct), args.threads, args.ops)
+        # numerele eliberate spre final nu mai au cine să le refolosească: le consumăm acum
+        top = max(nums, default=0)
+        while True:
+            got = allocator_once(cid, 0, 0)
+            if got > top:
+                break
+            nums.append(got)
+        ok &= check("allocator", nums)
+    finally:
+        _teardown(cid)
+
+    return 0 if ok else 1
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,57 @@
+"""
+Benchmark pentru randarea PDF a facturilor (PDF-uri/secundă pe un singur nucleu).
+
+"înainte" construiește un PdfRenderer nou pentru fiecare factură (stiluri, TableStyle-uri
+și lookup de fonturi refăcute la fiecare apel, ca vechiul render_invoice_pdf);
+"după" refolosește renderer-ul procesului, gata încălzit.
+
+    python scripts/bench_pdf.py --n 300 --lines 12
+"""
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from app.services.pdf import PdfRenderer, get_renderer  # noqa: E402
+
+def _sample(lines: int) -> tuple[dict, list[dict], dict, dict]:
+    items = [
+        {"line_no": i + 1, "description": f"Baterii portabile categoria {i % 4} – colectare",
+         "qty": "1", "unit": "lot", "unit_price": f"{12.5 * (i + 1):.2f}",
+         "line_total": f"{12.5 * (i + 1):.2f}", "weight_kg": f"{0.75 * (i + 1):.3f}"}
+        for i in range(lines)
+    ]
+    invoice = {"invoice_number": "FCT-2025-000123", "issue_date": "2025-10-12",
+               "due_date": "2025-10-27", "currency": "RON", "vat_rate": "19",
+               "subtotal": "100.00", "vat_amount": "19.00", "total": "119.00"}
+    base = {"legal_name": "Bază Reciclare SRL", "cui": "RO123456", "reg_com": "J40/1/2020",
+            "address_line": "Str. Șoseaua Nouă 1", "city": "București", "country": "RO",
+            "iban": "RO49AAAA1B31007593840000", "bank_name": "Banca Test"}
+    client = {"legal_name": "Client Țară SRL", "cui": "RO654321", "city": "Iași", "country": "RO"}
+    return invoice, items, base, client
+
+def _run(label: str, n: int, render) -> float:
+    t0 = time.perf_counter()
+    for _ in range(n):
+        render()
+    dt = time.perf_counter() - t0
+    print(f"{label:8s} {n} PDF-uri în {dt:.2f}s  ->  {n / dt:.1f} PDF/s/nucleu")
+    return n / dt
+
+def main() -> None:
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--n", type=int, default=200)
+    ap.add_argument("--lines", type=int, default=12)
+    args = ap.parse_args()
+
+    invoice, items, base, client = _sample(args.lines)
+
+    before = _run("înainte", args.n, lambda: PdfRenderer().render(invoice, items, base, client))
+    renderer = get_renderer()
+    after = _run("după", args.n, lambda: renderer.render(invoice, items, base, client))
+    print(f"câștig: x{after / before:.2f}")
+
+if __name__ == "__main__":
+    main()
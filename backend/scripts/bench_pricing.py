@@ -0,0 +1,106 @@
+"""
+Benchmark + verificare pentru motorul de prețuri (app/utils/pricing.py).
+
+Generează N colectări sintetice și le calculează cu implementarea veche (Decimal per
+cheie, copiată mai jos ca referință) și cu `price_totals` / `price`. Orice diferență
+de total e raportată și scriptul iese cu cod 1.
+
+    python scripts/bench_pricing.py --n 1000000
+"""
+import argparse
+import os
+import random
+import sys
+import time
+from decimal import Decimal, ROUND_HALF_UP
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from app.utils.pricing import (  # noqa: E402
+    KG_RATES, PORTABLE_RATES, PORTABLE_WEIGHTS_KG, price, price_totals, totals_as_decimal,
+)
+from app.utils.rates import KG_KEYS, PORTABLE_KEYS  # noqa: E402
+
+_P_RATES = {k: Decimal(v) for k, v in PORTABLE_RATES.items()}
+_P_WEIGHTS = {k: Decimal(v) for k, v in PORTABLE_WEIGHTS_KG.items()}
+_K_RATES = {k: Decimal(v) for k, v in KG_RATES.items()}
+
+def _q2(x: Decimal) -> Decimal:
+    return x.quantize(Decimal("0.01"), rounding=ROUND_HALF_UP)
+
+def legacy_totals(bats: dict) -> tuple[Decimal, Decimal]:
+    """Fostul _compute_server_totals din routers/collections.py."""
+    subtotal = Decimal("0")
+    total_w = Decimal("0")
+    for key, rate in _P_RATES.items():
+        qty = Decimal(str(bats.get(key, 0) or 0))
+        if qty > 0:
+            subtotal += qty * rate
+            total_w += qty * _P_WEIGHTS.get(key, Decimal("0"))
+    for key, rate in _K_RATES.items():
+        kg = Decimal(str(bats.get(key, 0) or 0))
+        if kg > 0:
+            subtotal += kg * rate
+            total_w += kg
+    return _q2(subtotal), _q2(total_w)
+
+def legacy_invoice_totals(bats: dict) -> tuple[Decimal, Decimal]:
+    """Totalurile fostului _build_invoice_lines (subtotal = suma liniilor rotunjite)."""
+    subtotal = Decimal("0")
+    total_weight = Decimal("0")
+    for key in PORTABLE_KEYS:
+        qty = Decimal(str(bats.get(key) or 0))
+        if qty <= 0:
+            continue
+        subtotal += _q2(qty * _P_RATES[key])
+        total_weight += _q2(qty * _P_WEIGHTS[key])
+    for key in KG_KEYS:
+        w = Decimal(str(bats.get(key) or 0))
+        if w <= 0:
+            continue
+        subtotal += _q2(w * _K_RATES[key])
+        total_weight += w
+    return _q2(subtotal), total_weight
+
+def payloads(n: int, seed: int) -> list[dict]:
+    rnd = random.Random(seed)
+    keys = PORTABLE_KEYS + KG_KEYS
+    out = []
+    for _ in range(n):
+        # ca în formularul clientului: câteva categorii completate, întregi (schema e Dict[str, int])
+        out.append({k: rnd.randint(0, 5000) for k in rnd.sample(keys, rnd.randint(1, 6))})
+    return out
+
+def timed(label: str, fn, data: list[dict]) -> list:
+    t0 = time.perf_counter()
+    res = [fn(b) for b in data]
+    dt = time.perf_counter() - t0
+    print(f"{label:28s} {len(data) / dt:>12,.0f} colectări/s  ({dt:.2f}s)")
+    return res
+
+def main() -> None:
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--n", type=int, default=1_000_000)
+    ap.add_argument("--seed", type=int, default=7)
+    args = ap.parse_args()
+
+    data = payloads(args.n, args.seed)
+
+    old_create = timed("vechi: creare (Decimal)", legacy_totals, data)
+    new_create = timed("nou: price_totals", lambda b: totals_as_decimal(*price_totals(b)), data)
+    old_inv = timed("vechi: linii factură", legacy_invoice_totals, data)
+    new_inv = timed("nou: price", lambda b: price(b)[1:3], data)
+
+    bad = 0
+    for i, b in enumerate(data):
+        oc, nc, oi = old_create[i], new_create[i], old_inv[i]
+        ni = new_inv[i]
+        if oc != nc or oi[0] != ni[0] or _q2(oi[1]) != ni[1]:
+            bad += 1
+            if bad <= 5:
+                print("diferență:", b, oc, nc, oi, ni)
+    print(f"{args.n - bad}/{args.n} identice")
+    sys.exit(1 if bad else 0)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,45 @@
+"""
+Microbenchmark pentru limitatorul GCRA (backend în memorie).
+
+    python scripts/bench_ratelimit.py --keys 1000000 --max-keys 100000
+
+Măsoară verificări/secundă pentru chei puține (IP-uri „calde”) și pentru un flux de
+chei distincte (ca un atac cu x-forwarded-for falsificat), plus numărul de chei reținute,
+care trebuie să rămână plafonat la --max-keys.
+"""
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from app.utils.ratelimit import MemoryBackend  # noqa: E402
+
+def run(backend: MemoryBackend, keys: list[str], rounds: int) -> float:
+    interval, window = 60 / 10, 60.0
+    t0 = time.perf_counter()
+    now = time.time()
+    n = 0
+    for _ in range(rounds):
+        for k in keys:
+            backend.hit(k, now, interval, window)
+            n += 1
+    return n / (time.perf_counter() - t0)
+
+def main() -> None:
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--keys", type=int, default=1_000_000)
+    ap.add_argument("--max-keys", type=int, default=100_000)
+    args = ap.parse_args()
+
+    hot = MemoryBackend(args.max_keys)
+    rate = run(hot, [f"anaf:10.0.0.{i}" for i in range(100)], 10_000)
+    print(f"100 chei calde:        {rate:,.0f} verificări/s")
+
+    cold = MemoryBackend(args.max_keys)
+    rate = run(cold, [f"anaf:spoof-{i}" for i in range(args.keys)], 1)
+    print(f"{args.keys:,} chei distincte: {rate:,.0f} verificări/s, chei reținute: {len(cold):,}")
+
+if __name__ == "__main__":
+    main()
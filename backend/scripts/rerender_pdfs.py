@@ -0,0 +1,58 @@
+"""
+Re-randează PDF-urile facturilor emise într-un interval (ex. rularea de final de lună),
+în paralel prin PdfRenderPool.
+
+    python scripts/rerender_pdfs.py --from 2025-09-01 --to 2025-09-30 --batch 200
+"""
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from sqlalchemy import text  # noqa: E402
+
+from app.db import SessionLocal  # noqa: E402
+from app.services.pdf_pool import pdf_pool  # noqa: E402
+from app.services.render_queue import render_invoices_to_files  # noqa: E402
+
+def main() -> None:
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--from", dest="date_from", required=True)
+    ap.add_argument("--to", dest="date_to", required=True)
+    ap.add_argument("--batch", type=int, default=200)
+    args = ap.parse_args()
+
+    with SessionLocal() as db:
+        ids = [str(r[0]) for r in db.execute(
+            text("""
+            SELECT invoice_id FROM invoices
+             WHERE issue_date BETWEEN :f AND :t
+             ORDER BY issue_date, invoice_id
+            """),
+            {"f": args.date_from, "t": args.date_to},
+        ).all()]
+
+    pdf_pool.start()
+    ok = failed = 0
+    t0 = time.perf_counter()
+    try:
+        for i in range(0, len(ids), args.batch):
+            with SessionLocal() as db:
+                res = render_invoices_to_files(db, ids[i:i + args.batch])
+                db.commit()
+            for inv_id, r in res.items():
+                if isinstance(r, Exception):
+                    failed += 1
+                    print(f"{inv_id}: {type(r).__name__}: {r}", file=sys.stderr)
+                elif r is not None:
+                    ok += 1
+    finally:
+        pdf_pool.stop()
+
+    dt = time.perf_counter() - t0
+    print(f"{ok} PDF-uri randate, {failed} eșuate, în {dt:.1f}s ({ok / dt if dt else 0:.1f} PDF/s)")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,80 @@
+"""
+InvoiceWriter: câte un INSERT multi-rând per tabel, în bucăți de cel mult MAX_ROWS rânduri.
+Sesiunea e înlocuită cu una care doar reține instrucțiunile, deci testul nu are nevoie de DB.
+"""
+from datetime import date
+from decimal import Decimal
+
+import pytest
+
+pytest.importorskip("sqlalchemy")
+
+from app.services.invoice_writer import MAX_ROWS, InvoiceWriter  # noqa: E402
+from app.utils.pricing import PriceLine, Quote  # noqa: E402
+
+class FakeSession:
+    def __init__(self):
+        self.calls: list[tuple[str, dict]] = []
+
+    def execute(self, stmt, params=None):
+        self.calls.append((str(stmt), params or {}))
+
+def _quote(lines: int) -> Quote:
+    return Quote(
+        lines=[
+            PriceLine(
+                key="portable_0_50", description="0-50 g (portabil)", qty=Decimal(10), unit="buc",
+                unit_price=Decimal("0.04"), line_total=Decimal("0.40"), weight_kg=Decimal("0.50"),
+            )
+            for _ in range(lines)
+        ],
+        subtotal=Decimal("0.40") * lines,
+        total_weight=Decimal("0.50") * lines,
+        tariff_version=1,
+    )
+
+def _write(invoices: int, lines: int) -> tuple[FakeSession, InvoiceWriter, list[dict]]:
+    db = FakeSession()
+    writer = InvoiceWriter(db)
+    today = date(2025, 10, 1)
+    for i in range(invoices):
+        writer.add(
+            base_company_id="b", client_company_id="c", collection_id=f"col-{i}",
+            invoice_number=f"INV-{i + 1}", issue_date=today, due_date=today,
+            vat_rate=Decimal("19"), quote=_quote(lines),
+            vat_amount=Decimal("0.08"), total=Decimal("0.48"),
+            base_profile={"company_name": "Baza"}, client_profile={"company_name": "Client"},
+        )
+    return db, writer, writer.flush()
+
+def _tables(db: FakeSession) -> list[str]:
+    return [sql.split()[2] for sql, _ in db.calls]
+
+@pytest.mark.parametrize(
+    "invoices, lines, expected",
+    [
+        (1, 14, ["invoices", "invoice_items"]),
+        (1, 0, ["invoices"]),
+        (MAX_ROWS, 1, ["invoices", "invoice_items"]),
+        (MAX_ROWS, 2, ["invoices", "invoice_items", "invoice_items"]),
+        (MAX_ROWS + 1, 1, ["invoices", "invoices", "invoice_items", "invoice_items"]),
+    ],
+)
+def test_statement_count(invoices, lines, expected):
+    db, writer, written = _write(invoices, lines)
+    assert _tables(db) == expected
+    assert writer.round_trips == len(expected)
+    assert len(written) == invoices
+
+def test_chunks_carry_every_row():
+    db, _, _ = _write(MAX_ROWS + 1, 1)
+    sizes = [sql.count("), (") + 1 for sql, _ in db.calls]
+    assert sizes == [MAX_ROWS, 1, MAX_ROWS, 1]
+    # fiecare placeholder din SQL are valoare
+    for sql, params in db.calls:
+        assert all(f":{k}" in sql for k in params)
+
+def test_flush_resets_pending_rows():
+    db, writer, _ = _write(1, 3)
+    assert writer.flush() == []
+    assert len(db.calls) == 2